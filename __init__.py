@@ -1,6 +1,7 @@
 # my_adb_lib/__init__.py
 
 from .adb import MyADB
+from .async_adb import AsyncMyADB
 
 # Optional: expose command groups for direct access if needed
 from .commands import (
@@ -19,6 +20,7 @@ from .commands import (
 
 __all__ = [
     "MyADB",
+    "AsyncMyADB",
     "app_info",
     "apps",
     "basic",
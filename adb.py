@@ -3,19 +3,36 @@ Lớp chính của thư viện My ADB Lib.
 """
 
 import os
+import codecs
+import socket
 import logging
 import subprocess
 import time
+import threading
+import uuid
 import pkg_resources # To find bundled APK
-from typing import Optional, List, Dict, Any, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Union, Tuple, Iterator, Set
 
 from .exceptions import (
     ADBError, ADBCommandError, DeviceNotFoundError, 
     DeviceConnectionError, PackageNotFoundError,
-    InstallationError, UninstallationError, FileOperationError
+    InstallationError, UninstallationError, FileOperationError, ADBServerError
 )
-from .utils.advanced import CommandResult, ResultCache, DeviceMonitor, AsyncCommandExecutor
+from .utils.advanced import CommandResult, BytesCommandResult, ResultCache, DeviceMonitor, AsyncCommandExecutor
 from .utils.platform_utils import get_platform_info, ADBInstaller, PlatformInfo
+from .utils.transport import SocketTransport, ShellSession, SHELL_ID_STDOUT, SHELL_ID_STDERR, SHELL_ID_EXIT
+from .utils.batch import CommandBatch
+from .utils.cache_policy import (
+    TTLPolicy, SESSION_TTL, DEFAULT_TTL, TAG_ALL, TAG_PROPS, TAG_DISPLAY, TAG_UI, is_mutating_command, read_tags,
+    invalidation_tags, tags_overlap, package_tag
+)
+from .utils.device_facts import DeviceFactsStore
+from .utils.device_props import DeviceProperties
+from .utils.display_info import DisplayInfo, DISPLAY_PROBE_COMMAND
+from .utils.metrics import CommandMetrics
+from .utils.package_inventory import PackageInventory
+from .utils.ui_hierarchy import UIHierarchy, UI_PROBE_COMMAND, DEFAULT_UI_MAX_AGE, UI_REVALIDATE_INTERVAL
 
 # Thiết lập logging
 logger = logging.getLogger("oiadb")
@@ -27,6 +44,17 @@ SERVER_APK_FILENAME = "oiadb-server.apk"
 SERVER_CLASS_NAME = SERVER_PACKAGE_NAME + ".InstrumentedTest"
 SERVER_PORT = 9008 # Default port used by uiautomator2 server
 
+# Server readiness: overall start timeout (seconds) and /ping backoff bounds (milliseconds)
+SERVER_START_TIMEOUT = 15.0
+SERVER_PING_INITIAL_DELAY_MS = 10
+SERVER_PING_MAX_DELAY_MS = 500
+
+# Khoảng thời gian (giây) dùng lại thông tin màn hình mà không cần dò lại góc xoay
+DISPLAY_REVALIDATE_INTERVAL = 5.0
+
+# Số byte stderr tối đa được giữ lại khi chạy lệnh dạng luồng
+STREAM_STDERR_LIMIT = 65536
+
 class MyADB:
     """
     Lớp chính để tương tác với ADB (Android Debug Bridge).
@@ -38,11 +66,18 @@ class MyADB:
         adb_path (str): Đường dẫn đến executable ADB
         auto_start_server (bool): Tự động cài đặt và khởi động server khi khởi tạo
         auto_install_adb (bool): Tự động tải xuống và cài đặt ADB nếu không tìm thấy
+        transport (str): Cơ chế thực thi lệnh ("subprocess" hoặc "socket")
+        shell_session (bool): Dùng chung một phiên adb shell cho các lệnh "shell ..."
+        async_workers (int): Số lệnh bất đồng bộ chạy đồng thời tối đa
+        lazy (bool): Hoãn kiểm tra thiết bị và cài đặt server tới lần sử dụng đầu tiên
+        persistent_cache (bool | str): Lưu thông tin tĩnh của thiết bị xuống đĩa giữa các phiên
     """
     
     def __init__(self, device_id: Optional[str] = None, cache_enabled: bool = True, 
                  timeout: int = 30, adb_path: Optional[str] = None, auto_start_server: bool = True,
-                 auto_install_adb: bool = True):
+                 auto_install_adb: bool = True, transport: str = "subprocess",
+                 shell_session: bool = False, async_workers: int = 8, lazy: bool = False,
+                 persistent_cache: Union[bool, str] = False):
         """
         Khởi tạo đối tượng MyADB.
         
@@ -53,12 +88,29 @@ class MyADB:
             adb_path: Đường dẫn tùy chỉnh đến executable ADB
             auto_start_server: Tự động cài đặt và khởi động server khi khởi tạo
             auto_install_adb: Tự động tải xuống và cài đặt ADB nếu không tìm thấy
-        """
+            transport: Cơ chế thực thi lệnh. "subprocess" tạo một tiến trình adb cho mỗi lệnh;
+                "socket" gửi lệnh shell/exec-out trực tiếp tới ADB server (tcp:5037) và
+                chỉ dùng tiến trình adb cho các lệnh còn lại hoặc khi server không khả dụng
+            shell_session: Chạy các lệnh "shell ..." qua một phiên adb shell dài hạn
+                (tự khởi động lại nếu bị dừng) thay vì một tiến trình/kết nối cho mỗi lệnh
+            async_workers: Số lệnh run_async/run_future chạy đồng thời tối đa
+            lazy: Hoãn việc kiểm tra ADB/thiết bị và cài đặt server tới lệnh đầu tiên
+                (hoặc tới khi gọi ensure_ready()/ready_future()) để khởi tạo tức thì
+            persistent_cache: Lưu các thông tin tĩnh (model, SDK, pm list features,
+                service list, mật độ màn hình, ...) xuống đĩa theo serial và
+                ro.build.fingerprint. True dùng thư mục cache của nền tảng, hoặc truyền
+                đường dẫn thư mục. Chỉ có tác dụng khi cache_enabled=True
+        """
+        if transport not in ("subprocess", "socket"):
+            raise ValueError(f"Unsupported transport: {transport}")
+        
         self.device_id = device_id
         self.timeout = timeout
         self.cache_enabled = cache_enabled
         self.auto_install_adb = auto_install_adb
         self.local_server_port = None # Port forwarded on local machine
+        self.server_setup_timings: Dict[str, float] = {}
+        self._server_process: Optional[subprocess.Popen] = None
         
         # Lấy thông tin nền tảng
         self.platform_info = get_platform_info()
@@ -68,13 +120,122 @@ class MyADB:
         
         # Khởi tạo cache và executor
         self._cache = ResultCache() if cache_enabled else None
-        self._async_executor = AsyncCommandExecutor()
+        # Quy tắc TTL theo mẫu lệnh (thêm quy tắc riêng bằng ttl_policy.add_rule)
+        self.ttl_policy = TTLPolicy()
+        self.persistent_cache = persistent_cache
+        self._facts_store: Optional[DeviceFactsStore] = None
+        # Sau reboot/lệnh shell tùy ý: kiểm tra lại fingerprint trước khi dùng lại thông tin đã lưu
+        self._facts_recheck = False
+        # Snapshot getprop dùng chung cho mọi hàm đọc thuộc tính
+        self._properties: Optional[DeviceProperties] = None
+        self._properties_lock = threading.Lock()
+        # Hình học màn hình (kích thước, mật độ, góc xoay) dùng cho các thao tác vuốt/cuộn
+        self._display_info: Optional[DisplayInfo] = None
+        self._display_lock = threading.Lock()
+        self.display_revalidate_interval = DISPLAY_REVALIDATE_INTERVAL
+        # package -> component của activity khởi chạy (xem resolve_launcher_activity)
+        self._launcher_activities: Dict[str, str] = {}
+        # Danh mục package (pm list packages) dùng cho các truy vấn ứng dụng
+        self.package_inventory = PackageInventory(self)
+        # Bản dump giao diện gần nhất (xem get_ui_hierarchy)
+        self._ui_hierarchy: Optional[UIHierarchy] = None
+        self._ui_lock = threading.Lock()
+        self._ui_generation = 0
+        self.ui_hierarchy_max_age = DEFAULT_UI_MAX_AGE
+        self.ui_revalidate_interval = UI_REVALIDATE_INTERVAL
+        self._async_executor = AsyncCommandExecutor(max_workers=async_workers)
+        self._metrics = CommandMetrics()
+        self.transport = transport
+        self._transport = SocketTransport() if transport == "socket" else None
+        self.shell_session_enabled = shell_session
+        self._shell_session: Optional[ShellSession] = None
+        
+        # Trạng thái khởi tạo (kiểm tra ADB, chọn thiết bị, cài đặt server)
+        self.auto_start_server = auto_start_server
+        self._ready = False
+        # Luồng đang khởi tạo (và các luồng phụ của nó) không phải chờ ensure_ready
+        self._init_threads: Set[int] = set()
+        self._init_lock = threading.RLock()
+        self._ready_future: Optional[Future] = None
+        
+        if not lazy:
+            self.ensure_ready()
+
+    def ensure_ready(self) -> None:
+        """
+        Thực hiện các bước khởi tạo bị hoãn (kiểm tra ADB, chọn/kiểm tra thiết bị,
+        cài đặt server nếu auto_start_server). Chỉ chạy một lần; các lần gọi sau
+        không làm gì. Được gọi tự động trước lệnh đầu tiên khi lazy=True.
         
+        Raises:
+            ADBError: Nếu ADB không khả dụng hoặc cài đặt server thất bại
+            DeviceNotFoundError: Nếu không tìm thấy thiết bị
+        """
+        # Các lệnh do chính quá trình khởi tạo gửi đi không phải chờ
+        if self._ready or threading.get_ident() in self._init_threads:
+            return
+        with self._init_lock:
+            if self._ready:
+                return
+            ident = threading.get_ident()
+            self._init_threads.add(ident)
+            try:
+                self._initialize()
+                self._ready = True
+            finally:
+                self._init_threads.discard(ident)
+
+    def _init_task(self, func):
+        """
+        Bọc func để chạy trong luồng phụ như một phần của quá trình khởi tạo.
+        
+        Luồng khởi tạo giữ _init_lock trong khi chờ kết quả; lệnh do func gửi đi
+        vì vậy không được chờ ensure_ready.
+        """
+        if threading.get_ident() not in self._init_threads:
+            return func
+        
+        def _run_as_init(*args):
+            ident = threading.get_ident()
+            self._init_threads.add(ident)
+            try:
+                return func(*args)
+            finally:
+                self._init_threads.discard(ident)
+        return _run_as_init
+
+    def ready_future(self) -> Future:
+        """
+        Bắt đầu khởi tạo trong một luồng nền và trả về Future hoàn thành khi sẵn sàng.
+        
+        Returns:
+            concurrent.futures.Future có kết quả là chính đối tượng MyADB này
+            (hoặc lỗi khởi tạo)
+        """
+        with self._init_lock:
+            if self._ready_future is None:
+                future = Future()
+                
+                def _init_in_background():
+                    try:
+                        self.ensure_ready()
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(self)
+                
+                thread = threading.Thread(target=_init_in_background)
+                thread.daemon = True
+                thread.start()
+                self._ready_future = future
+            return self._ready_future
+
+    def _initialize(self) -> None:
         # Kiểm tra ADB đã được cài đặt
         self._check_adb_installed()
         
         # Kiểm tra thiết bị nếu đã chỉ định
-        if device_id:
+        if self.device_id:
             self._check_device()
         else:
             # Try to get the first device if none specified
@@ -82,12 +243,14 @@ class MyADB:
             if devices:
                 self.device_id = devices[0]
                 logger.info(f"No device ID specified, using first available device: {self.device_id}")
-                self._check_device() # Re-check with the selected device
             else:
-                raise DeviceNotFoundError("No devices found connected.")
+                raise DeviceNotFoundError()
+
+        if self.persistent_cache and self._cache:
+            self._load_device_facts()
 
         # Handle server setup
-        if auto_start_server:
+        if self.auto_start_server:
             self.setup_server()
 
     def _resolve_adb_path(self, custom_path: Optional[str] = None) -> str:
@@ -145,18 +308,18 @@ class MyADB:
     def _get_app_version_code(self, package_name: str) -> Optional[int]:
         """Get the version code of an installed package."""
         try:
-            output = self.run(f"shell dumpsys package {package_name}")
-            for line in output.splitlines():
-                if "versionCode=" in line:
-                    # Example line: versionCode=10 targetSdk=32
-                    parts = line.split()
-                    for part in parts:
-                        if part.startswith("versionCode="):
-                            return int(part.split("=")[1])
-            return None # Package found but versionCode not parsed
-        except (ADBCommandError, PackageNotFoundError):
+            return self.package_inventory.version_code(package_name)
+        except ADBCommandError:
             return None # Package not found
 
+    def _is_server_installed(self) -> bool:
+        """Check that both the server and its test (instrumentation) package are installed."""
+        try:
+            packages = self.package_inventory.packages()
+        except ADBCommandError:
+            return False
+        return SERVER_PACKAGE_NAME in packages and SERVER_TEST_PACKAGE_NAME in packages
+
     def _install_server(self) -> None:
         """Install or update the oiadb-server APK on the device."""
         apk_path = self._get_server_apk_path()
@@ -164,144 +327,198 @@ class MyADB:
         device_temp_dir = self.platform_info.get_device_temp_dir()
         target_apk_path = f"{device_temp_dir}/{SERVER_APK_FILENAME}"
         
-        # Get version code of bundled APK (requires parsing the APK, complex)
-        # For simplicity, we'll rely on checking installed versions first.
-        # A more robust solution would parse the bundled APK's manifest.
-        
-        installed_server_version = self._get_app_version_code(SERVER_PACKAGE_NAME)
-        installed_test_version = self._get_app_version_code(SERVER_TEST_PACKAGE_NAME)
-
-        # For now, let's always try to install/update if versions are missing or seem old.
-        # A simple check: if either package is missing, install.
-        # A better check would compare version codes if we could get the bundled APK's version.
-        if installed_server_version is None or installed_test_version is None:
-            logger.info("oiadb-server not fully installed. Installing...")
-            try:
-                # Push APK to device
-                self.push_file(apk_path, target_apk_path)
-                # Install APK
-                # Use -t to allow installing test packages, -r to replace, -g to grant permissions
-                install_output = self.run(f"shell pm install -t -r -g {target_apk_path}")
-                if "Success" not in install_output:
-                    raise InstallationError(SERVER_PACKAGE_NAME, f"Install command failed: {install_output}")
-                logger.info("oiadb-server installed successfully.")
-                # Clean up temporary file
-                self.run(f"shell rm {target_apk_path}")
-            except (FileOperationError, ADBCommandError, InstallationError) as e:
-                raise ADBError(f"Failed to install oiadb-server: {e}")
-        else:
-            logger.info("oiadb-server already installed.") # Add version check later
+        logger.info("oiadb-server not fully installed. Installing...")
+        try:
+            # Push APK to device
+            self.push_file(apk_path, target_apk_path)
+            # Install APK
+            # Use -t to allow installing test packages, -r to replace, -g to grant permissions
+            install_output = self.run(f"shell pm install -t -r -g {target_apk_path}")
+            if "Success" not in install_output:
+                raise InstallationError(SERVER_PACKAGE_NAME, f"Install command failed: {install_output}")
+            logger.info("oiadb-server installed successfully.")
+            # Clean up temporary file
+            self.run(f"shell rm {target_apk_path}")
+        except (FileOperationError, ADBCommandError, InstallationError) as e:
+            raise ADBError(f"Failed to install oiadb-server: {e}")
 
     def _is_server_running(self) -> bool:
         """Check if the instrumentation server process is running."""
         try:
-            # Check running instrumentations
-            output = self.run("shell ps -A | grep com.github.tiendung102k3.oiadb.server")
-            # Check if the specific instrumentation runner is active
-            # A more reliable check might involve querying the server port
-            return SERVER_PACKAGE_NAME in output
+            # pidof exits with a non-zero status when no process matches
+            output = self.run(f"shell pidof {SERVER_PACKAGE_NAME}", use_cache=False)
+            return bool(output.strip())
         except ADBCommandError:
-            return False # Error likely means it's not running
+            return False
 
     def _start_server(self) -> None:
-        """Start the oiadb-server instrumentation."""
-        if self._is_server_running():
-            logger.info("oiadb-server instrumentation is already running.")
-            return
-
+        """
+        Start the oiadb-server instrumentation and wait until the test runner reports
+        that the server test has started (INSTRUMENTATION_STATUS_CODE: 1).
+        """
         logger.info("Starting oiadb-server instrumentation...")
+        # -w keeps the instrumentation (and the server inside it) alive; -r prints raw status lines
+        command = f"shell am instrument -w -r -e debug false -e class {SERVER_CLASS_NAME} {SERVER_TEST_PACKAGE_NAME}/androidx.test.runner.AndroidJUnitRunner"
+        process_args = self.platform_info.create_process_args(
+            self._build_full_command(command),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0
+        )
         try:
-            # Start the instrumentation in the background
-            # Use am instrument -w to wait for startup, but run in background (&)
-            # The actual server runs as part of the test runner
-            command = f"shell am instrument -w -r -e debug false -e class {SERVER_CLASS_NAME} {SERVER_TEST_PACKAGE_NAME}/androidx.test.runner.AndroidJUnitRunner"
-            
-            # Sử dụng platform_utils để tạo đối số phù hợp với nền tảng
-            process_args = self.platform_info.create_process_args(
-                [self.adb_path, "-s", self.device_id] + command.split()[1:],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Run async without waiting for full command completion here, as it blocks
-            # We just need to start it. We'll check port forwarding later.
             process = subprocess.Popen(**process_args)
-            
-            # Wait a moment for the server to potentially start
-            time.sleep(5) 
-            # Check if process started okay (doesn't guarantee server is fully ready)
-            if process.poll() is not None and process.returncode != 0:
-                 stdout_bytes, stderr_bytes = process.communicate()
-                 stderr_output = stderr_bytes.decode(errors='ignore')
-                 raise ADBError(f"Failed to start server instrumentation. Error: {stderr_output}")
-            logger.info("Sent command to start oiadb-server.")
-            # Add a check here to confirm server is listening? Requires port forward first.
-        except Exception as e:
+        except OSError as e:
             raise ADBError(f"Failed to start oiadb-server: {e}")
+        self._server_process = process
+        
+        started = threading.Event()
+        output_tail: List[str] = []
+        failures: List[str] = []
+        
+        def _watch_output():
+            # Keeps draining the instrumentation output for as long as the server runs
+            for raw_line in iter(process.stdout.readline, b""):
+                line = raw_line.decode(errors="ignore").strip()
+                if not line:
+                    continue
+                logger.debug(f"[oiadb-server] {line}")
+                if started.is_set():
+                    continue
+                output_tail.append(line)
+                del output_tail[:-20]
+                if line.startswith("INSTRUMENTATION_STATUS_CODE:"):
+                    code = line.split(":", 1)[1].strip()
+                    if code == "1":
+                        started.set()
+                    elif code.startswith("-"):
+                        failures.append(line)
+                        started.set()
+                elif line.startswith(("INSTRUMENTATION_FAILED", "INSTRUMENTATION_ABORTED",
+                                      "INSTRUMENTATION_CODE", "INSTRUMENTATION_RESULT: shortMsg")):
+                    failures.append(line)
+                    started.set()
+            # Instrumentation ended: the server is not running any more
+            started.set()
+        
+        watcher = threading.Thread(target=_watch_output)
+        watcher.daemon = True
+        watcher.start()
+        
+        if not started.wait(SERVER_START_TIMEOUT):
+            raise ADBError(f"oiadb-server did not report start within {SERVER_START_TIMEOUT} seconds")
+        if failures or process.poll() is not None:
+            details = "\n".join(output_tail)
+            raise ADBError(f"Failed to start server instrumentation. Output: {details}")
+        logger.info("oiadb-server instrumentation started.")
 
     def _setup_port_forwarding(self) -> None:
         """Setup ADB port forwarding for the server."""
-        # Find an available local port (simple approach, might have race conditions)
-        import socket
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(("127.0.0.1", 0))
-            self.local_server_port = s.getsockname()[1]
-        
-        logger.info(f"Forwarding local port {self.local_server_port} to device port {SERVER_PORT}")
         try:
-            # Remove existing forwards for the device port first
-            self.run(f"forward --remove tcp:{SERVER_PORT}", use_cache=False)
-        except ADBCommandError:
-            pass # Ignore error if no forward existed
-        try:
-            # Setup the new forward
-            self.run(f"forward tcp:{self.local_server_port} tcp:{SERVER_PORT}", use_cache=False)
-            # Verify forward (optional but good practice)
-            forward_list = self.run("forward --list", use_cache=False)
-            if f"{self.device_id} tcp:{self.local_server_port} tcp:{SERVER_PORT}" not in forward_list:
-                raise ADBError("Failed to verify port forwarding setup.")
-            logger.info("Port forwarding setup complete.")
-            # Now, try to connect to the server to confirm it's running
-            self._check_server_connection()
+            # tcp:0 lets adb pick a free local port and print it (no bind/release race)
+            output = self.run(f"forward tcp:0 tcp:{SERVER_PORT}", use_cache=False).strip()
+            if output.isdigit():
+                self.local_server_port = int(output)
+            else:
+                # Older adb versions do not support tcp:0
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                    s.bind(("127.0.0.1", 0))
+                    self.local_server_port = s.getsockname()[1]
+                self.run(f"forward tcp:{self.local_server_port} tcp:{SERVER_PORT}", use_cache=False)
         except ADBCommandError as e:
             raise ADBError(f"Failed to setup port forwarding: {e}")
+        logger.info(f"Forwarding local port {self.local_server_port} to device port {SERVER_PORT}")
 
-    def _check_server_connection(self) -> None:
-        """Check if the server is responding on the forwarded port."""
+    def _ping_server(self, timeout: float = 0.5) -> bool:
+        """Send a single /ping to the server through the forwarded port."""
         if not self.local_server_port:
-            raise ADBError("Port forwarding not set up.")
+            return False
         
         import requests
-        server_url = f"http://127.0.0.1:{self.local_server_port}/ping"
-        max_retries = 5
-        retry_delay = 2
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"Pinging server at {server_url} (attempt {attempt + 1}/{max_retries})")
-                response = requests.get(server_url, timeout=5)
-                response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-                if response.ok:
-                    logger.info("Successfully connected to oiadb-server.")
-                    return
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Server ping failed: {e}. Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-            except Exception as e:
-                 logger.error(f"Unexpected error checking server connection: {e}")
-                 break # Don't retry on unexpected errors
-        
-        raise ADBError(f"Failed to connect to oiadb-server at {server_url} after {max_retries} attempts.")
-
-    def setup_server(self) -> None:
-        """Install, start, and setup port forwarding for the oiadb-server."""
         try:
-            self._install_server()
-            self._start_server()
-            self._setup_port_forwarding()
-            # Connection check is done within _setup_port_forwarding
+            response = requests.get(f"http://127.0.0.1:{self.local_server_port}/ping", timeout=timeout)
+            return response.ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def _wait_for_server(self) -> None:
+        """Poll /ping with exponential backoff until the server answers."""
+        if not self.local_server_port:
+            raise ADBError("Port forwarding not set up.")
+        
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        delay_ms = SERVER_PING_INITIAL_DELAY_MS
+        attempts = 0
+        while True:
+            attempts += 1
+            if self._ping_server():
+                logger.info(f"Successfully connected to oiadb-server after {attempts} ping(s).")
+                return
+            process = self._server_process
+            if process is not None and process.poll() is not None:
+                raise ADBError("oiadb-server instrumentation exited before the server became reachable.")
+            if time.monotonic() + delay_ms / 1000.0 > deadline:
+                break
+            time.sleep(delay_ms / 1000.0)
+            delay_ms = min(delay_ms * 2, SERVER_PING_MAX_DELAY_MS)
+        
+        raise ADBError(f"Failed to connect to oiadb-server on port {self.local_server_port} "
+                       f"after {attempts} attempts.")
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], phase: str, func, *args):
+        """Run one setup phase and record its duration in milliseconds."""
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            timings[phase] = round((time.monotonic() - start) * 1000, 1)
+
+    def setup_server(self) -> Dict[str, float]:
+        """
+        Install, start, and setup port forwarding for the oiadb-server.
+        
+        Port forwarding and the installation check run concurrently. If the server
+        already answers /ping (warm device) nothing else is done; otherwise the APK is
+        installed if needed, the instrumentation is started and the forwarded port is
+        polled with exponential backoff until the server responds.
+        
+        Returns:
+            Per-phase timings in milliseconds (also kept in ``server_setup_timings``)
+        
+        Raises:
+            ADBError: If any phase fails
+        """
+        timings: Dict[str, float] = {}
+        total_start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            forward = pool.submit(self._init_task(self._timed), timings, "forward", self._setup_port_forwarding)
+            installed = pool.submit(self._init_task(self._timed), timings, "install_check",
+                                    self._is_server_installed)
+            forward.result()
+            
+            if self._timed(timings, "ping", self._ping_server):
+                logger.info("oiadb-server is already running.")
+            else:
+                if not installed.result():
+                    self._timed(timings, "install", self._install_server)
+                if self._timed(timings, "running_check", self._is_server_running):
+                    logger.info("oiadb-server instrumentation is already running.")
+                else:
+                    self._timed(timings, "start", self._start_server)
+                self._timed(timings, "ready", self._wait_for_server)
         except ADBError as e:
             logger.error(f"Server setup failed: {e}")
             raise # Re-raise the exception
+        finally:
+            pool.shutdown(wait=False)
+            timings["total"] = round((time.monotonic() - total_start) * 1000, 1)
+            self.server_setup_timings = timings
+        
+        logger.info("oiadb-server setup timings (ms): " +
+                    ", ".join(f"{phase}={ms}" for phase, ms in timings.items()))
+        return timings
 
     # --- Existing methods below --- 
 
@@ -358,68 +575,482 @@ class MyADB:
         Raises:
             ADBCommandError: Nếu lệnh thất bại
         """
-        # Kiểm tra cache
-        cache_key = f"{self.device_id}:{command}" if self.device_id else command
-        if self.cache_enabled and use_cache and self._cache:
-            cached_result = self._cache.get(cache_key)
-            if cached_result:
-                logger.debug(f"Using cached result for command: {command}")
-                return cached_result
+        self.ensure_ready()
         
-        # Tạo lệnh đầy đủ
-        full_command = [self.adb_path]
-        if self.device_id:
-            full_command.extend(["-s", self.device_id])
-        full_command.extend(command.split())
+        # Lệnh chỉ đọc đi qua cache: các lời gọi đồng thời giống nhau dùng chung một lần thực thi,
+        # kết quả được giữ lại theo TTL của lệnh (lệnh có TTL 0 chỉ được gộp, không được lưu)
+        if self.cache_enabled and use_cache and self._cache and not is_mutating_command(command):
+            if self._facts_recheck:
+                self._load_device_facts()
+            ttl = self.ttl_policy.ttl_for(command)
+            return self._cache.get_or_load(self._cache_key(command), lambda: self._load_for_cache(command, ttl),
+                                           ttl, read_tags(command))
         
-        # Thực thi lệnh
-        try:
-            logger.debug("Executing command: {}".format(" ".join(full_command)))
+        return self._run_checked(command)
+    
+    def _run_checked(self, command: str) -> str:
+        """Thực thi lệnh (không qua cache) và kiểm tra mã thoát."""
+        return_code, stdout_bytes, stderr_bytes = self._run_raw(command)
+        stdout_str = stdout_bytes.decode(errors='ignore')
+        stderr_str = stderr_bytes.decode(errors='ignore')
+        
+        if return_code != 0:
+            # Handle specific known non-fatal errors if necessary
+            # Example: adb forward --remove error when forward doesn't exist
+            if "cannot remove listener" in stderr_str and "forward --remove" in command:
+                logger.debug(f"Ignoring error for 'forward --remove': {stderr_str.strip()}")
+                return stdout_str # Return stdout even if stderr had this specific error
             
-            # Sử dụng platform_utils để tạo đối số phù hợp với nền tảng
-            process_args = self.platform_info.create_process_args(
-                full_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=self.timeout,
-                check=False # Don't raise CalledProcessError automatically
+            raise ADBCommandError(
+                command=" ".join(self._build_full_command(command)),
+                error_message=stderr_str,
+                return_code=return_code
+            )
+        
+        return stdout_str
+    
+    def _load_for_cache(self, command: str, ttl: float) -> str:
+        """Chạy lệnh cho cache; lưu thêm xuống đĩa nếu là thông tin tĩnh của thiết bị."""
+        output = self._run_checked(command)
+        self._persist_fact(command, output, ttl)
+        return output
+
+    def _persist_fact(self, command: str, output: str, ttl: float) -> None:
+        if (self._facts_store is not None and ttl == SESSION_TTL
+                and command.split()[0] in ("shell", "exec-out")):
+            self._facts_store.put(command, output)
+
+    def _cache_store(self, command: str, output: str) -> None:
+        """Lưu kết quả lệnh đọc (đã chạy ở nơi khác, ví dụ trong batch) vào cache."""
+        ttl = self.ttl_policy.ttl_for(command)
+        self._cache.set(self._cache_key(command), output, ttl, read_tags(command))
+        self._persist_fact(command, output, ttl)
+
+    def _load_device_facts(self) -> None:
+        """
+        Nạp thông tin tĩnh đã lưu trên đĩa của thiết bị hiện tại vào cache.
+        
+        Chỉ tốn một lệnh getprop ro.build.fingerprint để kiểm tra dữ liệu còn hợp lệ.
+        Cũng được gọi lại sau một lệnh có thể thay đổi mọi thứ (reboot, ...): dữ liệu
+        chỉ bị bỏ nếu fingerprint đã đổi.
+        """
+        if not self.device_id:
+            return
+        
+        command = "shell getprop ro.build.fingerprint"
+        try:
+            fingerprint = self._run_checked(command).strip()
+        except ADBCommandError as e:
+            logger.debug(f"Cannot read build fingerprint, persistent cache disabled: {e}")
+            return
+        if not fingerprint:
+            return
+        self._facts_recheck = False
+        
+        cache_dir = (self.persistent_cache if isinstance(self.persistent_cache, str)
+                     else self.platform_info.get_cache_dir())
+        self._facts_store = DeviceFactsStore(cache_dir, self.device_id, fingerprint)
+        self._cache.set(self._cache_key(command), fingerprint + "\n", SESSION_TTL, read_tags(command))
+        
+        facts = self._facts_store.facts()
+        for fact_command, output in facts.items():
+            self._cache.set(self._cache_key(fact_command), output, SESSION_TTL, read_tags(fact_command))
+        logger.debug(f"Loaded {len(facts)} device facts for {self.device_id} from {self._facts_store.path}")
+
+    def _cache_key(self, command: str) -> str:
+        """Tạo khóa cache cho lệnh trên thiết bị hiện tại."""
+        return f"{self.device_id}:{command}" if self.device_id else command
+
+    def run_bytes(self, command: str) -> bytes:
+        """
+        Chạy lệnh ADB và trả về stdout dạng bytes, không giải mã/mã hóa lại.
+
+        Dùng cho dữ liệu nhị phân (ảnh, file, video). Kết quả không được cache.
+
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+
+        Returns:
+            Stdout của lệnh dưới dạng bytes
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại
+        """
+        result = self.run_result(command, binary=True)
+        if not result.success:
+            raise ADBCommandError(
+                command=" ".join(self._build_full_command(command)),
+                error_message=result.stderr,
+                return_code=result.return_code
             )
+        return result.stdout
+
+    def exec_out(self, command: str) -> bytes:
+        """
+        Chạy lệnh trên thiết bị bằng "adb exec-out" (không qua PTY, không chuyển đổi
+        ký tự xuống dòng) và trả về stdout dạng bytes.
+
+        Args:
+            command: Lệnh trên thiết bị (ví dụ: "screencap -p", "cat /sdcard/a.bin")
+
+        Returns:
+            Stdout của lệnh dưới dạng bytes
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại
+        """
+        return self.run_bytes(f"exec-out {command}")
+
+    def run_result(self, command: str, binary: bool = False) -> CommandResult:
+        """
+        Chạy lệnh ADB và trả về CommandResult mà không phát sinh lỗi khi mã thoát khác 0.
+
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            binary: True để giữ stdout dạng bytes (BytesCommandResult)
+
+        Returns:
+            CommandResult (hoặc BytesCommandResult nếu binary=True)
+
+        Raises:
+            ADBCommandError: Nếu lệnh không thể thực thi hoặc vượt quá thời gian chờ
+        """
+        return_code, stdout_bytes, stderr_bytes = self._run_raw(command)
+        stderr_str = stderr_bytes.decode(errors='ignore')
+        if binary:
+            return BytesCommandResult(command, stdout_bytes, stderr_str, return_code)
+        return CommandResult(command, stdout_bytes.decode(errors='ignore'), stderr_str, return_code)
+
+    def batch(self, use_cache: bool = True) -> CommandBatch:
+        """
+        Tạo batch gộp nhiều lệnh shell thành một lần gọi "shell" duy nhất.
+        
+        Các lệnh được gửi khi thoát khỏi khối ``with``; stdout, stderr và mã thoát
+        được tách riêng cho từng lệnh.
+        
+        Args:
+            use_cache: Dùng cache kết quả cho các lệnh trong batch
             
-            result = subprocess.run(**process_args)
-            stdout_str = result.stdout.decode(errors='ignore')
-            stderr_str = result.stderr.decode(errors='ignore')
+        Returns:
+            CommandBatch dùng làm context manager
             
-            if result.returncode != 0:
-                # Handle specific known non-fatal errors if necessary
-                # Example: adb forward --remove error when forward doesn't exist
-                if "cannot remove listener" in stderr_str and "forward --remove" in command:
-                    logger.debug(f"Ignoring error for 'forward --remove': {stderr_str.strip()}")
-                    return stdout_str # Return stdout even if stderr had this specific error
-                
+        Example:
+            with adb.batch() as b:
+                model = b.shell("getprop ro.product.model")
+                size = b.shell("wm size")
+            print(model.result(), size.result())
+        """
+        self.ensure_ready()
+        return CommandBatch(self, use_cache=use_cache)
+
+    def run_stream(self, command: str, chunk_size: int = 65536,
+                   lines: bool = True) -> Iterator[Union[str, bytes]]:
+        """
+        Chạy lệnh ADB và trả về đầu ra dần dần khi nó tới, với bộ nhớ không đổi.
+
+        Phù hợp cho các lệnh có đầu ra lớn hoặc không kết thúc (logcat, dumpsys,
+        bugreport, screenrecord ra stdout). Dừng vòng lặp sớm (break, close())
+        sẽ dừng tiến trình/kết nối tương ứng. Kết quả không được cache.
+
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            chunk_size: Kích thước tối đa của mỗi lần đọc (byte)
+            lines: True để trả về từng dòng (str, đã bỏ ký tự xuống dòng),
+                False để trả về các khối bytes thô
+
+        Returns:
+            Iterator các dòng (str) hoặc khối dữ liệu (bytes)
+
+        Raises:
+            ADBCommandError: Nếu không thể bắt đầu lệnh, hoặc (khi lặp hết) lệnh
+                kết thúc với mã lỗi khác 0
+
+        Example:
+            for line in adb.run_stream("logcat -v brief"):
+                if "FATAL" in line:
+                    break
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        chunks = self._metered_stream(command, self._stream_raw(command, chunk_size))
+        if lines:
+            return self._iter_lines(chunks)
+        return chunks
+
+    def _metered_stream(self, command: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Đếm số byte của luồng cho stats()."""
+        received = 0
+        try:
+            for chunk in chunks:
+                received += len(chunk)
+                yield chunk
+        finally:
+            self._metrics.record_stream(command, received)
+
+    def _stream_raw(self, command: str, chunk_size: int) -> Iterator[bytes]:
+        """Bắt đầu lệnh dạng luồng bằng transport phù hợp."""
+        self.ensure_ready()
+        self._invalidate_for(command)
+        full_command = self._build_full_command(command)
+        logger.debug("Streaming command: {}".format(" ".join(full_command)))
+
+        if (self._transport is not None and self._transport.supports(command)
+                and command.split()[0] in ("shell", "exec-out")):
+            try:
+                packets = self._transport.stream(command, self.device_id, chunk_size)
+            except (ADBServerError, OSError) as e:
+                logger.debug(f"Socket transport unavailable, falling back to subprocess: {e}")
+            else:
+                return self._iter_socket_stream(full_command, packets)
+
+        process_args = self.platform_info.create_process_args(
+            full_command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        try:
+            process = subprocess.Popen(**process_args)
+        except OSError as e:
+            raise ADBCommandError(
+                command=" ".join(full_command),
+                error_message=str(e),
+                return_code=-1
+            )
+        return self._iter_process_stream(full_command, process, chunk_size)
+
+    def _iter_process_stream(self, full_command: List[str], process: subprocess.Popen,
+                             chunk_size: int) -> Iterator[bytes]:
+        stderr_tail = bytearray()
+
+        def _drain_stderr():
+            # Chỉ giữ phần cuối của stderr để bộ nhớ không tăng theo đầu ra
+            for data in iter(lambda: process.stderr.read(chunk_size), b""):
+                stderr_tail.extend(data)
+                del stderr_tail[:-STREAM_STDERR_LIMIT]
+
+        stderr_thread = threading.Thread(target=_drain_stderr)
+        stderr_thread.daemon = True
+        stderr_thread.start()
+
+        try:
+            while True:
+                # bufsize=0: read() trả về ngay khi có dữ liệu, tối đa chunk_size byte
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            process.wait()
+            stderr_thread.join()
+            if process.returncode != 0:
                 raise ADBCommandError(
                     command=" ".join(full_command),
-                    error_message=stderr_str,
-                    return_code=result.returncode
+                    error_message=stderr_tail.decode(errors='ignore'),
+                    return_code=process.returncode
                 )
+        finally:
+            if process.poll() is None:
+                self.platform_info.kill_process(process)
+            process.stdout.close()
+            process.stderr.close()
+
+    def _iter_socket_stream(self, full_command: List[str],
+                            packets: Iterator[Tuple[int, bytes]]) -> Iterator[bytes]:
+        stderr_tail = bytearray()
+        try:
+            for packet_id, data in packets:
+                if packet_id == SHELL_ID_STDOUT:
+                    yield data
+                elif packet_id == SHELL_ID_STDERR:
+                    stderr_tail.extend(data)
+                    del stderr_tail[:-STREAM_STDERR_LIMIT]
+                elif packet_id == SHELL_ID_EXIT:
+                    return_code = data[0] if data else 0
+                    if return_code != 0:
+                        raise ADBCommandError(
+                            command=" ".join(full_command),
+                            error_message=stderr_tail.decode(errors='ignore'),
+                            return_code=return_code
+                        )
+        finally:
+            packets.close()
+
+    @staticmethod
+    def _iter_lines(chunks: Iterator[bytes]) -> Iterator[str]:
+        """Tách luồng bytes thành các dòng văn bản."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        pending = ""
+        try:
+            for chunk in chunks:
+                pending += decoder.decode(chunk)
+                parts = pending.split("\n")
+                pending = parts.pop()
+                for line in parts:
+                    yield line.rstrip("\r")
+            pending += decoder.decode(b"", final=True)
+            if pending:
+                yield pending.rstrip("\r")
+        finally:
+            chunks.close()
+
+    def _run_raw(self, command: str, track_mutations: bool = True) -> Tuple[int, bytes, bytes]:
+        """
+        Thực thi lệnh ADB mà không kiểm tra mã thoát và không dùng cache.
+        
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            track_mutations: Xóa các kết quả cache bị lệnh làm thay đổi sau khi chạy
             
-            # Lưu vào cache nếu thành công
-            if self.cache_enabled and use_cache and self._cache:
-                self._cache.set(cache_key, stdout_str)
+        Returns:
+            Tuple (return_code, stdout, stderr)
             
-            return stdout_str
+        Raises:
+            ADBCommandError: Nếu lệnh không thể thực thi hoặc vượt quá thời gian chờ
+        """
+        self.ensure_ready()
+        
+        # Tạo lệnh đầy đủ
+        full_command = self._build_full_command(command)
         
-        except subprocess.TimeoutExpired:
+        start = time.monotonic()
+        result = None
+        try:
+            logger.debug("Executing command: {}".format(" ".join(full_command)))
+            result = self._execute(command, full_command)
+            return result
+        except (subprocess.TimeoutExpired, socket.timeout):
             raise ADBCommandError(
                 command=" ".join(full_command),
                 error_message=f"Command timed out after {self.timeout} seconds",
                 return_code=-1
             )
+        except ADBCommandError:
+            raise
         except Exception as e:
             raise ADBCommandError(
                 command=" ".join(full_command),
                 error_message=str(e),
                 return_code=-1
             )
+        finally:
+            if result is None:
+                self._metrics.record(command, time.monotonic() - start, 0, False)
+            else:
+                self._metrics.record(command, time.monotonic() - start,
+                                     len(result[1]) + len(result[2]), result[0] == 0)
+            # Lệnh lỗi vẫn có thể đã thay đổi một phần trạng thái thiết bị
+            if track_mutations:
+                self._invalidate_for(command)
+    
+    def _invalidate_for(self, command: str) -> None:
+        """Xóa các kết quả cache phụ thuộc vào dữ liệu mà lệnh làm thay đổi."""
+        tags = invalidation_tags(command)
+        if not tags:
+            return
+        if tags_overlap(frozenset({TAG_PROPS}), tags):
+            self._properties = None
+        if tags_overlap(frozenset({TAG_DISPLAY}), tags):
+            self._display_info = None
+        if tags_overlap(frozenset({TAG_UI}), tags):
+            self._ui_generation += 1
+            self._ui_hierarchy = None
+        for package_name in list(self._launcher_activities):
+            if tags_overlap(frozenset({package_tag(package_name)}), tags):
+                self._launcher_activities.pop(package_name, None)
+        self.package_inventory.invalidate(tags)
+        if self._cache:
+            removed = self._cache.invalidate_tags(tags)
+            if self._facts_store is not None:
+                removed += self._facts_store.invalidate_tags(tags)
+                if TAG_ALL in tags:
+                    self._facts_recheck = True
+            logger.debug(f"Invalidated {removed} cached result(s) for tags {sorted(tags)}")
+    
+    def _build_full_command(self, command: str) -> List[str]:
+        """
+        Tạo danh sách đối số đầy đủ của tiến trình adb cho một lệnh.
+        
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+            
+        Returns:
+            Danh sách đối số bao gồm đường dẫn adb và serial thiết bị
+        """
+        full_command = [self.adb_path]
+        if self.device_id:
+            full_command.extend(["-s", self.device_id])
+        full_command.extend(command.split())
+        return full_command
+    
+    def _execute(self, command: str, full_command: List[str]) -> Tuple[int, bytes, bytes]:
+        """
+        Thực thi lệnh bằng transport đã chọn.
+        
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+            full_command: Danh sách đối số đầy đủ cho tiến trình adb
+            
+        Returns:
+            Tuple (return_code, stdout, stderr)
+        """
+        if self.shell_session_enabled:
+            parts = command.split()
+            if len(parts) > 1 and parts[0] == "shell" and not parts[1].startswith("-"):
+                session = self._get_shell_session()
+                # Không có shell_v2: dùng một tiến trình cho mỗi lệnh như bình thường
+                if session.is_supported():
+                    return session.run(" ".join(parts[1:]), self.timeout)
+        
+        if self._transport is not None and self._transport.supports(command):
+            try:
+                return self._transport.execute(command, self.device_id, self.timeout)
+            except ADBServerError as e:
+                # Tiến trình adb sẽ tự khởi động ADB server nếu cần
+                logger.debug(f"Socket transport unavailable, falling back to subprocess: {e}")
+        
+        # Sử dụng platform_utils để tạo đối số phù hợp với nền tảng
+        process_args = self.platform_info.create_process_args(
+            full_command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=self.timeout,
+            check=False # Don't raise CalledProcessError automatically
+        )
+        
+        result = subprocess.run(**process_args)
+        return result.returncode, result.stdout, result.stderr
+    
+    def _get_shell_session(self) -> ShellSession:
+        """Lấy (hoặc tạo) phiên shell dài hạn của thiết bị hiện tại."""
+        if self._shell_session is None or self._shell_session.device_id != self.device_id:
+            if self._shell_session is not None:
+                self._shell_session.close()
+            self._shell_session = ShellSession(self.adb_path, self.device_id)
+        return self._shell_session
+    
+    def has_shell_v2(self) -> bool:
+        """
+        Kiểm tra thiết bị có hỗ trợ giao thức shell v2 (stderr tách riêng, có mã thoát).
+        
+        Kết quả được nhớ theo thiết bị (truy vấn "features" một lần).
+        
+        Returns:
+            True nếu adbd hỗ trợ shell_v2
+        """
+        if self._transport is not None:
+            try:
+                return self._transport.has_shell_v2(self.device_id, self.timeout)
+            except ADBServerError as e:
+                logger.debug(f"Socket transport unavailable, querying features via adb: {e}")
+        return self._get_shell_session().is_supported()
+    
+    def close(self) -> None:
+        """Giải phóng các tài nguyên dài hạn (phiên shell, ...)."""
+        if self._shell_session is not None:
+            self._shell_session.close()
+            self._shell_session = None
     
     def run_async(self, command: str, callback=None) -> str:
         """
@@ -433,28 +1064,50 @@ class MyADB:
             ID của lệnh bất đồng bộ
         """
         # Tạo ID duy nhất cho lệnh
-        import uuid
         command_id = str(uuid.uuid4())
+        self._submit_async(command_id, command, callback)
+        return command_id
+    
+    def run_future(self, command: str, callback=None) -> Future:
+        """
+        Chạy lệnh ADB bất đồng bộ và trả về Future.
         
-        # Tạo lệnh đầy đủ
-        full_command = [self.adb_path]
-        if self.device_id:
-            full_command.extend(["-s", self.device_id])
-        full_command.extend(command.split())
+        Nếu hàng đợi của executor đã đầy, hàm sẽ chờ cho tới khi có chỗ trống.
         
-        # Thực thi lệnh bất đồng bộ
-        self._async_executor.execute(
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            callback: Hàm callback(CommandResult) khi lệnh hoàn thành
+            
+        Returns:
+            concurrent.futures.Future chứa CommandResult
+        """
+        return self._submit_async(str(uuid.uuid4()), command, callback)
+    
+    def _submit_async(self, command_id: str, command: str, callback=None) -> Future:
+        self.ensure_ready()
+        submitted_at = time.monotonic()
+        future = self._async_executor.execute(
             command_id=command_id,
-            command=full_command,
+            command=self._build_full_command(command),
             callback=callback,
             timeout=self.timeout
         )
-        
-        return command_id
+        future.add_done_callback(lambda f: self._on_async_done(command, f, submitted_at))
+        return future
+    
+    def _on_async_done(self, command: str, future: Future, submitted_at: float) -> None:
+        if future.cancelled():
+            return
+        result = future.result()
+        # Độ trễ của lệnh bất đồng bộ tính cả thời gian chờ trong hàng đợi
+        self._metrics.record(command, time.monotonic() - submitted_at,
+                             len(result.stdout) + len(result.stderr), result.success)
+        self._invalidate_for(command)
     
     def get_async_result(self, command_id: str) -> Optional[CommandResult]:
         """
-        Lấy kết quả của lệnh bất đồng bộ.
+        Lấy kết quả của lệnh bất đồng bộ. Kết quả chỉ được trả về một lần,
+        sau đó bị xóa khỏi bộ nhớ.
         
         Args:
             command_id: ID của lệnh
@@ -488,10 +1141,57 @@ class MyADB:
         """
         return self._async_executor.kill(command_id)
     
-    def clear_cache(self) -> None:
-        """Xóa toàn bộ cache."""
+    def clear_cache(self, persistent: bool = False) -> None:
+        """
+        Xóa toàn bộ cache.
+        
+        Args:
+            persistent: Xóa cả thông tin thiết bị đã lưu trên đĩa (persistent_cache)
+        """
         if self.cache_enabled and self._cache:
             self._cache.clear()
+        if persistent and self._facts_store is not None:
+            self._facts_store.clear()
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Lấy thống kê cache (hits, misses, coalesced, ...).
+        
+        Returns:
+            Dictionary thống kê, rỗng nếu cache bị tắt
+        """
+        if self.cache_enabled and self._cache:
+            return self._cache.stats()
+        return {}
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Lấy số liệu thống kê của cache, các lệnh đã chạy và executor bất đồng bộ.
+        
+        Chi phí ghi nhận rất thấp nên có thể luôn bật.
+        
+        Returns:
+            Dictionary gồm:
+                cache: hits, misses, evictions, invalidations, coalesced, size, bytes
+                commands: calls, errors, streams, bytes_sent, bytes_received,
+                    latency_ms (p50/p95/p99/max/mean), by_prefix (calls, errors, mean_ms
+                    theo tiền tố lệnh, ví dụ "shell input")
+                async: in_flight, running, queued, submitted, completed, pending_results
+                transport: cơ chế thực thi lệnh đang dùng
+        """
+        return {
+            "cache": self.cache_stats(),
+            "commands": self._metrics.snapshot(),
+            "async": self._async_executor.stats(),
+            "transport": "shell_session" if self.shell_session_enabled else self.transport,
+        }
+    
+    def reset_stats(self) -> None:
+        """Đặt lại các số liệu thống kê (không xóa dữ liệu trong cache)."""
+        self._metrics.reset()
+        self._async_executor.reset_stats()
+        if self.cache_enabled and self._cache:
+            self._cache.reset_stats()
     
     def get_devices(self) -> str:
         """
@@ -658,6 +1358,76 @@ class MyADB:
         except ADBCommandError as e:
             raise FileOperationError("pull", remote_path, local_path, e.error_message)
     
+    def get_properties(self, refresh: bool = False,
+                       max_age: Optional[float] = None) -> DeviceProperties:
+        """
+        Lấy snapshot thuộc tính hệ thống (một lệnh "getprop" cho mọi thuộc tính).
+        
+        Snapshot được dùng lại cho tới khi gọi với refresh=True, khi cũ hơn max_age
+        hoặc khi một lệnh ghi (setprop, reboot, ...) làm nó mất hiệu lực. Lệnh
+        "getprop" đi qua cache kết quả như mọi lệnh đọc khác (nhãn props).
+        
+        Args:
+            refresh: Bắt buộc đọc lại từ thiết bị
+            max_age: Tuổi tối đa (giây) của snapshot được chấp nhận; None để không giới hạn
+            
+        Returns:
+            DeviceProperties
+            
+        Raises:
+            ADBCommandError: Nếu lệnh getprop thất bại
+        """
+        with self._properties_lock:
+            properties = self._properties
+            if properties is None and not refresh:
+                # Snapshot bị xóa (hoặc chưa có): dùng kết quả getprop trong cache nếu còn
+                properties = DeviceProperties.from_output(self.run("shell getprop"))
+                self._properties = properties
+            if refresh or (max_age is not None and properties.age > max_age):
+                output = self.run("shell getprop", use_cache=False)
+                if self._cache:
+                    self._cache_store("shell getprop", output)
+                properties = DeviceProperties.from_output(output)
+                self._properties = properties
+            return properties
+    
+    def get_prop(self, name: str, default: str = "") -> str:
+        """
+        Lấy giá trị một thuộc tính hệ thống từ snapshot getprop.
+        
+        Thuộc tính chỉ đọc (ro.*) không đổi trong phiên; các thuộc tính khác được đọc
+        lại khi snapshot cũ hơn thời gian sống mặc định của cache (hoặc luôn đọc lại
+        khi cache bị tắt).
+        
+        Args:
+            name: Tên thuộc tính (ví dụ "ro.product.model")
+            default: Giá trị trả về nếu thuộc tính không tồn tại
+            
+        Returns:
+            Giá trị thuộc tính
+        """
+        if name.startswith("ro."):
+            return self._get_read_only_prop(name, default)
+        max_age = DEFAULT_TTL if self.cache_enabled else 0
+        return self.get_properties(max_age=max_age).get(name, default)
+    
+    def _get_read_only_prop(self, name: str, default: str) -> str:
+        """
+        Lấy thuộc tính ro.* qua cache "getprop <name>" (thời gian sống cả phiên, được lưu
+        xuống đĩa khi bật persistent_cache), rồi mới tới snapshot getprop.
+        """
+        command = f"shell getprop {name}"
+        if self._facts_recheck:
+            self._load_device_facts()
+        if self._cache and self._properties is None:
+            cached = self._cache.get(self._cache_key(command))
+            if cached is not None:
+                return cached.strip() or default
+        properties = self.get_properties()
+        if self._cache and name in properties and self._cache.get(self._cache_key(command)) is None:
+            self._cache_store(command, properties.get(name) + "\n")
+        return properties.get(name, default)
+    
     def get_device_info(self) -> Dict[str, str]:
         """
         Lấy thông tin thiết bị.
@@ -669,41 +1439,98 @@ class MyADB:
             # Use server RPC call if available for potentially richer info
             # Example: info = self._server_rpc_call("deviceInfo")
             # Fallback to getprop for now
-            output = self.run("shell getprop")
-            properties = {}
-            
-            for line in output.splitlines():
-                line = line.strip()
-                if not line or ": " not in line:
-                    continue
-                
-                # Handle format like [ro.product.brand]: [google]
-                if line.startswith("[") and "]: [" in line:
-                    key_part, value_part = line.split("]: [", 1)
-                    key = key_part[1:]
-                    value = value_part[:-1]
-                    properties[key] = value
-                # Handle simpler format if needed (though getprop usually uses the above)
-                # elif ": " in line:
-                #     key, value = line.split(": ", 1)
-                #     properties[key] = value
-
-            return properties
+            max_age = DEFAULT_TTL if self.cache_enabled else 0
+            return self.get_properties(max_age=max_age).as_dict()
         except ADBCommandError as e:
             logger.error(f"Error getting device info: {e}")
             return {}
     
-    def start_app(self, package_name: str, activity: Optional[str] = None) -> str:
+    def resolve_launcher_activity(self, package_name: str, refresh: bool = False) -> Optional[str]:
+        """
+        Tìm activity khởi chạy (MAIN/LAUNCHER) của ứng dụng.
+        
+        Kết quả được cache theo package và bị xóa khi package được cài đặt lại, gỡ bỏ,
+        bật/tắt qua MyADB (hoặc khi refresh=True).
+        
+        Args:
+            package_name: Tên package của ứng dụng
+            refresh: Bỏ qua cache và tìm lại trên thiết bị
+            
+        Returns:
+            Component dạng "package/activity" hoặc None nếu ứng dụng không có activity khởi chạy
+        """
+        if not refresh:
+            component = self._launcher_activities.get(package_name)
+            if component is not None:
+                return component
+        
+        component = None
+        try:
+            output = self.run(
+                "shell cmd package resolve-activity --brief "
+                f"-a android.intent.action.MAIN -c android.intent.category.LAUNCHER {package_name}",
+                use_cache=False
+            )
+            component = self._parse_resolved_component(output, package_name)
+        except ADBCommandError as e:
+            logger.debug(f"resolve-activity failed for {package_name}: {e}")
+        
+        if component is None:
+            # Android cũ không có "cmd package resolve-activity"
+            try:
+                output = self.run(f"shell dumpsys package {package_name}")
+                component = self._parse_launcher_from_dumpsys(output, package_name)
+            except ADBCommandError as e:
+                logger.debug(f"dumpsys package failed for {package_name}: {e}")
+        
+        if component is not None:
+            self._launcher_activities[package_name] = component
+        return component
+    
+    @staticmethod
+    def _parse_resolved_component(output: str, package_name: str) -> Optional[str]:
+        """Lấy component từ đầu ra của "cmd package resolve-activity --brief"."""
+        for line in reversed(output.strip().splitlines()):
+            line = line.strip()
+            if line.startswith(package_name + "/"):
+                return line
+        return None
+    
+    @staticmethod
+    def _parse_launcher_from_dumpsys(output: str, package_name: str) -> Optional[str]:
+        """Tìm activity có intent filter MAIN + LAUNCHER trong "dumpsys package"."""
+        component = None
+        has_main = False
+        for line in output.splitlines():
+            line = line.strip()
+            # Dòng mở đầu một filter: "<hash> com.foo/.MainActivity filter <hash>"
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "filter" and parts[1].startswith(package_name + "/"):
+                component = parts[1]
+                has_main = False
+            elif component and line == 'Action: "android.intent.action.MAIN"':
+                has_main = True
+            elif component and has_main and line == 'Category: "android.intent.category.LAUNCHER"':
+                return component
+        return None
+    
+    def start_app(self, package_name: str, activity: Optional[str] = None, wait: bool = False) -> str:
         """
         Khởi động ứng dụng.
         
+        Khi không chỉ định activity, activity khởi chạy được tìm một lần (xem
+        resolve_launcher_activity) rồi khởi động trực tiếp bằng "am start -n", nhanh hơn
+        nhiều so với "monkey".
+        
         Args:
             package_name: Tên package của ứng dụng
             activity: Tên activity để khởi động (tùy chọn)
+            wait: Chờ activity hiển thị xong ("am start -W"); kết quả chứa TotalTime, WaitTime
             
         Returns:
             Kết quả lệnh
         """
+        am_start = "shell am start -W" if wait else "shell am start"
         # Consider using server's open.app method if available
         if activity:
             # Ensure activity name doesn't start with . if package is included
@@ -711,10 +1538,22 @@ class MyADB:
                  full_activity = package_name + activity
             else:
                  full_activity = activity # Assume full name provided
-            return self.run(f"shell am start -n {package_name}/{full_activity}")
-        else:
-            # Use monkey for finding launcher activity (less reliable than server method)
-            return self.run(f"shell monkey -p {package_name} -c android.intent.category.LAUNCHER 1")
+            return self.run(f"{am_start} -n {package_name}/{full_activity}")
+        
+        component = self.resolve_launcher_activity(package_name)
+        if component is not None:
+            output = self.run(f"{am_start} -n {component}")
+            if "Error" not in output:
+                return output
+            # Activity đã đổi (ứng dụng được cập nhật từ bên ngoài): tìm lại một lần
+            logger.debug(f"Cached launcher activity {component} failed to start, resolving again")
+            self._launcher_activities.pop(package_name, None)
+            component = self.resolve_launcher_activity(package_name, refresh=True)
+            if component is not None:
+                return self.run(f"{am_start} -n {component}")
+        
+        # Fallback: monkey tự tìm activity khởi chạy (chậm hơn)
+        return self.run(f"shell monkey -p {package_name} -c android.intent.category.LAUNCHER 1")
     
     def stop_app(self, package_name: str) -> str:
         """
@@ -752,20 +1591,13 @@ class MyADB:
             Phiên bản ứng dụng (versionName) or None if not found.
             
         Raises:
-            PackageNotFoundError: If dumpsys command fails significantly.
+            PackageNotFoundError: Nếu ứng dụng chưa được cài đặt hoặc dumpsys thất bại
         """
         try:
-            output = self.run(f"shell dumpsys package {package_name}")
-            for line in output.splitlines():
-                line = line.strip()
-                if line.startswith("versionName="):
-                    return line.split("=", 1)[1].strip()
-            
-            # If loop finishes without finding versionName, package might exist but lack info
-            # Check if package exists at all
-            if not self.is_app_installed(package_name):
-                 raise PackageNotFoundError(package_name)
-            return None # Package exists, but versionName not found in dumpsys
+            details = self.package_inventory.details(package_name)
+            if details is None:
+                raise PackageNotFoundError(package_name)
+            return details["version_name"]
         except ADBCommandError as e:
             # If dumpsys fails entirely, treat as package not found or inaccessible
             logger.warning(f"dumpsys package {package_name} failed: {e}")
@@ -782,70 +1614,55 @@ class MyADB:
             True nếu ứng dụng đã được cài đặt, False nếu không
         """
         try:
-            # pm list packages returns 'package:<n>'
-            output = self.run(f"shell pm list packages {package_name}")
-            return f"package:{package_name}" in output
+            return self.package_inventory.is_installed(package_name)
         except ADBCommandError:
             return False
     
     def take_screenshot(self, output_path: Optional[str] = None, 
                        as_bytes: bool = False) -> Union[str, bytes, None]:
         """
-        Chụp ảnh màn hình thiết bị.
+        Chụp ảnh màn hình thiết bị (PNG).
+        
+        Ảnh được đọc trực tiếp từ "exec-out screencap -p" dưới dạng bytes, không qua
+        file tạm trên thiết bị.
         
         Args:
             output_path: Đường dẫn lưu ảnh (tùy chọn)
             as_bytes: Trả về dữ liệu ảnh dưới dạng bytes thay vì lưu file
             
         Returns:
-            - Nếu output_path được cung cấp: Đường dẫn đến file ảnh đã lưu
             - Nếu as_bytes=True: Dữ liệu ảnh dưới dạng bytes
-            - Nếu cả hai: None
+            - Nếu output_path được cung cấp: Đường dẫn đến file ảnh đã lưu
+            - Nếu không: None
             
         Raises:
             ADBCommandError: Nếu lệnh thất bại
             FileOperationError: Nếu không thể lưu file
         """
-        # Sử dụng đường dẫn tạm thời phù hợp với thiết bị
-        device_temp_dir = self.platform_info.get_device_temp_dir()
-        remote_path = f"{device_temp_dir}/screenshot_oiadb.png"
-        
         try:
-            # Chụp ảnh màn hình
-            self.run(f"shell screencap -p {remote_path}")
-            
-            if as_bytes:
-                # Lấy dữ liệu ảnh dưới dạng bytes
-                output = self.run(f"exec-out cat {remote_path}")
-                # Xóa file tạm trên thiết bị
-                self.run(f"shell rm {remote_path}")
-                return output.encode('latin-1')  # Convert to bytes
+            data = self.exec_out("screencap -p")
+        except ADBCommandError as e:
+            logger.error(f"Screenshot failed: {e}")
+            raise
+        
+        if as_bytes:
+            return data
+        
+        if output_path:
+            # Chuẩn hóa đường dẫn output
+            output_path = self.platform_info.normalize_path(output_path)
             
-            if output_path:
-                # Chuẩn hóa đường dẫn output
-                output_path = self.platform_info.normalize_path(output_path)
-                
+            try:
                 # Đảm bảo thư mục cha tồn tại
                 os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-                
-                # Lấy ảnh về máy tính
-                self.pull_file(remote_path, output_path)
-                # Xóa file tạm trên thiết bị
-                self.run(f"shell rm {remote_path}")
-                return output_path
-            
-            # Nếu không cần lưu file hoặc trả về bytes, xóa file tạm
-            self.run(f"shell rm {remote_path}")
-            return None
-        
-        except (ADBCommandError, FileOperationError) as e:
-            logger.error(f"Screenshot failed: {e}")
-            # Cố gắng xóa file tạm nếu có lỗi
-            try:
-                self.run(f"shell rm {remote_path}")
-            except ADBCommandError:
-                pass  # Bỏ qua lỗi khi xóa file tạm
-            raise
+                with open(output_path, "wb") as f:
+                    f.write(data)
+            except OSError as e:
+                logger.error(f"Screenshot failed: {e}")
+                raise FileOperationError("save screenshot", output_path, error_message=str(e))
+            return output_path
+        
+        return None
 
     def record_screen(self, output_path: str, time_limit: int = 180, 
                      size: Optional[str] = None, bit_rate: Optional[int] = None) -> str:
@@ -964,34 +1781,97 @@ class MyADB:
         # Consider using server's swipe method
         return self.run(f"shell input swipe {x1} {y1} {x2} {y2} {duration}")
 
+    def get_display_info(self, refresh: bool = False) -> Optional[DisplayInfo]:
+        """
+        Lấy thông tin màn hình (kích thước, kích thước ghi đè, mật độ, góc xoay).
+        
+        Thông tin được cache theo thiết bị. Sau display_revalidate_interval giây, một lệnh
+        dò nhỏ ("dumpsys input" đã lọc) kiểm tra góc xoay/kích thước bề mặt: nếu chỉ góc
+        xoay đổi thì cập nhật tại chỗ, nếu kích thước đổi thì đọc lại toàn bộ. Các lệnh
+        "wm size"/"wm density"/"settings put" chạy qua MyADB xóa cache ngay lập tức.
+        
+        Args:
+            refresh: Bắt buộc đọc lại toàn bộ từ thiết bị
+            
+        Returns:
+            DisplayInfo hoặc None nếu không đọc được kích thước màn hình
+        """
+        with self._display_lock:
+            info = None if refresh else self._display_info
+            if info is not None and info.age >= self.display_revalidate_interval:
+                probe = self.run_result(f"shell {DISPLAY_PROBE_COMMAND}").stdout
+                info = info.with_probe(probe)
+            
+            if info is None:
+                with self.batch(use_cache=False) as b:
+                    wm_size = b.shell("wm size")
+                    wm_density = b.shell("wm density")
+                    probe = b.shell(DISPLAY_PROBE_COMMAND)
+                info = DisplayInfo.from_outputs(wm_size.stdout, wm_density.stdout, probe.stdout)
+            
+            self._display_info = info
+            return info
+    
     def get_screen_size(self) -> Optional[Dict[str, int]]:
         """
-        Lấy kích thước màn hình (width, height).
+        Lấy kích thước màn hình (width, height) theo hướng hiện tại.
         
         Returns:
             Dictionary {"width": w, "height": h} hoặc None nếu lỗi.
         """
         try:
-            # Try server method first
-            info = self._server_rpc_call("deviceInfo")
-            if info and "displayWidth" in info and "displayHeight" in info:
-                return {"width": info["displayWidth"], "height": info["displayHeight"]}
-        except (ADBError, ADBCommandError) as e:
-            logger.warning(f"RPC get screen size failed: {e}. Falling back to ADB.")
-        
-        # Fallback to ADB
-        try:
-            output = self.run("shell wm size")
-            # Output: Physical size: 1080x1920 or Override size: 1080x1920
-            size_line = output.splitlines()[-1] # Get the last line
-            if ":" in size_line:
-                size_str = size_line.split(":")[1].strip()
-                width, height = map(int, size_str.split("x"))
-                return {"width": width, "height": height}
-            return None
-        except (ADBCommandError, ValueError) as e:
+            info = self.get_display_info()
+        except ADBCommandError as e:
             logger.error(f"Failed to get screen size: {e}")
             return None
+        if info is None:
+            logger.error("Failed to get screen size: unrecognized 'wm size' output")
+            return None
+        return {"width": info.width, "height": info.height}
+    
+    def get_ui_hierarchy(self, refresh: bool = False, max_age: Optional[float] = None) -> Optional[UIHierarchy]:
+        """
+        Lấy cây giao diện hiện tại (đã phân tích) từ "uiautomator dump".
+        
+        Bản dump được cache theo thiết bị và bị xóa ngay khi một lệnh tương tác (input,
+        am, monkey, ...) chạy qua MyADB. Trong ui_revalidate_interval giây sau lần xác nhận
+        cuối, bản dump được dùng lại trực tiếp; sau đó, nếu chưa quá max_age giây, một lệnh
+        dò rẻ (cửa sổ đang focus + mã băm khung hình) quyết định có cần dump lại không.
+        
+        Args:
+            refresh: Bắt buộc dump lại
+            max_age: Tuổi tối đa (giây) của bản dump được dùng lại, mặc định
+                ui_hierarchy_max_age; 0 = luôn dump lại
+            
+        Returns:
+            UIHierarchy hoặc None nếu không dump được
+        """
+        from .commands.xml_dump import get_ui_xml_dump
+        
+        if max_age is None:
+            max_age = self.ui_hierarchy_max_age
+        with self._ui_lock:
+            hierarchy = None if refresh or max_age <= 0 else self._ui_hierarchy
+            if hierarchy is not None and hierarchy.age > max_age:
+                hierarchy = None
+            if hierarchy is not None and hierarchy.validated_age >= self.ui_revalidate_interval:
+                probe = self.run_result(f"shell {UI_PROBE_COMMAND}").stdout
+                if not hierarchy.matches_probe(probe):
+                    hierarchy = None
+            if hierarchy is not None:
+                return hierarchy
+            
+            generation = self._ui_generation
+            # Dò trước khi dump: nếu giao diện đổi trong lúc dump, lần dò sau sẽ khác
+            probe = self.run_result(f"shell {UI_PROBE_COMMAND}").stdout
+            xml = get_ui_xml_dump(self)
+            if not xml:
+                return None
+            hierarchy = UIHierarchy(xml, probe)
+            # Không lưu nếu có lệnh tương tác chạy trong lúc dump
+            if generation == self._ui_generation:
+                self._ui_hierarchy = hierarchy
+            return hierarchy
     
     def _server_rpc_call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
         """
@@ -0,0 +1,655 @@
+"""
+Phiên bản asyncio của MyADB.
+"""
+
+import os
+import asyncio
+import logging
+import subprocess
+from typing import Optional, List, Dict, Union, Tuple
+
+from .exceptions import (
+    ADBError, ADBCommandError, DeviceNotFoundError, PackageNotFoundError,
+    InstallationError, UninstallationError, FileOperationError
+)
+from .utils.advanced import ResultCache
+from .utils.cache_policy import TTLPolicy, is_mutating_command, read_tags, invalidation_tags
+from .utils.platform_utils import get_platform_info, ADBInstaller
+
+# Thiết lập logging
+logger = logging.getLogger("oiadb")
+
+
+class AsyncMyADB:
+    """
+    Client ADB dựa trên asyncio: các phương thức công khai của MyADB dưới dạng coroutine.
+
+    Mỗi lệnh chạy trong một tiến trình ``adb`` được tạo bằng
+    ``asyncio.create_subprocess_exec``, nên một event loop có thể giữ hàng trăm lệnh
+    cùng lúc mà không cần một luồng cho mỗi lệnh. Số tiến trình đồng thời được giới hạn
+    bởi ``max_concurrency``. Khi coroutine bị hủy hoặc hết thời gian chờ, tiến trình
+    ``adb`` tương ứng sẽ bị dừng.
+
+    Ví dụ:
+        async with AsyncMyADB("emulator-5554") as adb:
+            model, size = await asyncio.gather(
+                adb.shell("getprop ro.product.model"),
+                adb.shell("wm size"),
+            )
+
+    Attributes:
+        device_id (str): ID của thiết bị Android để tương tác
+        cache_enabled (bool): Bật/tắt cache kết quả lệnh
+        timeout (int): Thời gian chờ tối đa cho các lệnh (giây)
+        adb_path (str): Đường dẫn đến executable ADB
+        max_concurrency (int): Số tiến trình adb tối đa chạy cùng lúc
+    """
+
+    def __init__(self, device_id: Optional[str] = None, cache_enabled: bool = True,
+                 timeout: int = 30, adb_path: Optional[str] = None,
+                 auto_install_adb: bool = True, max_concurrency: int = 32):
+        """
+        Khởi tạo đối tượng AsyncMyADB. Không có lệnh nào được gửi tới thiết bị cho tới khi
+        ``connect()`` (hoặc ``async with``) hay một coroutine khác được gọi.
+
+        Args:
+            device_id: ID của thiết bị Android (serial number)
+            cache_enabled: Bật/tắt cache kết quả lệnh
+            timeout: Thời gian chờ tối đa cho các lệnh (giây)
+            adb_path: Đường dẫn tùy chỉnh đến executable ADB
+            auto_install_adb: Tự động tải xuống và cài đặt ADB nếu không tìm thấy
+            max_concurrency: Số tiến trình adb tối đa chạy cùng lúc
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.device_id = device_id
+        self.timeout = timeout
+        self.cache_enabled = cache_enabled
+        self.auto_install_adb = auto_install_adb
+        self.max_concurrency = max_concurrency
+
+        self.platform_info = get_platform_info()
+        self.adb_path = self._resolve_adb_path(adb_path)
+
+        self._cache = ResultCache() if cache_enabled else None
+        # Quy tắc TTL theo mẫu lệnh, giống MyADB (thêm quy tắc riêng bằng ttl_policy.add_rule)
+        self.ttl_policy = TTLPolicy()
+        # Semaphore được tạo trong event loop đang chạy (xem _get_semaphore)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _resolve_adb_path(self, custom_path: Optional[str] = None) -> str:
+        """Xác định đường dẫn đến ADB giống như MyADB."""
+        if custom_path:
+            if os.path.isfile(custom_path) and os.access(custom_path, os.X_OK):
+                return custom_path
+            logger.warning(f"Custom ADB path is invalid: {custom_path}")
+
+        adb_path = self.platform_info.find_adb_path()
+        if adb_path:
+            return adb_path
+
+        if self.auto_install_adb:
+            logger.info("ADB not found in system, attempting to install...")
+            adb_path = ADBInstaller().install_adb()
+            if adb_path:
+                return adb_path
+
+        logger.warning("Could not find or install ADB, falling back to 'adb' command")
+        return "adb"
+
+    async def connect(self) -> "AsyncMyADB":
+        """
+        Kiểm tra ADB và thiết bị; chọn thiết bị đầu tiên nếu chưa chỉ định.
+
+        Returns:
+            Chính đối tượng này
+
+        Raises:
+            ADBError: Nếu ADB không chạy được
+            DeviceNotFoundError: Nếu không tìm thấy thiết bị
+        """
+        return_code, _, stderr = await self._run_raw("version", with_device=False)
+        if return_code != 0:
+            raise ADBError(f"Không thể chạy ADB. Lỗi: {stderr.decode(errors='ignore')}")
+
+        devices = await self.get_devices_list()
+        if self.device_id:
+            if self.device_id not in devices:
+                raise DeviceNotFoundError(self.device_id)
+        elif devices:
+            self.device_id = devices[0]
+            logger.info(f"No device ID specified, using first available device: {self.device_id}")
+        else:
+            raise DeviceNotFoundError()
+        return self
+
+    async def close(self) -> None:
+        """Giải phóng tài nguyên (hiện chỉ xóa cache)."""
+        self.clear_cache()
+
+    async def __aenter__(self) -> "AsyncMyADB":
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    async def run(self, command: str, use_cache: bool = True,
+                  timeout: Optional[float] = None) -> str:
+        """
+        Chạy lệnh ADB và trả về kết quả dưới dạng chuỗi.
+
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            use_cache: Có sử dụng cache hay không
+            timeout: Thời gian chờ cho lệnh này (giây), mặc định là ``self.timeout``
+
+        Returns:
+            Kết quả lệnh dưới dạng chuỗi
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại hoặc hết thời gian chờ
+            asyncio.CancelledError: Nếu coroutine bị hủy (tiến trình adb đã bị dừng)
+        """
+        cache_key = self._cache_key(command)
+        # Như MyADB.run: chỉ lệnh đọc được cache, theo TTL của lệnh
+        cacheable = self.cache_enabled and use_cache and self._cache and not is_mutating_command(command)
+        if cacheable:
+            cached_result = self._cache.get(cache_key)
+            if cached_result is not None:
+                logger.debug(f"Using cached result for command: {command}")
+                return cached_result
+
+        return_code, stdout_bytes, stderr_bytes = await self._run_raw(command, timeout=timeout)
+        stdout_str = stdout_bytes.decode(errors='ignore')
+        stderr_str = stderr_bytes.decode(errors='ignore')
+
+        if return_code != 0:
+            if "cannot remove listener" in stderr_str and "forward --remove" in command:
+                logger.debug(f"Ignoring error for 'forward --remove': {stderr_str.strip()}")
+                return stdout_str
+
+            raise ADBCommandError(
+                command=" ".join(self._build_full_command(command)),
+                error_message=stderr_str,
+                return_code=return_code
+            )
+
+        if cacheable:
+            self._cache.set(cache_key, stdout_str, self.ttl_policy.ttl_for(command), read_tags(command))
+
+        return stdout_str
+
+    async def shell(self, command: str, use_cache: bool = True,
+                    timeout: Optional[float] = None) -> str:
+        """
+        Chạy lệnh shell trên thiết bị.
+
+        Args:
+            command: Lệnh shell (không bao gồm "adb shell")
+            use_cache: Có sử dụng cache hay không
+            timeout: Thời gian chờ cho lệnh này (giây)
+
+        Returns:
+            Kết quả lệnh dưới dạng chuỗi
+        """
+        return await self.run(f"shell {command}", use_cache=use_cache, timeout=timeout)
+
+    async def run_bytes(self, command: str, timeout: Optional[float] = None) -> bytes:
+        """
+        Chạy lệnh ADB và trả về stdout dạng bytes, không giải mã.
+
+        Args:
+            command: Lệnh ADB cần thực thi (không bao gồm "adb")
+            timeout: Thời gian chờ cho lệnh này (giây)
+
+        Returns:
+            Stdout của lệnh dưới dạng bytes
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại
+        """
+        return_code, stdout, stderr = await self._run_raw(command, timeout=timeout)
+        if return_code != 0:
+            raise ADBCommandError(
+                command=" ".join(self._build_full_command(command)),
+                error_message=stderr.decode(errors='ignore'),
+                return_code=return_code
+            )
+        return stdout
+
+    async def exec_out(self, command: str, timeout: Optional[float] = None) -> bytes:
+        """
+        Chạy lệnh trên thiết bị bằng "adb exec-out" và trả về stdout dạng bytes.
+
+        Args:
+            command: Lệnh trên thiết bị (ví dụ: "screencap -p")
+            timeout: Thời gian chờ cho lệnh này (giây)
+
+        Returns:
+            Stdout của lệnh dưới dạng bytes
+        """
+        return await self.run_bytes(f"exec-out {command}", timeout=timeout)
+
+    def _cache_key(self, command: str) -> str:
+        """Tạo khóa cache cho lệnh trên thiết bị hiện tại."""
+        return f"{self.device_id}:{command}" if self.device_id else command
+
+    def _build_full_command(self, command: str, with_device: bool = True) -> List[str]:
+        return self._build_full_args(command.split(), with_device)
+
+    def _build_full_args(self, args: List[str], with_device: bool = True) -> List[str]:
+        full_command = [self.adb_path]
+        if with_device and self.device_id:
+            full_command.extend(["-s", self.device_id])
+        full_command.extend(args)
+        return full_command
+
+    async def _run_args(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """
+        Chạy lệnh ADB với danh sách đối số có sẵn (không tách theo khoảng trắng), không cache.
+
+        Dùng cho lệnh có đường dẫn trên máy tính (push, pull) có thể chứa khoảng trắng.
+
+        Returns:
+            Kết quả lệnh dưới dạng chuỗi
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại hoặc hết thời gian chờ
+        """
+        full_command = self._build_full_args(args)
+        logger.debug(f"Executing command: {full_command}")
+        try:
+            return_code, stdout, stderr = await self._communicate(
+                full_command, self.timeout if timeout is None else timeout)
+        finally:
+            self._invalidate_for(" ".join(args))
+        if return_code != 0:
+            raise ADBCommandError(
+                command=" ".join(full_command),
+                error_message=stderr.decode(errors='ignore'),
+                return_code=return_code
+            )
+        return stdout.decode(errors='ignore')
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run_raw(self, command: str, timeout: Optional[float] = None,
+                       with_device: bool = True) -> Tuple[int, bytes, bytes]:
+        """
+        Thực thi lệnh trong một tiến trình adb và trả về kết quả thô.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+            timeout: Thời gian chờ (giây), mặc định là ``self.timeout``
+            with_device: Thêm "-s <device_id>" vào lệnh
+
+        Returns:
+            Tuple (return_code, stdout, stderr)
+
+        Raises:
+            ADBCommandError: Nếu không thể tạo tiến trình hoặc lệnh hết thời gian chờ
+        """
+        if timeout is None:
+            timeout = self.timeout
+        full_command = self._build_full_command(command, with_device)
+        logger.debug(f"Executing command: {' '.join(full_command)}")
+
+        try:
+            return await self._communicate(full_command, timeout)
+        finally:
+            # Lệnh lỗi hoặc bị hủy vẫn có thể đã thay đổi một phần trạng thái thiết bị
+            self._invalidate_for(command)
+
+    async def _communicate(self, full_command: List[str], timeout: float) -> Tuple[int, bytes, bytes]:
+        extra_args = {}
+        if self.platform_info.is_windows:
+            extra_args["creationflags"] = subprocess.CREATE_NO_WINDOW
+
+        async with self._get_semaphore():
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *full_command,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    **extra_args
+                )
+            except OSError as e:
+                raise ADBCommandError(command=" ".join(full_command), error_message=str(e), return_code=-1)
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(process)
+                raise ADBCommandError(
+                    command=" ".join(full_command),
+                    error_message=f"Command timed out after {timeout} seconds",
+                    return_code=-1
+                )
+            except asyncio.CancelledError:
+                await self._kill(process)
+                raise
+
+        return process.returncode, stdout, stderr
+
+    @staticmethod
+    async def _kill(process) -> None:
+        """Dừng tiến trình adb và thu hồi nó để không để lại tiến trình zombie."""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        try:
+            await process.wait()
+        except Exception:
+            pass
+
+    def _invalidate_for(self, command: str) -> None:
+        """Xóa các kết quả cache phụ thuộc vào dữ liệu mà lệnh làm thay đổi."""
+        tags = invalidation_tags(command)
+        if tags and self._cache:
+            removed = self._cache.invalidate_tags(tags)
+            logger.debug(f"Invalidated {removed} cached result(s) for tags {sorted(tags)}")
+
+    def clear_cache(self) -> None:
+        """Xóa toàn bộ cache."""
+        if self.cache_enabled and self._cache:
+            self._cache.clear()
+
+    async def get_devices(self) -> str:
+        """
+        Liệt kê các thiết bị kết nối dưới dạng chuỗi.
+
+        Returns:
+            Chuỗi chứa danh sách thiết bị
+        """
+        return_code, stdout, stderr = await self._run_raw("devices", with_device=False)
+        if return_code != 0:
+            raise ADBCommandError("adb devices", stderr.decode(errors='ignore'), return_code)
+        return stdout.decode(errors='ignore')
+
+    async def get_devices_list(self) -> List[str]:
+        """
+        Liệt kê các thiết bị kết nối dưới dạng danh sách.
+
+        Returns:
+            Danh sách các ID thiết bị
+        """
+        output = await self.get_devices()
+        devices = []
+        for line in output.splitlines()[1:]:  # Bỏ qua dòng tiêu đề
+            parts = line.split("\t")
+            if len(parts) >= 2 and parts[1] == "device":
+                devices.append(parts[0])
+        return devices
+
+    async def reboot_device(self) -> str:
+        """Khởi động lại thiết bị."""
+        return await self.run("reboot", use_cache=False)
+
+    async def reboot_to_recovery(self) -> str:
+        """Khởi động lại thiết bị vào chế độ recovery."""
+        return await self.run("reboot recovery", use_cache=False)
+
+    async def reboot_to_bootloader(self) -> str:
+        """Khởi động lại thiết bị vào chế độ bootloader."""
+        return await self.run("reboot bootloader", use_cache=False)
+
+    async def install_app(self, apk_path: str, replace: bool = False,
+                          grant_permissions: bool = False) -> str:
+        """
+        Cài đặt ứng dụng từ đường dẫn .apk.
+
+        Args:
+            apk_path: Đường dẫn đến file APK
+            replace: Thay thế ứng dụng nếu đã tồn tại
+            grant_permissions: Tự động cấp tất cả quyền cho ứng dụng
+
+        Returns:
+            Kết quả lệnh
+
+        Raises:
+            InstallationError: Nếu cài đặt thất bại
+        """
+        apk_path = self.platform_info.normalize_path(apk_path)
+        if not os.path.exists(apk_path):
+            raise InstallationError(apk_path, "File APK không tồn tại")
+
+        options = []
+        if replace:
+            options.append("-r")
+        if grant_permissions:
+            options.append("-g")
+
+        try:
+            return await self.run("install {} {}".format(" ".join(options), apk_path), use_cache=False)
+        except ADBCommandError as e:
+            raise InstallationError(apk_path, e.error_message)
+
+    async def uninstall_app(self, package_name: str, keep_data: bool = False) -> str:
+        """
+        Gỡ cài đặt ứng dụng theo tên package.
+
+        Args:
+            package_name: Tên package của ứng dụng
+            keep_data: Giữ lại dữ liệu và cache
+
+        Returns:
+            Kết quả lệnh
+
+        Raises:
+            UninstallationError: Nếu gỡ cài đặt thất bại
+        """
+        options = ["-k"] if keep_data else []
+        try:
+            return await self.run("uninstall {} {}".format(" ".join(options), package_name), use_cache=False)
+        except ADBCommandError as e:
+            if "not found" in e.error_message.lower():
+                logger.warning(f"Attempted to uninstall non-existent package: {package_name}")
+                return "Package not found"
+            raise UninstallationError(package_name, e.error_message)
+
+    async def push_file(self, local_path: str, remote_path: str) -> str:
+        """
+        Đẩy file từ máy tính vào thiết bị.
+
+        Args:
+            local_path: Đường dẫn file trên máy tính
+            remote_path: Đường dẫn đích trên thiết bị
+
+        Returns:
+            Kết quả lệnh
+
+        Raises:
+            FileOperationError: Nếu thao tác thất bại
+        """
+        local_path = self.platform_info.normalize_path(local_path)
+        if not os.path.exists(local_path):
+            raise FileOperationError("push", local_path, remote_path, "File nguồn không tồn tại")
+
+        try:
+            return await self._run_args(["push", local_path, remote_path])
+        except ADBCommandError as e:
+            raise FileOperationError("push", local_path, remote_path, e.error_message)
+
+    async def pull_file(self, remote_path: str, local_path: str) -> str:
+        """
+        Lấy file từ thiết bị về máy tính.
+
+        Args:
+            remote_path: Đường dẫn file trên thiết bị
+            local_path: Đường dẫn đích trên máy tính
+
+        Returns:
+            Kết quả lệnh
+
+        Raises:
+            FileOperationError: Nếu thao tác thất bại
+        """
+        local_path = self.platform_info.normalize_path(local_path)
+        os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+
+        try:
+            return await self._run_args(["pull", remote_path, local_path])
+        except ADBCommandError as e:
+            raise FileOperationError("pull", remote_path, local_path, e.error_message)
+
+    async def get_device_info(self) -> Dict[str, str]:
+        """
+        Lấy thông tin thiết bị (các thuộc tính getprop).
+
+        Returns:
+            Dictionary chứa thông tin thiết bị
+        """
+        try:
+            output = await self.shell("getprop")
+        except ADBCommandError as e:
+            logger.error(f"Error getting device info: {e}")
+            return {}
+
+        properties = {}
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith("[") and "]: [" in line:
+                key_part, value_part = line.split("]: [", 1)
+                properties[key_part[1:]] = value_part[:-1]
+        return properties
+
+    async def start_app(self, package_name: str, activity: Optional[str] = None) -> str:
+        """
+        Khởi động ứng dụng.
+
+        Args:
+            package_name: Tên package của ứng dụng
+            activity: Tên activity để khởi động (tùy chọn)
+
+        Returns:
+            Kết quả lệnh
+        """
+        if activity:
+            full_activity = package_name + activity if activity.startswith(".") else activity
+            return await self.shell(f"am start -n {package_name}/{full_activity}", use_cache=False)
+        return await self.shell(f"monkey -p {package_name} -c android.intent.category.LAUNCHER 1",
+                                use_cache=False)
+
+    async def stop_app(self, package_name: str) -> str:
+        """Dừng ứng dụng."""
+        return await self.shell(f"am force-stop {package_name}", use_cache=False)
+
+    async def clear_app_data(self, package_name: str) -> str:
+        """Xóa dữ liệu ứng dụng."""
+        return await self.shell(f"pm clear {package_name}", use_cache=False)
+
+    async def get_app_version(self, package_name: str) -> Optional[str]:
+        """
+        Lấy phiên bản của ứng dụng.
+
+        Args:
+            package_name: Tên package của ứng dụng
+
+        Returns:
+            Phiên bản ứng dụng (versionName) hoặc None nếu không có
+
+        Raises:
+            PackageNotFoundError: Nếu ứng dụng không tồn tại
+        """
+        try:
+            output = await self.shell(f"dumpsys package {package_name}")
+        except ADBCommandError as e:
+            logger.warning(f"dumpsys package {package_name} failed: {e}")
+            raise PackageNotFoundError(package_name)
+
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith("versionName="):
+                return line.split("=", 1)[1].strip()
+
+        if not await self.is_app_installed(package_name):
+            raise PackageNotFoundError(package_name)
+        return None
+
+    async def is_app_installed(self, package_name: str) -> bool:
+        """
+        Kiểm tra xem ứng dụng đã được cài đặt chưa.
+
+        Args:
+            package_name: Tên package của ứng dụng
+
+        Returns:
+            True nếu ứng dụng đã được cài đặt, False nếu không
+        """
+        try:
+            output = await self.shell(f"pm list packages {package_name}")
+        except ADBCommandError:
+            return False
+        return f"package:{package_name}" in output.splitlines()
+
+    async def take_screenshot(self, output_path: Optional[str] = None,
+                              as_bytes: bool = False) -> Union[str, bytes, None]:
+        """
+        Chụp ảnh màn hình thiết bị (PNG, qua "exec-out screencap -p").
+
+        Args:
+            output_path: Đường dẫn lưu ảnh (tùy chọn)
+            as_bytes: Trả về dữ liệu ảnh dưới dạng bytes thay vì lưu file
+
+        Returns:
+            - Nếu as_bytes=True: Dữ liệu ảnh dưới dạng bytes
+            - Nếu output_path được cung cấp: Đường dẫn đến file ảnh đã lưu
+            - Nếu không: None
+
+        Raises:
+            ADBCommandError: Nếu lệnh thất bại
+        """
+        data = await self.exec_out("screencap -p")
+
+        if as_bytes:
+            return data
+        if output_path:
+            output_path = self.platform_info.normalize_path(output_path)
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, "wb") as f:
+                f.write(data)
+            return output_path
+        return None
+
+    async def input_keyevent(self, keycode: Union[int, str]) -> str:
+        """Gửi sự kiện nhấn phím."""
+        return await self.shell(f"input keyevent {keycode}", use_cache=False)
+
+    async def input_text(self, text: str) -> str:
+        """Nhập văn bản."""
+        escaped_text = text.replace(" ", "%s")
+        for char in "\"()<>{}&;|$`":
+            escaped_text = escaped_text.replace(char, "\\" + char)
+        return await self.shell(f"input text \"{escaped_text}\"", use_cache=False)
+
+    async def input_tap(self, x: int, y: int) -> str:
+        """Chạm vào tọa độ màn hình."""
+        return await self.shell(f"input tap {x} {y}", use_cache=False)
+
+    async def input_swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> str:
+        """Vuốt màn hình từ điểm (x1, y1) đến (x2, y2)."""
+        return await self.shell(f"input swipe {x1} {y1} {x2} {y2} {duration}", use_cache=False)
+
+    async def get_screen_size(self) -> Optional[Dict[str, int]]:
+        """
+        Lấy kích thước màn hình (width, height).
+
+        Returns:
+            Dictionary {"width": w, "height": h} hoặc None nếu lỗi.
+        """
+        try:
+            output = await self.shell("wm size")
+            size_line = output.strip().splitlines()[-1]
+            if ":" in size_line:
+                width, height = map(int, size_line.split(":")[1].strip().split("x"))
+                return {"width": width, "height": height}
+        except (ADBCommandError, ValueError, IndexError) as e:
+            logger.error(f"Failed to get screen size: {e}")
+        return None
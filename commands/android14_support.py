@@ -6,6 +6,7 @@ Provides enhanced functionality for the latest Android version.
 import re
 import time
 from .core import get_adb_instance
+from .xml_dump import get_xml_dump
 
 def is_android_14_or_higher():
     """
@@ -16,9 +17,7 @@ def is_android_14_or_higher():
     """
     adb = get_adb_instance()
     try:
-        output = adb.run("shell getprop ro.build.version.sdk").strip()
-        sdk_version = int(output)
-        return sdk_version >= 34
+        return adb.get_properties().sdk_version >= 34
     except:
         return False
 
@@ -142,7 +141,7 @@ def handle_android14_notifications():
         time.sleep(0.5)
         
         # Get XML dump of notifications
-        xml_content = adb.run("shell uiautomator dump /dev/tty")
+        xml_content = get_xml_dump(adb)
         
         # Extract notification information
         notifications = []
@@ -201,7 +200,7 @@ def toggle_android14_quick_settings(setting_name):
             return False
         
         # Get XML dump of quick settings
-        xml_content = adb.run("shell uiautomator dump /dev/tty")
+        xml_content = get_xml_dump(adb)
         
         # Find the setting tile
         tile_pattern = f'<node[^>]*content-desc="[^"]*{content_desc}[^"]*"[^>]*bounds="\\[(\d+),(\d+)\\]\\[(\d+),(\d+)\\]"'
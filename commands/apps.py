@@ -126,17 +126,24 @@ class AppCommands:
         Returns:
             Danh sách tên package
         """
+        if not filter_type:
+            # Không lọc: trả lời từ danh mục package đã nạp
+            try:
+                return list(self.adb.package_inventory.packages())
+            except ADBCommandError as e:
+                logger.error(f"Error listing packages: {e}")
+                return []
+        
         cmd = "shell pm list packages"
         
-        if filter_type:
-            if filter_type == "system":
-                cmd += " -s"
-            elif filter_type == "third-party":
-                cmd += " -3"
-            elif filter_type == "disabled":
-                cmd += " -d"
-            elif filter_type == "enabled":
-                cmd += " -e"
+        if filter_type == "system":
+            cmd += " -s"
+        elif filter_type == "third-party":
+            cmd += " -3"
+        elif filter_type == "disabled":
+            cmd += " -d"
+        elif filter_type == "enabled":
+            cmd += " -e"
         
         try:
             logger.debug(f"Listing packages with filter: {filter_type}")
@@ -178,23 +185,26 @@ class AppCommands:
         logger.debug(f"Force stopping package: {package_name}")
         return self.adb.run(f"shell am force-stop {package_name}")
     
-    def start_app(self, package_name: str, activity: Optional[str] = None) -> str:
+    def start_app(self, package_name: str, activity: Optional[str] = None, wait: bool = False) -> str:
         """
         Khởi động ứng dụng.
         
         Args:
             package_name: Tên package của ứng dụng
-            activity: Tên activity để khởi động (tùy chọn)
+            activity: Tên activity để khởi động (tùy chọn); nếu không có, activity khởi
+                chạy được tìm một lần, cache lại và khởi động bằng "am start -n"
+            wait: Chờ activity hiển thị xong ("am start -W")
             
         Returns:
             Kết quả lệnh
         """
+        am_start = "shell am start -W" if wait else "shell am start"
         if activity:
             logger.debug(f"Starting activity: {package_name}/{activity}")
-            return self.adb.run(f"shell am start -n {package_name}/{activity}")
+            return self.adb.run(f"{am_start} -n {package_name}/{activity}")
         else:
             logger.debug(f"Starting package: {package_name}")
-            return self.adb.run(f"shell monkey -p {package_name} -c android.intent.category.LAUNCHER 1")
+            return self.adb.start_app(package_name, wait=wait)
     
     def get_app_version(self, package_name: str) -> str:
         """
@@ -211,12 +221,10 @@ class AppCommands:
         """
         try:
             logger.debug(f"Getting version for package: {package_name}")
-            output = self.adb.run(f"shell dumpsys package {package_name}")
-            for line in output.splitlines():
-                if "versionName" in line:
-                    return line.split("=", 1)[1].strip()
-            
-            raise PackageNotFoundError(package_name)
+            details = self.adb.package_inventory.details(package_name)
+            if details is None or details["version_name"] is None:
+                raise PackageNotFoundError(package_name)
+            return details["version_name"]
         except ADBCommandError:
             raise PackageNotFoundError(package_name)
     
@@ -232,8 +240,7 @@ class AppCommands:
         """
         try:
             logger.debug(f"Checking if package is installed: {package_name}")
-            output = self.adb.run(f"shell pm list packages {package_name}")
-            return package_name in output
+            return self.adb.package_inventory.is_installed(package_name)
         except ADBCommandError:
             return False
     
@@ -252,6 +259,11 @@ class AppCommands:
         """
         try:
             logger.debug(f"Getting path for package: {package_name}")
+            record = self.adb.package_inventory.get(package_name)
+            if record is None:
+                raise PackageNotFoundError(package_name)
+            if record.apk_path:
+                return record.apk_path
             output = self.adb.run(f"shell pm path {package_name}")
             if output.startswith("package:"):
                 return output[8:].strip()
@@ -274,60 +286,11 @@ class AppCommands:
         """
         try:
             logger.debug(f"Getting info for package: {package_name}")
-            output = self.adb.run(f"shell dumpsys package {package_name}")
-            
-            if "Unable to find package" in output:
+            info = self.adb.package_inventory.details(package_name)
+            if info is None:
                 raise PackageNotFoundError(package_name)
-            
-            info = {
-                "package_name": package_name,
-                "version_name": None,
-                "version_code": None,
-                "first_install_time": None,
-                "last_update_time": None,
-                "installer": None,
-                "uid": None,
-                "target_sdk": None,
-                "permissions": []
-            }
-            
-            for line in output.splitlines():
-                line = line.strip()
-                
-                if "versionName=" in line:
-                    info["version_name"] = line.split("=", 1)[1].strip()
-                elif "versionCode=" in line:
-                    version_code_str = line.split("=", 1)[1].strip().split(" ")[0]
-                    try:
-                        info["version_code"] = int(version_code_str)
-                    except ValueError:
-                        info["version_code"] = version_code_str
-                elif "firstInstallTime=" in line:
-                    info["first_install_time"] = line.split("=", 1)[1].strip()
-                elif "lastUpdateTime=" in line:
-                    info["last_update_time"] = line.split("=", 1)[1].strip()
-                elif "installerPackageName=" in line:
-                    installer = line.split("=", 1)[1].strip()
-                    if installer:
-                        info["installer"] = installer
-                elif "userId=" in line:
-                    try:
-                        info["uid"] = int(line.split("=", 1)[1].strip())
-                    except ValueError:
-                        pass
-                elif "targetSdk=" in line:
-                    try:
-                        info["target_sdk"] = int(line.split("=", 1)[1].strip())
-                    except ValueError:
-                        pass
-                elif "granted=true" in line and "permission." in line:
-                    # Extract permission name
-                    parts = line.split(":", 1)
-                    if len(parts) > 1:
-                        permission = parts[0].strip()
-                        info["permissions"].append(permission)
-            
-            return info
+            # Bản sao để người gọi không sửa được dữ liệu trong danh mục
+            return dict(info, permissions=list(info["permissions"]))
         
         except ADBCommandError:
             raise PackageNotFoundError(package_name)
@@ -374,34 +337,10 @@ class AppCommands:
         """
         try:
             logger.debug(f"Getting activities for package: {package_name}")
-            output = self.adb.run(f"shell dumpsys package {package_name}")
-            
-            if "Unable to find package" in output:
+            activities = self.adb.package_inventory.activities(package_name)
+            if activities is None:
                 raise PackageNotFoundError(package_name)
-            
-            activities = []
-            in_activity_section = False
-            
-            for line in output.splitlines():
-                if "Activity Resolver Table:" in line:
-                    in_activity_section = True
-                    continue
-                elif "Provider Resolver Table:" in line:
-                    in_activity_section = False
-                    continue
-                
-                if in_activity_section and package_name in line and "/" in line:
-                    parts = line.strip().split()
-                    for part in parts:
-                        if package_name in part and "/" in part:
-                            activity = part.strip()
-                            if activity.endswith("}"):
-                                activity = activity[:-1]
-                            if activity.endswith(";"):
-                                activity = activity[:-1]
-                            activities.append(activity)
-            
-            return activities
+            return list(activities)
         
         except ADBCommandError:
             raise PackageNotFoundError(package_name)
@@ -1,5 +1,9 @@
 
 import subprocess
+import threading
+
+_adb_instance = None
+_adb_instance_lock = threading.Lock()
 
 def run_command(command: str):
     try:
@@ -7,3 +11,22 @@ def run_command(command: str):
         return result.stdout.strip()
     except Exception as e:
         return str(e)
+
+
+def get_adb_instance():
+    """
+    Return the MyADB instance shared by the module-level helpers
+    (android14_support, ui_compatibility, ...), creating it on first use.
+    """
+    global _adb_instance
+    with _adb_instance_lock:
+        if _adb_instance is None:
+            from ..adb import MyADB
+            _adb_instance = MyADB()
+        return _adb_instance
+
+def set_adb_instance(adb):
+    """Use an existing MyADB instance (e.g. for a specific device) for the module-level helpers."""
+    global _adb_instance
+    with _adb_instance_lock:
+        _adb_instance = adb
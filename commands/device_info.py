@@ -63,27 +63,32 @@ class DeviceCommands:
         try:
             logger.debug("Getting battery information")
             output = self.adb.run("shell dumpsys battery")
-            battery_info = {}
-            
-            for line in output.splitlines():
-                line = line.strip()
-                if not line or ': ' not in line:
-                    continue
-                
-                key, value = line.split(': ', 1)
-                try:
-                    # Thử chuyển đổi giá trị thành số
-                    value = int(value) if value.isdigit() else float(value) if '.' in value and value.replace('.', '').isdigit() else value
-                except:
-                    pass
-                
-                battery_info[key] = value
-            
-            return battery_info
+            return self._parse_battery(output)
         except ADBCommandError as e:
             logger.error(f"Error getting battery info: {e}")
             return {}
     
+    @staticmethod
+    def _parse_battery(output: str) -> Dict[str, Any]:
+        """Phân tích đầu ra của "dumpsys battery"."""
+        battery_info = {}
+        
+        for line in output.splitlines():
+            line = line.strip()
+            if not line or ': ' not in line:
+                continue
+            
+            key, value = line.split(': ', 1)
+            try:
+                # Thử chuyển đổi giá trị thành số
+                value = int(value) if value.isdigit() else float(value) if '.' in value and value.replace('.', '').isdigit() else value
+            except:
+                pass
+            
+            battery_info[key] = value
+        
+        return battery_info
+    
     def current_dir(self) -> str:
         """
         Lấy thư mục hiện tại trên thiết bị.
@@ -146,17 +151,22 @@ class DeviceCommands:
         try:
             logger.debug("Getting screen size")
             output = self.adb.run("shell wm size")
-            for line in output.splitlines():
-                if "Physical size" in line:
-                    size = line.split(": ")[1]
-                    width, height = map(int, size.split("x"))
-                    return (width, height)
-            
-            return (0, 0)
+            return self._parse_screen_size(output)
         except Exception as e:
             logger.error(f"Error getting screen size: {e}")
             return (0, 0)
     
+    @staticmethod
+    def _parse_screen_size(output: str) -> Tuple[int, int]:
+        """Phân tích đầu ra của "wm size"."""
+        for line in output.splitlines():
+            if "Physical size" in line:
+                size = line.split(": ")[1]
+                width, height = map(int, size.split("x"))
+                return (width, height)
+        
+        return (0, 0)
+    
     def screen_density(self) -> int:
         """
         Lấy mật độ điểm ảnh của màn hình.
@@ -167,16 +177,24 @@ class DeviceCommands:
         try:
             logger.debug("Getting screen density")
             output = self.adb.run("shell wm density")
-            for line in output.splitlines():
-                if "Physical density" in line:
-                    density = line.split(": ")[1]
-                    return int(density)
-            
-            return 0
+            return self._parse_screen_density(output)
         except Exception as e:
             logger.error(f"Error getting screen density: {e}")
             return 0
     
+    @staticmethod
+    def _parse_screen_density(output: str) -> int:
+        """Phân tích đầu ra của "wm density"."""
+        for line in output.splitlines():
+            if "Physical density" in line:
+                density = line.split(": ")[1]
+                try:
+                    return int(density)
+                except ValueError:
+                    return 0
+        
+        return 0
+    
     def get_android_version(self) -> str:
         """
         Lấy phiên bản Android.
@@ -186,8 +204,7 @@ class DeviceCommands:
         """
         try:
             logger.debug("Getting Android version")
-            output = self.adb.run("shell getprop ro.build.version.release")
-            return output.strip()
+            return self.adb.get_properties().android_version
         except ADBCommandError as e:
             logger.error(f"Error getting Android version: {e}")
             return ""
@@ -201,9 +218,8 @@ class DeviceCommands:
         """
         try:
             logger.debug("Getting SDK version")
-            output = self.adb.run("shell getprop ro.build.version.sdk")
-            return int(output.strip())
-        except (ADBCommandError, ValueError) as e:
+            return self.adb.get_properties().sdk_version
+        except ADBCommandError as e:
             logger.error(f"Error getting SDK version: {e}")
             return 0
     
@@ -216,8 +232,7 @@ class DeviceCommands:
         """
         try:
             logger.debug("Getting device model")
-            output = self.adb.run("shell getprop ro.product.model")
-            return output.strip()
+            return self.adb.get_properties().model
         except ADBCommandError as e:
             logger.error(f"Error getting device model: {e}")
             return ""
@@ -231,8 +246,7 @@ class DeviceCommands:
         """
         try:
             logger.debug("Getting device manufacturer")
-            output = self.adb.run("shell getprop ro.product.manufacturer")
-            return output.strip()
+            return self.adb.get_properties().manufacturer
         except ADBCommandError as e:
             logger.error(f"Error getting device manufacturer: {e}")
             return ""
@@ -246,28 +260,26 @@ class DeviceCommands:
         """
         try:
             logger.debug("Getting device information")
+            # Mọi thuộc tính đến từ một snapshot getprop; các lệnh còn lại gộp vào một batch
+            properties = self.adb.get_properties()
+            with self.adb.batch() as batch:
+                wm_size = batch.shell("wm size")
+                wm_density = batch.shell("wm density")
+                battery = batch.shell("dumpsys battery")
+            
             info = {
-                "android_version": self.get_android_version(),
-                "sdk_version": self.get_sdk_version(),
-                "model": self.get_device_model(),
-                "manufacturer": self.get_device_manufacturer(),
-                "serial": self.get_serialno(),
-                "screen_size": self.screen_size(),
-                "screen_density": self.screen_density(),
-                "battery": self.battery()
+                "android_version": properties.android_version,
+                "sdk_version": properties.sdk_version,
+                "model": properties.model,
+                "manufacturer": properties.manufacturer,
+                "serial": properties.serialno or self.get_serialno(),
+                "screen_size": self._parse_screen_size(self._batch_output(wm_size)),
+                "screen_density": self._parse_screen_density(self._batch_output(wm_density)),
+                "battery": self._parse_battery(self._batch_output(battery))
             }
             
             # Thêm thông tin từ getprop
-            output = self.adb.run("shell getprop")
-            for line in output.splitlines():
-                line = line.strip()
-                if not line or ': ' not in line:
-                    continue
-                
-                key, value = line.split(': ', 1)
-                key = key.strip('[]')
-                value = value.strip('[]')
-                
+            for key, value in properties.as_dict().items():
                 # Chỉ thêm các thông tin quan trọng
                 if any(k in key for k in ['product', 'build', 'version', 'model', 'brand', 'device']):
                     info[key] = value
@@ -277,6 +289,15 @@ class DeviceCommands:
             logger.error(f"Error getting device info: {e}")
             return {}
     
+    @staticmethod
+    def _batch_output(handle) -> str:
+        """Lấy stdout của một lệnh trong batch, trả về chuỗi rỗng nếu lệnh thất bại."""
+        try:
+            return handle.result()
+        except ADBCommandError as e:
+            logger.error(f"Error in batched command {handle.command}: {e}")
+            return ""
+    
     def reboot(self, mode: Optional[str] = None) -> str:
         """
         Khởi động lại thiết bị.
@@ -524,7 +545,7 @@ class DeviceCommands:
     
     def get_prop(self, prop: str) -> str:
         """
-        Lấy thuộc tính hệ thống.
+        Lấy thuộc tính hệ thống (từ snapshot getprop dùng chung).
         
         Args:
             prop: Tên thuộc tính
@@ -533,7 +554,17 @@ class DeviceCommands:
             Giá trị thuộc tính
         """
         logger.debug(f"Getting property {prop}")
-        return self.adb.run(f"shell getprop {prop}")
+        return self.adb.get_prop(prop)
+    
+    def refresh_props(self) -> Dict[str, str]:
+        """
+        Đọc lại toàn bộ thuộc tính hệ thống từ thiết bị.
+        
+        Returns:
+            Dictionary chứa toàn bộ thuộc tính
+        """
+        logger.debug("Refreshing property snapshot")
+        return self.adb.get_properties(refresh=True).as_dict()
     
     def get_cpu_info(self) -> Dict[str, Any]:
         """
@@ -8,6 +8,7 @@ from typing import Optional, List, Dict, Any, Union
 
 from ..exceptions import ADBCommandError, FileOperationError
 from ..utils.platform_utils import get_platform_info
+from ..utils.transport import quote_shell_arg
 
 logger = logging.getLogger('oiadb')
 
@@ -262,7 +263,25 @@ class FileOperationsCommands:
             return self.adb.run(f"shell cat \"{remote_path}\"")
         except ADBCommandError as e:
             raise FileOperationError("cat", remote_path, "", e.error_message)
-    
+
+    def cat_bytes(self, remote_path: str) -> bytes:
+        """
+        Đọc nội dung file nhị phân trên thiết bị (qua exec-out, không giải mã).
+
+        Args:
+            remote_path: Đường dẫn file trên thiết bị
+
+        Returns:
+            Nội dung file dưới dạng bytes
+
+        Raises:
+            FileOperationError: Nếu thao tác thất bại
+        """
+        try:
+            return self.adb.exec_out(f"cat {quote_shell_arg(remote_path)}")
+        except ADBCommandError as e:
+            raise FileOperationError("cat", remote_path, "", e.error_message)
+
     def write(self, remote_path: str, content: str) -> str:
         """
         Ghi nội dung vào file trên thiết bị.
@@ -102,6 +102,83 @@ class ImageInteractionCommands:
             use_canny=use_canny
         )
     
+    def find_many_images(self, templates: List[str], threshold: float = 0.8,
+                         region: Optional[Tuple[int, int, int, int]] = None,
+                         scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
+                         use_gray: bool = True, use_canny: bool = False, pyramid: bool = False,
+                         stop_on_first: bool = False) -> Dict[str, Optional[Tuple[int, int, float]]]:
+        """
+        Tìm nhiều hình ảnh mẫu trên cùng một ảnh màn hình (chỉ chụp một lần).
+        
+        Args:
+            templates: Danh sách đường dẫn hình ảnh mẫu, theo thứ tự ưu tiên
+            threshold: Ngưỡng tương đồng (0.0 - 1.0)
+            region: Vùng tìm kiếm (x, y, width, height), None = toàn màn hình
+            scale_range: Phạm vi tỷ lệ để tìm kiếm (min_scale, max_scale)
+            scale_steps: Số bước tỷ lệ trong phạm vi
+            use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
+            use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh trên ảnh thu nhỏ rồi tinh chỉnh ở độ phân giải gốc
+            stop_on_first: Dừng ngay khi một mẫu vượt ngưỡng
+            
+        Returns:
+            Dictionary đường dẫn mẫu (như được truyền vào) -> (x, y, confidence) hoặc None
+        """
+        # Chuẩn hóa đường dẫn template, giữ đường dẫn gốc làm khóa kết quả
+        normalized = {template_path: self.platform_info.normalize_path(template_path)
+                      for template_path in templates}
+        
+        logger.debug(f"Tìm {len(normalized)} hình ảnh trên một ảnh màn hình")
+        results = self.image_recognition.find_many(
+            list(normalized.values()),
+            threshold=threshold,
+            region=region,
+            scale_range=scale_range,
+            scale_steps=scale_steps,
+            use_gray=use_gray,
+            use_canny=use_canny,
+            pyramid=pyramid,
+            stop_on_first=stop_on_first
+        )
+        return {template_path: results.get(path) for template_path, path in normalized.items()}
+    
+    def find_any_image(self, templates: List[str], threshold: float = 0.8,
+                       region: Optional[Tuple[int, int, int, int]] = None,
+                       scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
+                       use_gray: bool = True, use_canny: bool = False,
+                       pyramid: bool = False) -> Optional[Tuple[str, Tuple[int, int, float]]]:
+        """
+        Tìm hình ảnh mẫu đầu tiên (theo thứ tự của templates) đang hiển thị trên màn hình.
+        
+        Args:
+            templates: Danh sách đường dẫn hình ảnh mẫu, theo thứ tự ưu tiên
+            threshold: Ngưỡng tương đồng (0.0 - 1.0)
+            region: Vùng tìm kiếm (x, y, width, height), None = toàn màn hình
+            scale_range: Phạm vi tỷ lệ để tìm kiếm (min_scale, max_scale)
+            scale_steps: Số bước tỷ lệ trong phạm vi
+            use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
+            use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh (xem find_many_images)
+            
+        Returns:
+            Tuple (đường dẫn mẫu, (x, y, confidence)) hoặc None nếu không tìm thấy
+        """
+        results = self.find_many_images(
+            templates,
+            threshold=threshold,
+            region=region,
+            scale_range=scale_range,
+            scale_steps=scale_steps,
+            use_gray=use_gray,
+            use_canny=use_canny,
+            pyramid=pyramid,
+            stop_on_first=True
+        )
+        for template_path, result in results.items():
+            if result:
+                return template_path, result
+        return None
+    
     def tap_image(self, template_path: str, threshold: float = 0.8, 
                  region: Optional[Tuple[int, int, int, int]] = None,
                  scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
@@ -7,7 +7,7 @@ import re
 import time
 import json
 from .core import get_adb_instance
-from .xml_dump import get_xml_dump, find_elements_by_criteria
+from .xml_dump import get_xml_dump, get_ui_hierarchy, find_elements_by_criteria
 
 # Dictionary to store UI patterns for different Android versions and OEM skins
 UI_PATTERNS = {
@@ -107,7 +107,7 @@ def detect_device_manufacturer():
     
     try:
         # Get manufacturer information
-        output = adb.run("shell getprop ro.product.manufacturer").strip().lower()
+        output = adb.get_properties().manufacturer.lower()
         
         if "samsung" in output:
             return "samsung"
@@ -168,6 +168,11 @@ def find_ui_element(element_type, text=None, content_desc=None, resource_id=None
     # Get all possible class names for the element type
     class_names = get_ui_element_classes(element_type)
     
+    # One dump serves every candidate class name
+    hierarchy = get_ui_hierarchy()
+    if hierarchy is None:
+        return None
+    
     # Try each class name until a match is found
     for class_name in class_names:
         criteria = {"class": class_name, "threshold": threshold}
@@ -179,7 +184,7 @@ def find_ui_element(element_type, text=None, content_desc=None, resource_id=None
         if resource_id:
             criteria["id"] = resource_id
         
-        elements = find_elements_by_criteria(criteria)
+        elements = find_elements_by_criteria(criteria, hierarchy=hierarchy)
         
         if elements:
             return elements[0]
@@ -203,6 +208,11 @@ def find_all_ui_elements(element_type, text=None, content_desc=None, resource_id
     # Get all possible class names for the element type
     class_names = get_ui_element_classes(element_type)
     
+    # One dump serves every candidate class name
+    hierarchy = get_ui_hierarchy()
+    if hierarchy is None:
+        return []
+    
     all_elements = []
     
     # Try each class name and collect all matches
@@ -216,7 +226,7 @@ def find_all_ui_elements(element_type, text=None, content_desc=None, resource_id
         if resource_id:
             criteria["id"] = resource_id
         
-        elements = find_elements_by_criteria(criteria)
+        elements = find_elements_by_criteria(criteria, hierarchy=hierarchy)
         all_elements.extend(elements)
     
     return all_elements
@@ -318,13 +328,12 @@ def scroll_to_element(element_type, text=None, content_desc=None, resource_id=No
     """
     adb = get_adb_instance()
     
-    # Get screen dimensions
-    output = adb.run("shell wm size").strip()
-    match = re.search(r'Physical size: (\d+)x(\d+)', output)
-    if not match:
+    # Get screen dimensions (cached per device, rotation-aware)
+    display = adb.get_display_info()
+    if display is None:
         return None
     
-    width, height = map(int, match.groups())
+    width, height = display.size
     
     # Calculate swipe coordinates based on direction
     if direction == "down":
@@ -5,10 +5,11 @@ Module for obtaining UI hierarchy XML dump using ADB.
 import re
 import logging
 import xml.etree.ElementTree as ET
-from typing import TYPE_CHECKING
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..adb import MyADB # Use type checking import to avoid circular dependency issues
+    from ..utils.ui_hierarchy import UIHierarchy
 
 logger = logging.getLogger("oiadb")
 
@@ -94,8 +95,100 @@ def get_ui_xml_dump(adb: "MyADB") -> str:
 
     return xml_content
 
-# --- Removed server, filtering, and other API-related functions --- 
-# --- Kept similarity_score as it might be useful for future filtering logic --- 
+def get_ui_hierarchy(adb: Optional["MyADB"] = None, refresh: bool = False,
+                     max_age: Optional[float] = None) -> Optional["UIHierarchy"]:
+    """
+    Get the parsed UI hierarchy, reusing the device's cached dump while it is still fresh.
+
+    Args:
+        adb: An instance of the MyADB class (defaults to the shared instance).
+        refresh: Force a new dump.
+        max_age: Maximum age in seconds of a reusable dump (see MyADB.get_ui_hierarchy).
+
+    Returns:
+        UIHierarchy, or None if the dump failed.
+    """
+    if adb is None:
+        from .core import get_adb_instance
+        adb = get_adb_instance()
+    return adb.get_ui_hierarchy(refresh=refresh, max_age=max_age)
+
+def get_xml_dump(adb: Optional["MyADB"] = None, refresh: bool = False,
+                 max_age: Optional[float] = None) -> str:
+    """
+    Get XML dump of the current UI hierarchy, reusing a fresh cached dump if available.
+
+    Args:
+        adb: An instance of the MyADB class (defaults to the shared instance).
+        refresh: Force a new dump.
+        max_age: Maximum age in seconds of a reusable dump.
+
+    Returns:
+        str: XML representation of the UI hierarchy, or empty string if failed.
+    """
+    hierarchy = get_ui_hierarchy(adb, refresh=refresh, max_age=max_age)
+    return hierarchy.xml if hierarchy is not None else ""
+
+def _text_matches(expected: str, actual: str, threshold: float) -> bool:
+    if threshold >= 1.0:
+        return expected == actual
+    return similarity_score(expected, actual) >= threshold
+
+def _id_matches(expected: str, actual: str, threshold: float) -> bool:
+    # Accept both full ("com.app:id/login") and short ("login") resource ids
+    if actual == expected or actual.endswith(":id/" + expected):
+        return True
+    short_id = actual.rsplit("/", 1)[-1]
+    return threshold < 1.0 and similarity_score(expected, short_id) >= threshold
+
+def element_matches(element: Dict[str, str], criteria: Dict[str, Any]) -> bool:
+    """
+    Check whether a UI element matches the given criteria.
+
+    Args:
+        element: Node attributes (resource-id, class, text, content-desc, ...).
+        criteria: Any of "class", "package" (exact), "value" (text), "content_desc",
+            "id" (resource id) and "threshold" (similarity for text fields, default 0.8).
+
+    Returns:
+        bool: True if every given criterion matches.
+    """
+    threshold = criteria.get("threshold", 0.8)
+    if "class" in criteria and element.get("class") != criteria["class"]:
+        return False
+    if "package" in criteria and element.get("package") != criteria["package"]:
+        return False
+    if "value" in criteria and not _text_matches(criteria["value"], element.get("text", ""), threshold):
+        return False
+    if "content_desc" in criteria and not _text_matches(criteria["content_desc"],
+                                                        element.get("content-desc", ""), threshold):
+        return False
+    if "id" in criteria and not _id_matches(criteria["id"], element.get("resource-id", ""), threshold):
+        return False
+    return True
+
+def find_elements_by_criteria(criteria: Dict[str, Any], adb: Optional["MyADB"] = None,
+                              refresh: bool = False,
+                              hierarchy: Optional["UIHierarchy"] = None) -> List[Dict[str, str]]:
+    """
+    Find UI elements matching the given criteria.
+
+    Args:
+        criteria: Matching criteria (see element_matches).
+        adb: An instance of the MyADB class (defaults to the shared instance).
+        refresh: Force a new dump instead of reusing a fresh cached one.
+        hierarchy: Search this hierarchy instead of fetching one.
+
+    Returns:
+        list: Attributes of the matching elements, in document order.
+    """
+    if hierarchy is None:
+        hierarchy = get_ui_hierarchy(adb, refresh=refresh)
+        if hierarchy is None:
+            return []
+    return [dict(element) for element in hierarchy.elements if element_matches(element, criteria)]
+
+# --- Removed server and other API-related functions --- 
 
 from difflib import SequenceMatcher
 from functools import lru_cache
@@ -0,0 +1,21 @@
+"""
+Tiện ích dùng chung cho các test.
+"""
+
+import os
+import sys
+import importlib
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_oiadb(module: str):
+    """Nạp thư mục gốc của repo như package "oiadb" và trả về module con (ví dụ "adb")."""
+    if "oiadb" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "oiadb", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules["oiadb"] = package
+        spec.loader.exec_module(package)
+    return importlib.import_module("oiadb." + module)
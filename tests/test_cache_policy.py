@@ -0,0 +1,157 @@
+"""
+Kiểm tra phân loại lệnh của utils.cache_policy (lệnh đọc/ghi, nhãn đọc, nhãn xóa cache).
+
+Chạy: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from helpers import load_oiadb
+
+cache_policy = load_oiadb("utils.cache_policy")
+
+ALL = cache_policy.TAG_ALL
+PACKAGES = cache_policy.TAG_PACKAGES
+FILES = cache_policy.TAG_FILES
+DISPLAY = cache_policy.TAG_DISPLAY
+SETTINGS = cache_policy.TAG_SETTINGS
+PROPS = cache_policy.TAG_PROPS
+UI = cache_policy.TAG_UI
+
+# (lệnh, nhãn bị xóa)
+MUTATING_COMMANDS = [
+    ("install app.apk", {PACKAGES}),
+    ("install -r -g app.apk", {PACKAGES}),
+    ("install-multiple base.apk split.apk", {PACKAGES}),
+    ("uninstall com.foo", {PACKAGES}),
+    ("shell pm clear com.foo", {"packages:com.foo", FILES, UI}),
+    ("shell pm disable-user com.foo", {PACKAGES, UI}),
+    ("shell pm uninstall com.foo", {PACKAGES, UI}),
+    ("push local.txt /sdcard/a.txt", {FILES}),
+    ("shell rm /sdcard/a.txt", {FILES}),
+    ("shell rm -rf /sdcard/dir", {FILES}),
+    ("shell mv /sdcard/a /sdcard/b", {FILES}),
+    ("shell cp /sdcard/a /sdcard/b", {FILES}),
+    ("shell mkdir -p /sdcard/dir", {FILES}),
+    ("shell echo hi > /sdcard/x", {FILES}),
+    ("shell screencap /sdcard/s.png", {FILES}),
+    ("shell wm size 1080x1920", {DISPLAY, UI}),
+    ("shell wm size reset", {DISPLAY, UI}),
+    ("shell wm density 320", {DISPLAY, UI}),
+    ("shell settings put system font_scale 1.2", {SETTINGS, DISPLAY, UI}),
+    ("shell setprop debug.foo 1", {PROPS}),
+    ("shell input tap 100 200", {UI}),
+    ("shell am start -n com.foo/.Main", {UI}),
+    ("shell am force-stop com.foo", {UI}),
+    ("reboot", {ALL}),
+    ("reboot recovery", {ALL}),
+    ("root", {ALL}),
+    ("shell reboot", {ALL}),
+    ("shell sh -c ls", {ALL}),
+    ("shell su -c id", {ALL}),
+    ("shell", {ALL}),
+]
+
+# (lệnh, nhãn đọc)
+READ_ONLY_COMMANDS = [
+    ("devices", set()),
+    ("shell getprop", {PROPS}),
+    ("shell getprop ro.product.model", {PROPS}),
+    ("shell wm size", {DISPLAY}),
+    ("shell wm density", {DISPLAY}),
+    ("shell settings get system font_scale", {SETTINGS}),
+    ("shell pm list packages", {PACKAGES}),
+    ("shell cmd package list packages", {PACKAGES}),
+    ("shell pm path com.foo", {"packages:com.foo"}),
+    ("shell dumpsys package com.foo", {"packages:com.foo"}),
+    ("shell dumpsys window displays", {DISPLAY}),
+    ("shell screencap", set()),
+    ("shell ls /sdcard", {FILES}),
+    # Pipeline chỉ đọc
+    ("shell ls /sdcard | grep foo", {FILES}),
+    ("shell pm list packages | grep foo", {PACKAGES}),
+    ("shell dumpsys package com.foo | grep versionName", {"packages:com.foo"}),
+    ("shell cat /proc/meminfo | head -n 3", {FILES}),
+    ("shell ps -A | grep foo | wc -l", {FILES}),
+    ("shell getprop ro.build.version.sdk && wm size", {PROPS, DISPLAY}),
+    ("shell ls /sdcard 2>/dev/null", {FILES}),
+    ("shell dumpsys window 2>&1 | grep mCurrentFocus", {DISPLAY}),
+]
+
+
+class CommandClassificationTest(unittest.TestCase):
+
+    def test_mutating_commands(self):
+        for command, tags in MUTATING_COMMANDS:
+            with self.subTest(command=command):
+                self.assertTrue(cache_policy.is_mutating_command(command))
+                self.assertEqual(cache_policy.invalidation_tags(command), frozenset(tags))
+
+    def test_read_only_commands(self):
+        for command, tags in READ_ONLY_COMMANDS:
+            with self.subTest(command=command):
+                self.assertFalse(cache_policy.is_mutating_command(command))
+                self.assertEqual(cache_policy.invalidation_tags(command), frozenset())
+                self.assertEqual(cache_policy.read_tags(command), frozenset(tags))
+
+    def test_write_in_pipeline_makes_command_mutating(self):
+        for command in ("shell ls /sdcard; rm /sdcard/a", "shell pm list packages && pm clear com.foo",
+                        "shell cat /sdcard/a | tee /sdcard/b"):
+            with self.subTest(command=command):
+                self.assertTrue(cache_policy.is_mutating_command(command))
+                self.assertTrue(cache_policy.invalidation_tags(command))
+
+
+class TagsOverlapTest(unittest.TestCase):
+
+    def test_overlap(self):
+        cases = [
+            ({PACKAGES}, {PACKAGES}, True),
+            ({"packages:com.foo"}, {PACKAGES}, True),
+            ({PACKAGES}, {"packages:com.foo"}, True),
+            ({"packages:com.foo"}, {"packages:com.bar"}, False),
+            ({"packages:com.foo"}, {"packages:com.foo.bar"}, False),
+            ({FILES}, {DISPLAY}, False),
+            ({PROPS}, {ALL}, True),
+            (set(), {ALL}, True),
+            (set(), {FILES}, False),
+        ]
+        for entry, changed, expected in cases:
+            with self.subTest(entry=entry, changed=changed):
+                self.assertEqual(cache_policy.tags_overlap(frozenset(entry), frozenset(changed)), expected)
+
+    def test_write_invalidates_matching_reads(self):
+        # Mỗi cặp (lệnh ghi, lệnh đọc bị ảnh hưởng, lệnh đọc không bị ảnh hưởng)
+        cases = [
+            ("install app.apk", "shell pm list packages", "shell wm size"),
+            ("shell pm clear com.foo", "shell dumpsys package com.foo", "shell dumpsys package com.bar"),
+            ("shell wm size 720x1280", "shell wm size", "shell getprop ro.product.model"),
+            ("shell setprop debug.foo 1", "shell getprop", "shell ls /sdcard"),
+            ("shell rm /sdcard/a", "shell ls /sdcard", "shell settings get system font_scale"),
+        ]
+        for write, affected, unaffected in cases:
+            with self.subTest(write=write):
+                changed = cache_policy.invalidation_tags(write)
+                self.assertTrue(cache_policy.tags_overlap(cache_policy.read_tags(affected), changed))
+                self.assertFalse(cache_policy.tags_overlap(cache_policy.read_tags(unaffected), changed))
+
+
+class TTLPolicyTest(unittest.TestCase):
+
+    def test_default_rules(self):
+        policy = cache_policy.TTLPolicy()
+        cases = [
+            ("shell getprop ro.product.model", cache_policy.SESSION_TTL),
+            ("shell wm size", cache_policy.SESSION_TTL),
+            ("shell dumpsys battery", cache_policy.NO_CACHE),
+            ("shell settings get system font_scale", 5.0),
+            ("shell pm list packages", cache_policy.DEFAULT_TTL),
+            ("shell input tap 1 2", cache_policy.NO_CACHE),
+        ]
+        for command, ttl in cases:
+            with self.subTest(command=command):
+                self.assertEqual(policy.ttl_for(command), ttl)
+
+
+if __name__ == "__main__":
+    unittest.main()
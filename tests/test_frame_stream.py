@@ -0,0 +1,63 @@
+"""
+Kiểm tra việc đưa khung hình screenrecord về hệ tọa độ màn hình (utils.frame_stream).
+
+Chạy: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from helpers import load_oiadb
+
+frame_stream = load_oiadb("utils.frame_stream")
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = np = None
+
+
+def letterboxed_frame(display_size, video_size):
+    """Khung hình giả như screenrecord: nội dung giữ tỷ lệ, viền đen ở giữa, có một ô trắng."""
+    display_width, display_height = display_size
+    video_width, video_height = video_size
+    screen = np.zeros((display_height, display_width, 3), dtype=np.uint8)
+    # Ô trắng 100x100 tại (500, 1200) theo tọa độ màn hình
+    screen[1200:1300, 500:600] = 255
+    scale = min(video_width / display_width, video_height / display_height)
+    content_width = int(round(display_width * scale))
+    content_height = int(round(display_height * scale))
+    frame = np.zeros((video_height, video_width, 3), dtype=np.uint8)
+    x = (video_width - content_width) // 2
+    y = (video_height - content_height) // 2
+    frame[y:y + content_height, x:x + content_width] = cv2.resize(
+        screen, (content_width, content_height), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+@unittest.skipIf(cv2 is None, "cần OpenCV và NumPy")
+class FitToDisplayTest(unittest.TestCase):
+
+    def assert_square_at(self, image, x, y, tolerance=4):
+        ys, xs = np.nonzero(image[:, :, 0] > 127)
+        self.assertAlmostEqual(int(xs.min()), x, delta=tolerance)
+        self.assertAlmostEqual(int(ys.min()), y, delta=tolerance)
+        self.assertAlmostEqual(int(xs.max()) + 1, x + 100, delta=tolerance)
+        self.assertAlmostEqual(int(ys.max()) + 1, y + 100, delta=tolerance)
+
+    def test_same_size_is_unchanged(self):
+        image = np.zeros((2400, 1080, 3), dtype=np.uint8)
+        self.assertIs(frame_stream.fit_to_display(image, (1080, 2400)), image)
+
+    def test_fallback_resolution_is_mapped_to_display(self):
+        # Bộ mã hóa không hỗ trợ 1080x2400: screenrecord dùng 720x1280 (có viền hai bên)
+        for video_size in ((720, 1280), (1280, 720), (1072, 2384)):
+            with self.subTest(video_size=video_size):
+                frame = letterboxed_frame((1080, 2400), video_size)
+                image = frame_stream.fit_to_display(frame, (1080, 2400))
+                self.assertEqual(image.shape[:2], (2400, 1080))
+                self.assert_square_at(image, 500, 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Kiểm tra so khớp song song các biến thể của utils.image_recognition.
+
+Chạy: python -m unittest discover -s tests
+"""
+
+import os
+import time
+import random
+import shutil
+import tempfile
+import unittest
+
+from helpers import load_oiadb
+
+image_recognition = load_oiadb("utils.image_recognition")
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = np = None
+
+
+@unittest.skipIf(cv2 is None, "cần OpenCV và NumPy")
+class EarlyCancelTest(unittest.TestCase):
+
+    SCALE_STEPS = 8
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template_path = os.path.join(self.tmp, "template.png")
+        template = np.zeros((40, 40, 3), dtype=np.uint8)
+        template[10:30, 10:30] = 255
+        cv2.imwrite(self.template_path, template)
+        self.screen = np.zeros((400, 400, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def recognizer(self, workers, confidences, certain_confidence=image_recognition.CERTAIN_MATCH_CONFIDENCE):
+        """ImageRecognition với hàm so khớp giả: độ tương đồng theo chiều rộng mẫu, thời gian ngẫu nhiên."""
+        ir = image_recognition.ImageRecognition(None, match_workers=workers,
+                                                certain_confidence=certain_confidence)
+        ir._take_screenshot = lambda: self.screen
+        widths = []
+
+        def match_variant(screen, template, threshold, multiple):
+            width = template.shape[1]
+            widths.append(width)
+            # Biến thể nhỏ (đứng trước) chạy lâu hơn để biến thể đứng sau hoàn thành trước
+            time.sleep(random.uniform(0, 0.002) + 0.0005 * (100 - width) / 10)
+            return [(width, 0, confidences(width))]
+
+        ir._match_variant = match_variant
+        return ir, widths
+
+    def find(self, ir):
+        return ir.find_image(self.template_path, threshold=0.5, scale_range=(0.5, 1.5),
+                             scale_steps=self.SCALE_STEPS, use_gray=False)
+
+    def test_parallel_result_matches_sequential(self):
+        # Nhiều biến thể đạt mức chắc chắn với độ tương đồng khác nhau
+        scores = {}
+
+        def confidences(width):
+            return scores.setdefault(width, random.choice([0.9, 0.991, 0.995, 0.999]))
+
+        for _ in range(20):
+            scores.clear()
+            sequential, _ = self.recognizer(1, confidences)
+            expected = self.find(sequential)
+            for _ in range(5):
+                parallel, _ = self.recognizer(4, confidences)
+                self.assertEqual(self.find(parallel), expected)
+
+    def test_certain_variant_skips_only_later_variants(self):
+        ir, widths = self.recognizer(4, lambda width: 1.0)
+        result = self.find(ir)
+        # Biến thể đầu tiên chắc chắn: kết quả luôn là biến thể đầu tiên
+        self.assertEqual(result[2], 1.0)
+        self.assertEqual(result[0] - min(widths) // 2, min(widths))
+
+    def test_disable_early_cancel(self):
+        ir, widths = self.recognizer(4, lambda width: 1.0, certain_confidence=None)
+        self.find(ir)
+        self.assertEqual(len(widths), self.SCALE_STEPS)
+
+
+if __name__ == "__main__":
+    unittest.main()
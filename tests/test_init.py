@@ -0,0 +1,120 @@
+"""
+Kiểm tra khởi tạo MyADB với một adb giả (không cần thiết bị thật).
+
+Chạy: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from helpers import load_oiadb
+
+# adb giả: một thiết bị "emu-1" đã cài oiadb-server; "forward tcp:0" in ra cổng của
+# server /ping giả, hoặc thất bại nếu cổng là 0
+FAKE_ADB = """#!{python}
+import sys
+args = sys.argv[1:]
+if args[:1] == ["-s"]:
+    args = args[2:]
+if args[:1] == ["version"]:
+    print("Android Debug Bridge version 1.0.41")
+elif args[:1] == ["devices"]:
+    print("List of devices attached\\nemu-1\\tdevice\\n")
+elif args[:2] == ["forward", "tcp:0"]:
+    if {port} == 0:
+        sys.stderr.write("error: cannot bind listener\\n")
+        sys.exit(1)
+    print({port})
+elif args[:3] == ["shell", "pm", "list"]:
+    for name in ("{package}", "{package}.test"):
+        print("package:/data/app/" + name + "/base.apk=" + name + " versionCode:1 uid:10100")
+"""
+
+
+class _PingHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.send_response(200 if self.path == "/ping" else 404)
+        self.end_headers()
+        self.wfile.write(b"pong")
+
+    def log_message(self, *args):
+        pass
+
+
+class InitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.adb_module = load_oiadb("adb")
+        self.exceptions = load_oiadb("exceptions")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write_fake_adb(self, port: int) -> str:
+        path = os.path.join(self.tmp, "adb")
+        with open(path, "w") as f:
+            f.write(FAKE_ADB.format(python=sys.executable, port=port,
+                                    package=self.adb_module.SERVER_PACKAGE_NAME))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def construct(self, adb_path: str, **kwargs):
+        """Khởi tạo MyADB trong một luồng riêng; trả về đối tượng MyADB hoặc lỗi đã xảy ra."""
+        outcome = []
+
+        def target():
+            try:
+                outcome.append(self.adb_module.MyADB(adb_path=adb_path, auto_install_adb=False,
+                                                     **kwargs))
+            except Exception as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), "MyADB() did not return (deadlock during setup)")
+        return outcome[0]
+
+    @unittest.skipIf(os.name == "nt", "adb giả là script shebang")
+    def test_server_setup_on_warm_device(self):
+        # Các bước cài đặt server chạy trên luồng phụ trong khi luồng khởi tạo giữ _init_lock
+        server = HTTPServer(("127.0.0.1", 0), _PingHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            port = server.server_address[1]
+            result = self.construct(self.write_fake_adb(port))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIsInstance(result, self.adb_module.MyADB)
+        self.assertEqual(result.local_server_port, port)
+        # Server đã chạy: không cài đặt/khởi động lại
+        self.assertEqual(set(result.server_setup_timings), {"forward", "install_check", "ping", "total"})
+        self.assertTrue(result._is_server_installed())
+
+    @unittest.skipIf(os.name == "nt", "adb giả là script shebang")
+    def test_server_setup_failure_raises(self):
+        result = self.construct(self.write_fake_adb(0))
+        self.assertIsInstance(result, self.exceptions.ADBError)
+        self.assertIn("port forwarding", str(result))
+
+    @unittest.skipIf(os.name == "nt", "adb giả là script shebang")
+    def test_construct_without_server(self):
+        result = self.construct(self.write_fake_adb(0), auto_start_server=False)
+        self.assertIsInstance(result, self.adb_module.MyADB)
+        self.assertEqual(result.device_id, "emu-1")
+        self.assertEqual(result.server_setup_timings, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Kiểm tra phân tích đầu ra "dumpsys package" của utils.package_inventory.
+
+Chạy: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from helpers import load_oiadb
+
+package_inventory = load_oiadb("utils.package_inventory")
+
+# Ứng dụng hệ thống đã được cập nhật: bản đang chạy nằm trong "Packages:", bản cài sẵn
+# nằm trong "Hidden system packages:" với cùng tên package
+DUMPSYS_PACKAGES = """\
+Database versions:
+  Internal:
+    sdkVersion=34 databaseVersion=3
+
+Packages:
+  Package [com.android.chrome] (5c1f2e7):
+    userId=10113
+    pkg=Package{a1b2c3d com.android.chrome}
+    codePath=/data/app/~~x==/com.android.chrome-y==
+    versionCode=609904333 minSdk=29 targetSdk=34
+    versionName=120.0.6099.43
+    flags=[ SYSTEM HAS_CODE ALLOW_CLEAR_USER_DATA UPDATED_SYSTEM_APP ]
+    timeStamp=2023-12-01 10:00:00
+    firstInstallTime=2008-12-31 16:00:00
+    lastUpdateTime=2023-12-01 10:00:05
+    installerPackageName=com.android.vending
+    install permissions:
+      android.permission.INTERNET: granted=true
+  Package [com.example.app] (7d3e9a0):
+    userId=10150
+    versionCode=42 minSdk=21 targetSdk=33
+    versionName=1.4.2
+    installerPackageName=null
+
+Hidden system packages:
+  Package [com.android.chrome] (e4f5a6b):
+    userId=10113
+    pkg=Package{f6e5d4c com.android.chrome}
+    codePath=/product/app/Chrome
+    versionCode=489605833 minSdk=29 targetSdk=33
+    versionName=100.0.4896.58
+
+Queries:
+  system apps queryable: false
+"""
+
+
+class SplitPackageBlocksTest(unittest.TestCase):
+
+    def test_hidden_system_package_does_not_override_live_block(self):
+        blocks = package_inventory.split_package_blocks(DUMPSYS_PACKAGES)
+        self.assertEqual(set(blocks), {"com.android.chrome", "com.example.app"})
+
+        details = package_inventory.parse_package_details(blocks["com.android.chrome"], "com.android.chrome")
+        self.assertEqual(details["version_name"], "120.0.6099.43")
+        self.assertEqual(details["version_code"], 609904333)
+        self.assertEqual(details["target_sdk"], 34)
+        self.assertEqual(details["installer"], "com.android.vending")
+        self.assertEqual(details["permissions"], ["android.permission.INTERNET"])
+
+    def test_block_ends_at_next_section(self):
+        blocks = package_inventory.split_package_blocks(DUMPSYS_PACKAGES)
+        details = package_inventory.parse_package_details(blocks["com.example.app"], "com.example.app")
+        self.assertEqual(details["version_name"], "1.4.2")
+        self.assertEqual(details["target_sdk"], 33)
+        self.assertIsNone(details["installer"])
+        self.assertNotIn("Hidden system packages", blocks["com.example.app"])
+
+    def test_only_hidden_block(self):
+        # Không có khối đang chạy thì không trả về bản cài sẵn
+        output = DUMPSYS_PACKAGES[DUMPSYS_PACKAGES.index("Hidden system packages:"):]
+        self.assertEqual(package_inventory.split_package_blocks(output), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,16 @@ Tiện ích nâng cao cho thư viện My ADB Lib.
 """
 
 import os
+import sys
 import time
 import logging
 import subprocess
 import threading
-from typing import List, Dict, Any, Optional, Union, Callable
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union, Callable, Tuple, FrozenSet
+
+from .cache_policy import tags_overlap
 
 # Thiết lập logging
 logger = logging.getLogger('my_adb_lib')
@@ -34,113 +39,196 @@ class CommandResult:
         return self.success
 
 
+class BytesCommandResult(CommandResult):
+    """Kết quả của một lệnh ADB với stdout dạng bytes (dữ liệu nhị phân, không giải mã)."""
+
+    def __init__(self, command: str, stdout: bytes, stderr: str, return_code: int):
+        super().__init__(command, stdout, stderr, return_code)
+
+    def __str__(self) -> str:
+        return self.stdout.decode(errors='ignore') if self.success else self.stderr
+
+    def __bytes__(self) -> bytes:
+        return self.stdout
+
+    def __len__(self) -> int:
+        return len(self.stdout)
+
+
 class AsyncCommandExecutor:
-    """Lớp thực thi lệnh ADB bất đồng bộ."""
+    """
+    Lớp thực thi lệnh ADB bất đồng bộ trên một nhóm luồng có giới hạn.
+
+    Mỗi lệnh trả về một ``concurrent.futures.Future`` chứa CommandResult. Khi số lệnh
+    đang chạy và đang chờ đạt ``max_workers + max_queue``, ``execute`` sẽ chờ cho tới
+    khi có chỗ trống (backpressure). Kết quả được xóa khỏi bộ nhớ ngay khi được lấy
+    qua ``get_result`` hoặc sau ``result_ttl`` giây kể từ khi lệnh hoàn thành.
+    """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 8, max_queue: int = 64, result_ttl: float = 300):
+        """
+        Khởi tạo executor.
+        
+        Args:
+            max_workers: Số lệnh chạy đồng thời tối đa
+            max_queue: Số lệnh chờ tối đa trước khi execute() bị chặn
+            result_ttl: Thời gian giữ kết quả chưa được lấy (giây)
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+        
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
         self.processes: Dict[str, subprocess.Popen] = {}
-        self.results: Dict[str, CommandResult] = {}
-        self.callbacks: Dict[str, Callable] = {}
+        self.futures: Dict[str, Future] = {}
+        self._completed_at: Dict[str, float] = {}
         self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
     
     def execute(self, command_id: str, command: List[str], 
                 callback: Optional[Callable] = None, 
-                timeout: Optional[int] = None) -> None:
+                timeout: Optional[int] = None) -> Future:
         """
         Thực thi lệnh bất đồng bộ.
         
         Args:
             command_id: ID duy nhất cho lệnh
             command: Danh sách các thành phần lệnh
-            callback: Hàm callback khi lệnh hoàn thành
+            callback: Hàm callback(CommandResult) khi lệnh hoàn thành
             timeout: Thời gian chờ tối đa (giây)
+            
+        Returns:
+            Future chứa CommandResult của lệnh
         """
-        def _run_command():
+        self._purge_expired()
+        
+        # Chặn khi hàng đợi đã đầy
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._run_command, command_id, command, timeout)
+        except Exception:
+            self._slots.release()
+            raise
+        
+        with self._lock:
+            self.futures[command_id] = future
+            self._in_flight += 1
+            self._submitted += 1
+        future.add_done_callback(lambda f: self._on_done(command_id, f, callback))
+        return future
+    
+    def _run_command(self, command_id: str, command: List[str],
+                     timeout: Optional[int]) -> CommandResult:
+        try:
+            logger.debug(f"Executing command: {' '.join(command)}")
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                # text=True # Removed for Python 3.6 compatibility
+            )
+            
+            with self._lock:
+                self.processes[command_id] = process
+            
             try:
-                logger.debug(f"Executing command: {' '.join(command)}")
-                process = subprocess.Popen(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    # text=True # Removed for Python 3.6 compatibility
+                stdout_bytes, stderr_bytes = process.communicate(timeout=timeout)
+                return CommandResult(
+                    command=' '.join(command),
+                    stdout=stdout_bytes.decode(errors='ignore'),
+                    stderr=stderr_bytes.decode(errors='ignore'),
+                    return_code=process.returncode
                 )
-                
-                with self._lock:
-                    self.processes[command_id] = process
-                
-                try:
-                    stdout_bytes, stderr_bytes = process.communicate(timeout=timeout)
-                    stdout = stdout_bytes.decode(errors='ignore')
-                    stderr = stderr_bytes.decode(errors='ignore')
-                    result = CommandResult(
-                        command=' '.join(command),
-                        stdout=stdout,
-                        stderr=stderr,
-                        return_code=process.returncode
-                    )
-                    
-                    with self._lock:
-                        self.results[command_id] = result
-                        if command_id in self.processes:
-                            del self.processes[command_id]
-                    
-                    if callback:
-                        callback(result)
-                    
-                except subprocess.TimeoutExpired:
-                    with self._lock:
-                        if command_id in self.processes:
-                            self.processes[command_id].kill()
-                            del self.processes[command_id]
-                    
-                    result = CommandResult(
-                        command=' '.join(command),
-                        stdout="",
-                        stderr=f"Command timed out after {timeout} seconds",
-                        return_code=-1
-                    )
-                    self.results[command_id] = result
-                    
-                    if callback:
-                        callback(result)
-            
-            except Exception as e:
-                logger.error(f"Error executing command {command_id}: {str(e)}")
-                result = CommandResult(
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                return CommandResult(
                     command=' '.join(command),
                     stdout="",
-                    stderr=str(e),
+                    stderr=f"Command timed out after {timeout} seconds",
                     return_code=-1
                 )
-                
-                with self._lock:
-                    self.results[command_id] = result
-                    if command_id in self.processes:
-                        del self.processes[command_id]
-                
-                if callback:
-                    callback(result)
         
-        thread = threading.Thread(target=_run_command)
-        thread.daemon = True
-        thread.start()
+        except Exception as e:
+            logger.error(f"Error executing command {command_id}: {str(e)}")
+            return CommandResult(
+                command=' '.join(command),
+                stdout="",
+                stderr=str(e),
+                return_code=-1
+            )
+        finally:
+            with self._lock:
+                self.processes.pop(command_id, None)
+    
+    def _on_done(self, command_id: str, future: Future, callback: Optional[Callable]) -> None:
+        self._slots.release()
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            if self.futures.get(command_id) is future:
+                self._completed_at[command_id] = time.time()
+        
+        if callback and not future.cancelled():
+            try:
+                callback(future.result())
+            except Exception as e:
+                logger.error(f"Error in async command callback: {str(e)}")
+    
+    def _purge_expired(self) -> None:
+        """Xóa các kết quả đã hoàn thành quá ``result_ttl`` giây mà chưa được lấy."""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [cid for cid, done_at in self._completed_at.items() if done_at < cutoff]
+            for command_id in expired:
+                del self._completed_at[command_id]
+                self.futures.pop(command_id, None)
+    
+    def get_future(self, command_id: str) -> Optional[Future]:
+        """
+        Lấy Future của lệnh theo ID (không xóa kết quả).
+        
+        Args:
+            command_id: ID của lệnh
+            
+        Returns:
+            Future hoặc None nếu không có lệnh với ID này
+        """
+        with self._lock:
+            return self.futures.get(command_id)
     
     def get_result(self, command_id: str) -> Optional[CommandResult]:
         """
-        Lấy kết quả của lệnh theo ID.
+        Lấy kết quả của lệnh theo ID. Kết quả bị xóa khỏi executor sau khi được lấy.
         
         Args:
             command_id: ID của lệnh
             
         Returns:
-            CommandResult hoặc None nếu lệnh chưa hoàn thành
+            CommandResult hoặc None nếu lệnh chưa hoàn thành (hoặc kết quả đã được lấy)
         """
+        self._purge_expired()
         with self._lock:
-            return self.results.get(command_id)
+            future = self.futures.get(command_id)
+            if future is None or not future.done():
+                return None
+            del self.futures[command_id]
+            self._completed_at.pop(command_id, None)
+        
+        if future.cancelled():
+            return None
+        return future.result()
     
     def is_running(self, command_id: str) -> bool:
         """
-        Kiểm tra xem lệnh có đang chạy không.
+        Kiểm tra xem lệnh có đang chạy (hoặc đang chờ chạy) không.
         
         Args:
             command_id: ID của lệnh
@@ -149,11 +237,12 @@ class AsyncCommandExecutor:
             True nếu lệnh đang chạy, False nếu không
         """
         with self._lock:
-            return command_id in self.processes
+            future = self.futures.get(command_id)
+            return future is not None and not future.done()
     
     def kill(self, command_id: str) -> bool:
         """
-        Hủy lệnh đang chạy.
+        Hủy lệnh đang chạy hoặc đang chờ.
         
         Args:
             command_id: ID của lệnh
@@ -162,14 +251,56 @@ class AsyncCommandExecutor:
             True nếu lệnh đã bị hủy thành công, False nếu không
         """
         with self._lock:
-            if command_id in self.processes:
-                try:
-                    self.processes[command_id].kill()
-                    del self.processes[command_id]
-                    return True
-                except:
-                    return False
-            return False
+            future = self.futures.get(command_id)
+            process = self.processes.get(command_id)
+        
+        if future is not None and future.cancel():
+            return True
+        if process is not None:
+            try:
+                process.kill()
+                return True
+            except OSError:
+                return False
+        return False
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Lấy thống kê của executor.
+        
+        Returns:
+            Dictionary gồm in_flight (đang chạy + đang chờ), running, queued,
+            submitted, completed và pending_results (kết quả chưa được lấy)
+        """
+        with self._lock:
+            running = len(self.processes)
+            return {
+                "in_flight": self._in_flight,
+                "running": running,
+                "queued": max(0, self._in_flight - running),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "pending_results": len(self._completed_at),
+            }
+    
+    def reset_stats(self) -> None:
+        """Đặt lại các bộ đếm submitted/completed."""
+        with self._lock:
+            self._submitted = 0
+            self._completed = 0
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Dừng executor; các lệnh đang chờ bị hủy.
+        
+        Args:
+            wait: Chờ các lệnh đang chạy kết thúc
+        """
+        with self._lock:
+            pending = list(self.futures.values())
+        for future in pending:
+            future.cancel()
+        self._pool.shutdown(wait=wait)
 
 
 class DeviceMonitor:
@@ -262,21 +393,70 @@ class DeviceMonitor:
             time.sleep(1)
 
 
+class _InFlight:
+    """Một lần tải giá trị đang chạy, được chia sẻ giữa các luồng yêu cầu cùng khóa."""
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+    
+    def set_result(self, value):
+        self._value = value
+        self._event.set()
+    
+    def set_exception(self, error):
+        self._error = error
+        self._event.set()
+    
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def _value_size(value) -> int:
+    """Ước lượng kích thước (byte) của giá trị được cache."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="ignore"))
+    return sys.getsizeof(value)
+
+
 class ResultCache:
-    """Lớp cache kết quả lệnh ADB."""
+    """
+    Lớp cache kết quả lệnh ADB.
+    
+    Loại bỏ theo LRU với chi phí O(1), giới hạn cả số mục lẫn tổng kích thước (byte);
+    mỗi mục có thời gian sống riêng.
+    """
     
-    def __init__(self, max_size=100, ttl=60):
+    def __init__(self, max_size=100, ttl=60, max_bytes=8 * 1024 * 1024):
         """
         Khởi tạo cache.
         
         Args:
-            max_size: Kích thước tối đa của cache
-            ttl: Thời gian sống của mỗi mục cache (giây)
+            max_size: Kích thước tối đa của cache (số mục)
+            ttl: Thời gian sống mặc định của mỗi mục cache (giây)
+            max_bytes: Tổng kích thước tối đa của các giá trị trong cache (byte)
         """
-        self._cache = {}
+        # key -> (thời điểm hết hạn, giá trị, kích thước, nhãn); thứ tự = thứ tự dùng gần nhất
+        self._cache: "OrderedDict[Any, Tuple[float, Any, int, FrozenSet[str]]]" = OrderedDict()
         self._max_size = max_size
+        self._max_bytes = max_bytes
         self._ttl = ttl
+        self._bytes = 0
         self._lock = threading.Lock()
+        self._inflight: Dict[Any, _InFlight] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._invalidations = 0
+        # Tăng mỗi lần invalidate: kết quả tải trước thời điểm đó không được lưu
+        self._generation = 0
     
     def get(self, key):
         """
@@ -289,36 +469,172 @@ class ResultCache:
             Giá trị cache hoặc None nếu không tìm thấy hoặc đã hết hạn
         """
         with self._lock:
-            if key not in self._cache:
-                return None
+            value = self._get_locked(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return value
+    
+    def _get_locked(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value, _, _ = entry
+        if time.monotonic() >= expires_at:
+            self._remove_locked(key)
+            return None
+        
+        self._cache.move_to_end(key)
+        return value
+    
+    def get_or_load(self, key, loader: Callable[[], Any], ttl: Optional[float] = None,
+                    tags: FrozenSet[str] = frozenset()):
+        """
+        Lấy giá trị từ cache; nếu chưa có thì gọi ``loader`` để tải và lưu lại.
+        
+        Các luồng gọi đồng thời với cùng khóa chỉ kích hoạt một lần ``loader``
+        (single-flight): luồng đầu tiên tải, các luồng còn lại chờ và dùng chung kết quả
+        (hoặc lỗi) của lần tải đó.
+        
+        Args:
+            key: Khóa cache
+            loader: Hàm không đối số trả về giá trị cần cache
+            ttl: Thời gian sống của giá trị vừa tải (giây); None để dùng TTL mặc định
+            tags: Nhãn dữ liệu mà giá trị phụ thuộc (xem invalidate_tags)
             
-            timestamp, value = self._cache[key]
-            if time.time() - timestamp > self._ttl:
-                del self._cache[key]
-                return None
+        Returns:
+            Giá trị trong cache hoặc giá trị vừa tải
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self._hits += 1
+                return value
             
-            return value
+            call = self._inflight.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _InFlight()
+                self._inflight[key] = call
+                self._misses += 1
+                leader = True
+            generation = self._generation
+        
+        if not leader:
+            return call.wait()
+        
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            call.set_exception(e)
+            raise
+        
+        with self._lock:
+            del self._inflight[key]
+            # Dữ liệu có thể đã thay đổi trong lúc tải: chỉ trả kết quả, không lưu
+            if generation == self._generation:
+                self._set_locked(key, value, ttl, tags)
+        call.set_result(value)
+        return value
     
-    def set(self, key, value):
+    def set(self, key, value, ttl: Optional[float] = None, tags: FrozenSet[str] = frozenset()):
         """
         Đặt giá trị vào cache.
         
         Args:
             key: Khóa cache
             value: Giá trị cần cache
+            ttl: Thời gian sống (giây); None để dùng TTL mặc định, 0 để không cache
+            tags: Nhãn dữ liệu mà giá trị phụ thuộc (xem invalidate_tags)
         """
         with self._lock:
-            # Nếu cache đầy, xóa mục cũ nhất
-            if len(self._cache) >= self._max_size:
-                oldest_key = min(self._cache.keys(), key=lambda k: self._cache[k][0])
-                del self._cache[oldest_key]
+            self._set_locked(key, value, ttl, tags)
+    
+    def _set_locked(self, key, value, ttl: Optional[float] = None, tags: FrozenSet[str] = frozenset()):
+        if ttl is None:
+            ttl = self._ttl
+        if key in self._cache:
+            self._remove_locked(key)
+        
+        size = _value_size(value)
+        if ttl <= 0 or size > self._max_bytes:
+            return
+        
+        # Xóa các mục ít được dùng gần đây nhất cho tới khi đủ chỗ
+        while self._cache and (len(self._cache) >= self._max_size
+                               or self._bytes + size > self._max_bytes):
+            _, (_, _, evicted_size, _) = self._cache.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+        
+        self._cache[key] = (time.monotonic() + ttl, value, size, tags)
+        self._bytes += size
+    
+    def _remove_locked(self, key):
+        _, _, size, _ = self._cache.pop(key)
+        self._bytes -= size
+    
+    def invalidate_tags(self, tags: FrozenSet[str]) -> int:
+        """
+        Xóa các mục cache phụ thuộc vào dữ liệu đã thay đổi.
+        
+        Args:
+            tags: Nhãn dữ liệu bị thay đổi (TAG_ALL để xóa toàn bộ)
             
-            self._cache[key] = (time.time(), value)
+        Returns:
+            Số mục đã bị xóa
+        """
+        if not tags:
+            return 0
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._cache.items() if tags_overlap(entry[3], tags)]
+            for key in stale:
+                self._remove_locked(key)
+            self._invalidations += len(stale)
+            return len(stale)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Lấy thống kê sử dụng cache.
+        
+        Returns:
+            Dictionary gồm size, bytes, hits, misses, evictions, invalidations, coalesced (số lần gọi
+            dùng chung một lần thực thi đang chạy) và inflight (số lần tải đang chạy)
+        """
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "bytes": self._bytes,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "inflight": len(self._inflight),
+            }
+    
+    def reset_stats(self):
+        """Đặt lại các bộ đếm (hits, misses, evictions, ...) mà không xóa dữ liệu."""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._coalesced = 0
+            self._evictions = 0
+            self._invalidations = 0
     
     def clear(self):
         """Xóa toàn bộ cache."""
         with self._lock:
             self._cache.clear()
+            self._bytes = 0
+            self._generation += 1
     
     def remove(self, key):
         """
@@ -329,4 +645,4 @@ class ResultCache:
         """
         with self._lock:
             if key in self._cache:
-                del self._cache[key]
+                self._remove_locked(key)
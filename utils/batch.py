@@ -0,0 +1,264 @@
+"""
+Gộp nhiều lệnh shell thành một lượt thực thi trên thiết bị.
+"""
+
+import uuid
+import logging
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+from ..exceptions import ADBCommandError
+from .advanced import CommandResult
+from .transport import quote_shell_arg
+from .cache_policy import is_mutating_command, invalidation_tags
+
+if TYPE_CHECKING:
+    from ..adb import MyADB
+
+# Thiết lập logging
+logger = logging.getLogger("oiadb")
+
+# Giới hạn độ dài của một lệnh shell gộp (adb cũ giới hạn payload ở 4096 byte)
+MAX_SCRIPT_LENGTH = 4000
+
+
+class BatchResult:
+    """
+    Kết quả (dạng future) của một lệnh trong batch.
+    Giá trị chỉ có sau khi batch được thực thi.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self._result: Optional[CommandResult] = None
+        self._error: Optional[Exception] = None
+
+    def done(self) -> bool:
+        """Kiểm tra lệnh đã có kết quả hay chưa."""
+        return self._result is not None or self._error is not None
+
+    def result(self) -> str:
+        """
+        Lấy stdout của lệnh.
+
+        Returns:
+            Kết quả lệnh dưới dạng chuỗi
+
+        Raises:
+            RuntimeError: Nếu batch chưa được thực thi
+            ADBCommandError: Nếu lệnh thất bại
+        """
+        if not self.done():
+            raise RuntimeError("Batch has not been executed yet")
+        if self._error is not None:
+            raise self._error
+        if not self._result.success:
+            raise ADBCommandError(
+                command=self.command,
+                error_message=self._result.stderr,
+                return_code=self._result.return_code
+            )
+        return self._result.stdout
+
+    @property
+    def stdout(self) -> str:
+        """Stdout của lệnh (rỗng nếu lệnh không chạy được)."""
+        return self._result.stdout if self._result is not None else ""
+
+    @property
+    def stderr(self) -> str:
+        """Stderr của lệnh."""
+        if self._result is not None:
+            return self._result.stderr
+        return str(self._error) if self._error is not None else ""
+
+    @property
+    def return_code(self) -> Optional[int]:
+        """Mã thoát của lệnh, None nếu chưa có kết quả."""
+        if self._result is not None:
+            return self._result.return_code
+        return -1 if self._error is not None else None
+
+    def _set_result(self, result: CommandResult) -> None:
+        self._result = result
+
+    def _set_exception(self, error: Exception) -> None:
+        self._error = error
+
+
+class CommandBatch:
+    """
+    Hàng đợi các lệnh shell được gửi tới thiết bị trong một lần gọi ``shell``.
+
+    Ví dụ:
+        with adb.batch() as b:
+            model = b.shell("getprop ro.product.model")
+            size = b.shell("wm size")
+        print(model.result(), size.result())
+    """
+
+    def __init__(self, adb: "MyADB", use_cache: bool = True):
+        """
+        Khởi tạo batch.
+
+        Args:
+            adb: Đối tượng MyADB dùng để thực thi
+            use_cache: Dùng cache của MyADB cho các lệnh trong batch
+        """
+        self.adb = adb
+        self.use_cache = use_cache
+        self._pending: List[Tuple[str, BatchResult]] = []
+        self._executed = False
+
+    def shell(self, command: str) -> BatchResult:
+        """
+        Thêm một lệnh shell vào batch.
+
+        Args:
+            command: Lệnh shell trên thiết bị (không bao gồm "shell")
+
+        Returns:
+            BatchResult sẽ có giá trị sau khi batch được thực thi
+        """
+        if self._executed:
+            raise RuntimeError("Batch has already been executed")
+        handle = BatchResult(f"shell {command}")
+        self._pending.append((command, handle))
+        return handle
+
+    def run(self, command: str) -> BatchResult:
+        """
+        Thêm một lệnh ADB dạng "shell ..." vào batch.
+
+        Args:
+            command: Lệnh ADB (phải bắt đầu bằng "shell")
+
+        Returns:
+            BatchResult sẽ có giá trị sau khi batch được thực thi
+
+        Raises:
+            ValueError: Nếu lệnh không phải lệnh shell
+        """
+        parts = command.split(None, 1)
+        if len(parts) < 2 or parts[0] != "shell":
+            raise ValueError(f"Only shell commands can be batched: {command}")
+        return self.shell(parts[1])
+
+    def execute(self) -> None:
+        """Gửi các lệnh đang chờ tới thiết bị và phân phối kết quả."""
+        if self._executed:
+            return
+        self._executed = True
+
+        pending = []
+        mutated = False
+        for command, handle in self._pending:
+            # Sau một lệnh ghi, các lệnh đọc phía sau phải chạy lại trên thiết bị
+            cached = None if mutated else self._cache_get(handle.command)
+            mutated = mutated or bool(invalidation_tags(handle.command))
+            if cached is not None:
+                handle._set_result(CommandResult(handle.command, cached, "", 0))
+            else:
+                pending.append((command, handle))
+
+        for group in self._split_groups(pending):
+            self._execute_group(group)
+
+    def __enter__(self) -> "CommandBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.execute()
+
+    def _execute_group(self, group: List[Tuple[str, BatchResult]]) -> None:
+        batch_id = uuid.uuid4().hex[:12]
+        markers = ["__OIADB_{}_{}__".format(batch_id, i) for i in range(len(group))]
+        # Không có shell_v2, stderr bị gộp vào stdout: không dùng chuỗi đánh dấu trên stderr
+        # (stderr của từng lệnh để rỗng, nội dung của nó nằm trong stdout như với "adb shell")
+        split_stderr = self.adb.has_shell_v2()
+        template = "sh -c {0} </dev/null; printf '\\n%s %d\\n' {1} $?"
+        if split_stderr:
+            template += "; printf '\\n%s\\n' {1} >&2"
+        script = "; ".join(
+            template.format(quote_shell_arg(command), marker)
+            for (command, _), marker in zip(group, markers)
+        )
+
+        logger.debug(f"Executing batch of {len(group)} shell commands")
+        try:
+            _, stdout_bytes, stderr_bytes = self.adb._run_raw(f"shell {script}", track_mutations=False)
+        except ADBCommandError as e:
+            for _, handle in group:
+                handle._set_exception(e)
+            return
+        finally:
+            for _, handle in group:
+                self.adb._invalidate_for(handle.command)
+
+        # Kết quả đọc trước lệnh ghi cuối cùng của nhóm có thể đã cũ: không lưu vào cache
+        last_mutation = max((i for i, (_, handle) in enumerate(group)
+                             if invalidation_tags(handle.command)), default=-1)
+
+        stdout = stdout_bytes.decode(errors="ignore")
+        stderr = stderr_bytes.decode(errors="ignore")
+        out_pos = 0
+        err_pos = 0
+        for index, ((command, handle), marker) in enumerate(zip(group, markers)):
+            out_index = stdout.find("\n" + marker + " ", out_pos)
+            if out_index == -1:
+                handle._set_exception(ADBCommandError(
+                    command=handle.command,
+                    error_message="Batched command did not complete",
+                    return_code=-1
+                ))
+                continue
+            line_end = stdout.find("\n", out_index + len(marker) + 2)
+            if line_end == -1:
+                line_end = len(stdout)
+            try:
+                return_code = int(stdout[out_index + len(marker) + 2:line_end].strip())
+            except ValueError:
+                return_code = -1
+            command_stdout = stdout[out_pos:out_index]
+            out_pos = line_end + 1
+
+            err_index = stderr.find("\n" + marker + "\n", err_pos) if split_stderr else -1
+            if err_index == -1:
+                command_stderr = ""
+            else:
+                command_stderr = stderr[err_pos:err_index]
+                err_pos = err_index + len(marker) + 2
+
+            handle._set_result(CommandResult(handle.command, command_stdout, command_stderr, return_code))
+            if return_code == 0 and index > last_mutation:
+                self._cache_set(handle.command, command_stdout)
+
+    def _split_groups(self, pending: List[Tuple[str, BatchResult]]) -> List[List[Tuple[str, BatchResult]]]:
+        groups = []
+        current = []
+        length = 0
+        for item in pending:
+            # Phần bao quanh mỗi lệnh (sh -c, printf, marker) chiếm khoảng 120 ký tự
+            item_length = len(item[0]) + 120
+            if current and length + item_length > MAX_SCRIPT_LENGTH:
+                groups.append(current)
+                current = []
+                length = 0
+            current.append(item)
+            length += item_length
+        if current:
+            groups.append(current)
+        return groups
+
+    def _cacheable(self, command: str) -> bool:
+        return (self.use_cache and self.adb.cache_enabled and bool(self.adb._cache)
+                and not is_mutating_command(command))
+
+    def _cache_get(self, command: str) -> Optional[str]:
+        if not self._cacheable(command):
+            return None
+        return self.adb._cache.get(self.adb._cache_key(command))
+
+    def _cache_set(self, command: str, value: str) -> None:
+        if self._cacheable(command):
+            self.adb._cache_store(command, value)
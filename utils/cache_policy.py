@@ -0,0 +1,357 @@
+"""
+Phân loại lệnh ADB để quyết định lệnh nào được phép cache/gộp kết quả.
+"""
+
+import re
+from typing import FrozenSet, List, Optional, Pattern, Set, Tuple, Union
+
+# Lệnh adb (cấp host) chỉ đọc trạng thái
+_READ_ADB_COMMANDS = {
+    "devices", "get-state", "get-serialno", "get-devpath", "version",
+    "features", "host-features", "help",
+}
+
+# Chương trình trên thiết bị luôn làm thay đổi trạng thái (hoặc không thể phân tích)
+_MUTATING_PROGRAMS = {
+    "input", "monkey", "sendevent", "rm", "rmdir", "mv", "cp", "mkdir", "touch",
+    "chmod", "chown", "chgrp", "ln", "dd", "truncate", "tee", "setprop", "svc",
+    "reboot", "kill", "killall", "pkill", "start", "stop", "screenrecord",
+    "uiautomator", "mount", "umount", "setenforce", "restorecon", "sh", "su", "bash",
+}
+
+# Chương trình có động từ con: chỉ các động từ đọc (list, get, dump, ...) là an toàn
+_VERB_PROGRAMS = {"am", "pm", "cmd", "settings", "device_config", "appops", "content", "wm"}
+_READ_VERB_PREFIXES = ("list", "get", "dump", "path", "query", "resolve", "has", "is")
+
+# Thời gian sống mặc định (giây) cho lệnh đọc không khớp quy tắc nào
+DEFAULT_TTL = 60.0
+# Cache trong suốt phiên làm việc (thông tin tĩnh của thiết bị)
+SESSION_TTL = float("inf")
+# Không cache
+NO_CACHE = 0.0
+
+# Quy tắc TTL mặc định, so khớp (re.match) với lệnh đã bỏ tiền tố "shell"/"exec-out".
+# Quy tắc đầu tiên khớp được áp dụng.
+_DEFAULT_TTL_RULES: List[Tuple[str, float]] = [
+    # Thuộc tính chỉ đọc (ro.*) không đổi cho tới khi khởi động lại
+    (r"getprop\s+ro\.", SESSION_TTL),
+    (r"pm\s+list\s+features\b", SESSION_TTL),
+    (r"wm\s+(size|density)\s*$", SESSION_TTL),
+    (r"(version|get-serialno|features|host-features)\b", SESSION_TTL),
+    (r"service\s+list\s*$", SESSION_TTL),
+    (r"cat\s+/proc/cpuinfo\s*$", SESSION_TTL),
+    # Trạng thái thay đổi liên tục
+    (r"dumpsys\s+(battery|power|window|activity|input|display|cpuinfo|meminfo|netstats|audio|alarm)\b", NO_CACHE),
+    (r"(top|ps|pidof|date|uptime|logcat|uiautomator|screencap|cat\s+/proc|cat\s+/sys)\b", NO_CACHE),
+    (r"settings\s+get\b", 5.0),
+    (r"(devices|get-state)\b", NO_CACHE),
+]
+_COMMAND_PREFIX = re.compile(r"^(shell|exec-out)(\s+-[a-zA-Z]+)*\s+")
+
+
+class TTLPolicy:
+    """
+    Chọn thời gian sống trong cache cho từng lệnh ADB theo các quy tắc mẫu lệnh.
+
+    Lệnh làm thay đổi trạng thái luôn có TTL 0 (không cache). Quy tắc do người dùng
+    thêm bằng ``add_rule`` được ưu tiên hơn quy tắc mặc định.
+    """
+
+    def __init__(self, default_ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            default_ttl: TTL (giây) cho lệnh đọc không khớp quy tắc nào
+        """
+        self.default_ttl = default_ttl
+        self._rules: List[Tuple[Pattern, float]] = [
+            (re.compile(pattern), ttl) for pattern, ttl in _DEFAULT_TTL_RULES
+        ]
+
+    def add_rule(self, pattern: Union[str, Pattern], ttl: float) -> None:
+        """
+        Thêm quy tắc TTL (ưu tiên cao nhất).
+
+        Args:
+            pattern: Biểu thức chính quy so khớp đầu lệnh (không gồm "shell"/"exec-out"),
+                ví dụ r"getprop\s+persist\."
+            ttl: Thời gian sống (giây); 0 để không cache, SESSION_TTL để cache cả phiên
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        self._rules.insert(0, (pattern, ttl))
+
+    def ttl_for(self, command: str) -> float:
+        """
+        Lấy TTL cho lệnh.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+
+        Returns:
+            Thời gian sống (giây); 0 nghĩa là không được cache
+        """
+        if is_mutating_command(command):
+            return NO_CACHE
+        body = _COMMAND_PREFIX.sub("", command.strip(), count=1)
+        for pattern, ttl in self._rules:
+            if pattern.match(body):
+                return ttl
+        return self.default_ttl
+
+
+_SEGMENT_SEPARATOR = re.compile(r";|&&|\|\||\||\n")
+# Chuyển hướng vô hại (bỏ đầu ra, gộp stderr) không làm lệnh trở thành lệnh ghi
+_HARMLESS_REDIRECT = re.compile(r"\d*>\s*/dev/null|\d*>&\d")
+
+
+def is_mutating_command(command: str) -> bool:
+    """
+    Kiểm tra lệnh ADB có làm thay đổi trạng thái thiết bị hay không.
+
+    Lệnh làm thay đổi trạng thái (input, am start, pm clear, push, install, ...) không
+    được cache và không được gộp với các lệnh giống hệt đang chạy. Khi không chắc chắn,
+    lệnh được coi là làm thay đổi trạng thái.
+
+    Args:
+        command: Lệnh ADB (không bao gồm "adb"), ví dụ "shell wm size"
+
+    Returns:
+        True nếu lệnh làm thay đổi trạng thái, False nếu lệnh chỉ đọc
+    """
+    parts = command.split()
+    if not parts:
+        return False
+
+    name = parts[0]
+    if name in ("shell", "exec-out"):
+        return _is_mutating_device_command(" ".join(parts[1:]))
+    if name in _READ_ADB_COMMANDS:
+        return False
+    if name in ("forward", "reverse"):
+        return "--list" not in parts
+    if name == "logcat":
+        return "-c" in parts
+    return True
+
+
+def _is_mutating_device_command(command: str) -> bool:
+    if not command.strip():
+        # Shell tương tác
+        return True
+    if ">" in _HARMLESS_REDIRECT.sub("", command):
+        return True
+    return any(_is_mutating_segment(segment.split())
+               for segment in _SEGMENT_SEPARATOR.split(command))
+
+
+def _is_mutating_segment(words: List[str]) -> bool:
+    words = _strip_env(words)
+    if not words:
+        return False
+
+    program = words[0].rsplit("/", 1)[-1]
+    if program in _MUTATING_PROGRAMS:
+        return True
+    if program == "logcat":
+        return "-c" in words
+    if program == "screencap":
+        # screencap ghi ra file khi có đối số đường dẫn
+        return any(not word.startswith("-") for word in words[1:])
+    if program in _VERB_PROGRAMS:
+        args = [word for word in words[1:] if not word.startswith("-")]
+        if program == "cmd":
+            args = args[1:]  # Bỏ tên dịch vụ (cmd package ..., cmd window ...)
+        if not args:
+            return False
+        verb = args[0]
+        if program == "wm" and verb in ("size", "density"):
+            # "wm size" đọc, "wm size 1080x1920" ghi
+            return len(args) > 1
+        return not verb.startswith(_READ_VERB_PREFIXES)
+    return False
+
+
+# Nhãn phụ thuộc: một lệnh đọc mang các nhãn của dữ liệu nó đọc, một lệnh ghi xóa các
+# mục cache mang nhãn bị ảnh hưởng. Nhãn có thể thu hẹp theo đối tượng ("packages:com.foo").
+TAG_ALL = "*"
+TAG_PACKAGES = "packages"
+TAG_FILES = "files"
+TAG_DISPLAY = "display"
+TAG_SETTINGS = "settings"
+TAG_PROPS = "props"
+TAG_UI = "ui"
+
+_FILE_READ_PROGRAMS = {
+    "ls", "cat", "stat", "find", "du", "df", "test", "[", "md5sum", "sha1sum",
+    "sha256sum", "wc", "head", "tail", "file", "readlink", "realpath",
+}
+_FILE_WRITE_PROGRAMS = {
+    "rm", "rmdir", "mv", "cp", "mkdir", "touch", "chmod", "chown", "chgrp", "ln",
+    "dd", "truncate", "tee", "mount", "umount", "screenrecord",
+}
+_SHELL_PROGRAMS = {"sh", "su", "bash", "reboot"}
+# Chương trình có thể làm thay đổi giao diện đang hiển thị (khi được gọi ở dạng ghi)
+_UI_PROGRAMS = {
+    "input", "monkey", "sendevent", "am", "cmd", "svc", "wm", "settings", "pm",
+    "kill", "killall", "pkill",
+}
+_PACKAGE_READ_PREFIXES = ("list", "path", "dump", "resolve", "query", "has", "is", "get")
+_HOST_INVALIDATION = {
+    "install": {TAG_PACKAGES},
+    "install-multiple": {TAG_PACKAGES},
+    "install-multi-package": {TAG_PACKAGES},
+    "uninstall": {TAG_PACKAGES},
+    "push": {TAG_FILES},
+    "sync": {TAG_FILES},
+}
+_HOST_RESET_COMMANDS = {
+    "reboot", "root", "unroot", "remount", "disable-verity", "enable-verity",
+    "kill-server", "reconnect",
+}
+
+
+def read_tags(command: str) -> FrozenSet[str]:
+    """
+    Lấy các nhãn dữ liệu mà một lệnh đọc phụ thuộc vào.
+
+    Args:
+        command: Lệnh ADB (không bao gồm "adb")
+
+    Returns:
+        Tập nhãn (rỗng nếu lệnh không phụ thuộc dữ liệu nào được theo dõi)
+    """
+    body = _device_command(command)
+    if body is None:
+        return frozenset()
+    tags: Set[str] = set()
+    for segment in _SEGMENT_SEPARATOR.split(body):
+        words = _strip_env(segment.split())
+        if not words:
+            continue
+        program = words[0].rsplit("/", 1)[-1]
+        args = [word for word in words[1:] if not word.startswith("-")]
+        if program in _FILE_READ_PROGRAMS:
+            tags.add(TAG_FILES)
+        elif program == "getprop":
+            tags.add(TAG_PROPS)
+        elif program == "settings":
+            tags.add(TAG_SETTINGS)
+        elif program == "wm":
+            tags.add(TAG_DISPLAY)
+        elif program in ("pm", "cmd"):
+            if program == "cmd":
+                if not args or args[0] != "package":
+                    continue
+                args = args[1:]
+            if args and args[0] == "list":
+                if args[1:2] == ["packages"]:
+                    tags.add(TAG_PACKAGES)
+            elif len(args) < 2:
+                tags.add(TAG_PACKAGES)
+            else:
+                tags.add(package_tag(args[-1]))
+        elif program == "dumpsys" and args:
+            if args[0] == "package":
+                tags.add(package_tag(args[1]) if len(args) > 1 else TAG_PACKAGES)
+            elif args[0] in ("display", "window"):
+                tags.add(TAG_DISPLAY)
+    return frozenset(tags)
+
+
+def invalidation_tags(command: str) -> FrozenSet[str]:
+    """
+    Lấy các nhãn dữ liệu bị một lệnh làm thay đổi.
+
+    Args:
+        command: Lệnh ADB (không bao gồm "adb")
+
+    Returns:
+        Tập nhãn cần xóa khỏi cache; chứa TAG_ALL nếu lệnh có thể thay đổi mọi thứ
+        (reboot, root, shell tương tác, ...)
+    """
+    parts = command.split()
+    if not parts or not is_mutating_command(command):
+        return frozenset()
+    name = parts[0]
+    if name in _HOST_INVALIDATION:
+        return frozenset(_HOST_INVALIDATION[name])
+    body = _device_command(command)
+    if body is None:
+        return frozenset({TAG_ALL}) if name in _HOST_RESET_COMMANDS else frozenset()
+    if not body.strip():
+        return frozenset({TAG_ALL})
+
+    tags: Set[str] = set()
+    if ">" in _HARMLESS_REDIRECT.sub("", body):
+        tags.add(TAG_FILES)
+    for segment in _SEGMENT_SEPARATOR.split(body):
+        words = _strip_env(segment.split())
+        if not words:
+            continue
+        program = words[0].rsplit("/", 1)[-1]
+        args = [word for word in words[1:] if not word.startswith("-")]
+        if program in _SHELL_PROGRAMS:
+            return frozenset({TAG_ALL})
+        if program in _UI_PROGRAMS and _is_mutating_segment(words):
+            tags.add(TAG_UI)
+        if program in _FILE_WRITE_PROGRAMS:
+            tags.add(TAG_FILES)
+        elif program == "screencap" and args:
+            tags.add(TAG_FILES)
+        elif program == "setprop":
+            tags.add(TAG_PROPS)
+        elif program == "settings" and args and not args[0].startswith(_READ_VERB_PREFIXES):
+            # Xoay màn hình, cỡ chữ, ... cũng làm thay đổi thông tin hiển thị
+            tags.update((TAG_SETTINGS, TAG_DISPLAY))
+        elif program == "wm" and _is_mutating_segment(words):
+            tags.add(TAG_DISPLAY)
+        elif program in ("pm", "cmd"):
+            if program == "cmd":
+                if not args or args[0] != "package":
+                    continue
+                args = args[1:]
+            if not args or args[0].startswith(_PACKAGE_READ_PREFIXES):
+                continue
+            if args[0] == "clear":
+                # Xóa dữ liệu một ứng dụng: danh sách gói không đổi
+                tags.add(package_tag(args[-1]) if len(args) > 1 else TAG_PACKAGES)
+                tags.add(TAG_FILES)
+            else:
+                tags.add(TAG_PACKAGES)
+    return frozenset(tags)
+
+
+def tags_overlap(entry_tags: FrozenSet[str], changed: FrozenSet[str]) -> bool:
+    """
+    Kiểm tra một mục cache có bị ảnh hưởng bởi các nhãn thay đổi hay không.
+
+    Nhãn rộng và nhãn hẹp cùng gốc ảnh hưởng lẫn nhau: "packages" bao trùm
+    "packages:com.foo" và ngược lại.
+    """
+    if TAG_ALL in changed:
+        return True
+    for tag in entry_tags:
+        for other in changed:
+            if tag == other or tag.startswith(other + ":") or other.startswith(tag + ":"):
+                return True
+    return False
+
+
+def package_tag(package_name: str) -> str:
+    """Nhãn dữ liệu của một package cụ thể (ví dụ "packages:com.foo")."""
+    return f"{TAG_PACKAGES}:{package_name}"
+
+
+def _device_command(command: str) -> Optional[str]:
+    """Trả về phần lệnh chạy trên thiết bị của lệnh shell/exec-out, ngược lại None."""
+    parts = command.split()
+    if not parts or parts[0] not in ("shell", "exec-out"):
+        return None
+    return _COMMAND_PREFIX.sub("", command.strip(), count=1) if len(parts) > 1 else ""
+
+
+def _strip_env(words: List[str]) -> List[str]:
+    # Bỏ qua các phép gán biến môi trường đứng trước lệnh (VAR=value cmd)
+    while words and "=" in words[0] and not words[0].startswith("-"):
+        words = words[1:]
+    return words
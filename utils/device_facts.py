@@ -0,0 +1,156 @@
+"""
+Cache bền vững (trên đĩa) cho các thông tin tĩnh của thiết bị.
+
+Các thông tin chỉ thay đổi khi cập nhật hệ điều hành (model, SDK, pm list features,
+service list, mật độ màn hình, thông tin CPU, ...) được lưu theo serial thiết bị và
+ro.build.fingerprint, nên các phiên sau bỏ qua được các lượt gọi shell lúc khởi động.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, FrozenSet, Optional
+
+from .cache_policy import read_tags, tags_overlap
+
+logger = logging.getLogger("oiadb")
+
+# Tăng khi định dạng file thay đổi
+FACTS_FORMAT_VERSION = 1
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+# Thuộc tính chỉ đọc: chỉ đổi cùng với ro.build.fingerprint
+_BUILD_FACT = re.compile(r"^(shell|exec-out)\s+getprop\s+ro\.")
+
+
+class DeviceFactsStore:
+    """
+    Lưu kết quả các lệnh đọc thông tin tĩnh của một thiết bị vào file JSON.
+
+    File thuộc về một cặp (serial, fingerprint): khi fingerprint trên thiết bị khác
+    với fingerprint trong file (sau OTA, flash ROM), toàn bộ dữ liệu cũ bị bỏ.
+    """
+
+    def __init__(self, cache_dir: str, serial: str, fingerprint: str):
+        """
+        Khởi tạo kho lưu trữ và nạp dữ liệu hiện có.
+
+        Args:
+            cache_dir: Thư mục chứa các file cache
+            serial: Serial thiết bị
+            fingerprint: Giá trị ro.build.fingerprint hiện tại của thiết bị
+        """
+        self.serial = serial
+        self.fingerprint = fingerprint
+        self.path = os.path.join(
+            cache_dir, "device_facts_{}.json".format(_UNSAFE_FILENAME_CHARS.sub("_", serial))
+        )
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.debug(f"Cannot create device facts cache directory {cache_dir}: {e}")
+        self._facts: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable device facts cache {self.path}: {e}")
+            return {}
+
+        if (not isinstance(data, dict) or data.get("version") != FACTS_FORMAT_VERSION
+                or data.get("serial") != self.serial or data.get("fingerprint") != self.fingerprint):
+            logger.debug(f"Device facts cache for {self.serial} is outdated, discarding")
+            return {}
+        facts = data.get("facts")
+        return facts if isinstance(facts, dict) else {}
+
+    def _save_locked(self) -> None:
+        data = {
+            "version": FACTS_FORMAT_VERSION,
+            "serial": self.serial,
+            "fingerprint": self.fingerprint,
+            "facts": self._facts,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            # Ghi nguyên tử: các tiến trình song song không đọc phải file ghi dở
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug(f"Failed to write device facts cache {self.path}: {e}")
+
+    def facts(self) -> Dict[str, str]:
+        """
+        Lấy toàn bộ thông tin đã lưu.
+
+        Returns:
+            Dictionary lệnh ADB -> đầu ra
+        """
+        with self._lock:
+            return dict(self._facts)
+
+    def get(self, command: str) -> Optional[str]:
+        """
+        Lấy đầu ra đã lưu của một lệnh.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+
+        Returns:
+            Đầu ra đã lưu hoặc None
+        """
+        with self._lock:
+            return self._facts.get(command)
+
+    def put(self, command: str, output: str) -> None:
+        """
+        Lưu đầu ra của một lệnh và ghi xuống đĩa.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+            output: Đầu ra của lệnh
+        """
+        with self._lock:
+            if self._facts.get(command) == output:
+                return
+            self._facts[command] = output
+            self._save_locked()
+
+    def invalidate_tags(self, tags: FrozenSet[str]) -> int:
+        """
+        Xóa các thông tin phụ thuộc dữ liệu đã thay đổi (ví dụ "wm density 320").
+
+        Thuộc tính ro.* không bao giờ bị xóa ở đây, kể cả với TAG_ALL (reboot,
+        "sh -c ...", ...): chúng chỉ bị bỏ khi fingerprint đổi (xem MyADB._load_device_facts).
+
+        Args:
+            tags: Nhãn dữ liệu bị thay đổi
+
+        Returns:
+            Số mục đã bị xóa
+        """
+        with self._lock:
+            stale = [command for command in self._facts
+                     if not _BUILD_FACT.match(command) and tags_overlap(read_tags(command), tags)]
+            for command in stale:
+                del self._facts[command]
+            if stale:
+                self._save_locked()
+            return len(stale)
+
+    def clear(self) -> None:
+        """Xóa toàn bộ thông tin của thiết bị (cả file trên đĩa)."""
+        with self._lock:
+            self._facts = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,116 @@
+"""
+Ảnh chụp (snapshot) thuộc tính hệ thống của thiết bị từ một lần gọi "getprop".
+"""
+
+import re
+import time
+from typing import Dict, Optional
+
+# Mỗi thuộc tính có dạng "[key]: [value]"; giá trị có thể kéo dài nhiều dòng
+_PROP_PATTERN = re.compile(r"^\[([^\]]+)\]: \[(.*?)\]$", re.MULTILINE | re.DOTALL)
+
+_TRUE_VALUES = ("1", "true", "y", "yes", "on")
+
+
+def parse_getprop(output: str) -> Dict[str, str]:
+    """
+    Phân tích đầu ra của "getprop" (không đối số).
+
+    Args:
+        output: Đầu ra của lệnh getprop
+
+    Returns:
+        Dictionary tên thuộc tính -> giá trị
+    """
+    output = output.replace("\r\n", "\n")
+    return {key: value for key, value in _PROP_PATTERN.findall(output)}
+
+
+class DeviceProperties:
+    """
+    Thuộc tính hệ thống của thiết bị tại một thời điểm, với các hàm truy cập có kiểu.
+    """
+
+    def __init__(self, properties: Dict[str, str]):
+        """
+        Args:
+            properties: Dictionary tên thuộc tính -> giá trị (xem parse_getprop)
+        """
+        self._properties = properties
+        self.created_at = time.monotonic()
+
+    @classmethod
+    def from_output(cls, output: str) -> "DeviceProperties":
+        """Tạo snapshot từ đầu ra của lệnh "getprop"."""
+        return cls(parse_getprop(output))
+
+    @property
+    def age(self) -> float:
+        """Số giây kể từ khi snapshot được tạo."""
+        return time.monotonic() - self.created_at
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._properties
+
+    def get(self, name: str, default: str = "") -> str:
+        """
+        Lấy giá trị thuộc tính dạng chuỗi.
+
+        Args:
+            name: Tên thuộc tính (ví dụ "ro.product.model")
+            default: Giá trị trả về nếu thuộc tính không tồn tại
+
+        Returns:
+            Giá trị thuộc tính
+        """
+        return self._properties.get(name, default)
+
+    def get_int(self, name: str, default: int = 0) -> int:
+        """Lấy giá trị thuộc tính dạng số nguyên, trả về default nếu không hợp lệ."""
+        try:
+            return int(self._properties.get(name, "").strip())
+        except ValueError:
+            return default
+
+    def get_bool(self, name: str, default: bool = False) -> bool:
+        """Lấy giá trị thuộc tính dạng bool ("1", "true", "yes", "on" là True)."""
+        value = self._properties.get(name)
+        if value is None or not value.strip():
+            return default
+        return value.strip().lower() in _TRUE_VALUES
+
+    def as_dict(self) -> Dict[str, str]:
+        """Lấy bản sao của toàn bộ thuộc tính."""
+        return dict(self._properties)
+
+    @property
+    def android_version(self) -> str:
+        return self.get("ro.build.version.release")
+
+    @property
+    def sdk_version(self) -> int:
+        return self.get_int("ro.build.version.sdk")
+
+    @property
+    def model(self) -> str:
+        return self.get("ro.product.model")
+
+    @property
+    def manufacturer(self) -> str:
+        return self.get("ro.product.manufacturer")
+
+    @property
+    def brand(self) -> str:
+        return self.get("ro.product.brand")
+
+    @property
+    def device(self) -> str:
+        return self.get("ro.product.device")
+
+    @property
+    def fingerprint(self) -> str:
+        return self.get("ro.build.fingerprint")
+
+    @property
+    def serialno(self) -> Optional[str]:
+        return self.get("ro.serialno") or None
@@ -0,0 +1,176 @@
+"""
+Thông tin hình học màn hình (kích thước, mật độ, góc xoay) của thiết bị.
+"""
+
+import re
+import time
+from typing import Optional, Tuple
+
+# Lệnh dò rẻ để phát hiện thay đổi góc xoay/kích thước: chỉ vài dòng của "dumpsys input"
+DISPLAY_PROBE_COMMAND = 'dumpsys input | grep -m 4 -E "SurfaceOrientation|SurfaceWidth|SurfaceHeight|orientation="'
+
+_SIZE_PATTERN = re.compile(r"(Physical|Override) size:\s*(\d+)x(\d+)")
+_DENSITY_PATTERN = re.compile(r"(Physical|Override) density:\s*(\d+)")
+_ROTATION_PATTERN = re.compile(r"SurfaceOrientation:\s*(\d)|\borientation=(\d)")
+_PROBE_DIMENSION_PATTERN = re.compile(r"Surface(Width|Height):\s*(\d+)px")
+
+
+def parse_wm_size(output: str) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+    """
+    Phân tích đầu ra của "wm size".
+
+    Returns:
+        Tuple (kích thước vật lý, kích thước ghi đè); mỗi phần tử là (width, height) hoặc None
+    """
+    physical = override = None
+    for kind, width, height in _SIZE_PATTERN.findall(output):
+        if kind == "Physical":
+            physical = (int(width), int(height))
+        else:
+            override = (int(width), int(height))
+    return physical, override
+
+
+def parse_wm_density(output: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Phân tích đầu ra của "wm density".
+
+    Returns:
+        Tuple (mật độ vật lý, mật độ ghi đè), None nếu không có
+    """
+    physical = override = None
+    for kind, density in _DENSITY_PATTERN.findall(output):
+        if kind == "Physical":
+            physical = int(density)
+        else:
+            override = int(density)
+    return physical, override
+
+
+def parse_rotation(output: str) -> Optional[int]:
+    """
+    Lấy góc xoay hiện tại (0-3, theo bội số 90 độ) từ đầu ra của DISPLAY_PROBE_COMMAND.
+
+    Returns:
+        Góc xoay hoặc None nếu không xác định được
+    """
+    match = _ROTATION_PATTERN.search(output)
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2)) % 4
+
+
+class DisplayInfo:
+    """
+    Hình học màn hình của thiết bị tại một thời điểm.
+
+    Kích thước do "wm size" trả về theo hướng tự nhiên của màn hình; ``width``/``height``
+    là kích thước theo hướng hiện tại (đã tính góc xoay và kích thước ghi đè), tức hệ tọa
+    độ dùng cho "input tap/swipe".
+    """
+
+    def __init__(self, physical_size: Tuple[int, int], override_size: Optional[Tuple[int, int]] = None,
+                 density: int = 0, override_density: Optional[int] = None, rotation: int = 0,
+                 probe: str = ""):
+        self.physical_size = physical_size
+        self.override_size = override_size
+        self.density = density
+        self.override_density = override_density
+        self.rotation = rotation
+        # Đầu ra của lệnh dò tại thời điểm tạo, dùng để phát hiện thay đổi
+        self.probe = probe
+        self.validated_at = time.monotonic()
+
+    @classmethod
+    def from_outputs(cls, wm_size: str, wm_density: str, probe: str) -> Optional["DisplayInfo"]:
+        """
+        Tạo DisplayInfo từ đầu ra của "wm size", "wm density" và DISPLAY_PROBE_COMMAND.
+
+        Returns:
+            DisplayInfo hoặc None nếu không đọc được kích thước màn hình
+        """
+        physical_size, override_size = parse_wm_size(wm_size)
+        if physical_size is None and override_size is None:
+            return None
+        density, override_density = parse_wm_density(wm_density)
+        return cls(
+            physical_size=physical_size or override_size,
+            override_size=override_size,
+            density=density or 0,
+            override_density=override_density,
+            rotation=parse_rotation(probe) or 0,
+            probe=probe,
+        )
+
+    @property
+    def natural_size(self) -> Tuple[int, int]:
+        """Kích thước đang dùng (ghi đè nếu có) theo hướng tự nhiên."""
+        return self.override_size or self.physical_size
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Kích thước (width, height) theo hướng hiện tại."""
+        width, height = self.natural_size
+        if self.rotation in (1, 3):
+            return height, width
+        return width, height
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def effective_density(self) -> int:
+        """Mật độ đang dùng (ghi đè nếu có)."""
+        return self.override_density or self.density
+
+    @property
+    def age(self) -> float:
+        """Số giây kể từ lần cuối thông tin được xác nhận còn đúng."""
+        return time.monotonic() - self.validated_at
+
+    def with_probe(self, probe: str) -> Optional["DisplayInfo"]:
+        """
+        Áp dụng kết quả dò mới.
+
+        Returns:
+            DisplayInfo đã cập nhật (chỉ góc xoay thay đổi), hoặc None nếu thay đổi không
+            thể suy ra từ kết quả dò và cần đọc lại toàn bộ
+        """
+        if probe == self.probe:
+            self.validated_at = time.monotonic()
+            return self
+        rotation = parse_rotation(probe)
+        if rotation is None:
+            return None
+        updated = DisplayInfo(self.physical_size, self.override_size, self.density,
+                              self.override_density, rotation, probe)
+        # Kích thước bề mặt đổi mà không phải do xoay: đọc lại "wm size"
+        if _probe_dimensions(probe) != _rotated_dimensions(self, rotation):
+            return None
+        return updated
+
+    def __repr__(self) -> str:
+        return "DisplayInfo(size={}x{}, density={}, rotation={})".format(
+            self.width, self.height, self.effective_density, self.rotation
+        )
+
+
+def _probe_dimensions(probe: str) -> Optional[Tuple[int, int]]:
+    values = dict(_PROBE_DIMENSION_PATTERN.findall(probe))
+    if "Width" in values and "Height" in values:
+        return int(values["Width"]), int(values["Height"])
+    return None
+
+
+def _rotated_dimensions(info: DisplayInfo, rotation: int) -> Optional[Tuple[int, int]]:
+    dimensions = _probe_dimensions(info.probe)
+    if dimensions is None:
+        return None
+    if (rotation - info.rotation) % 2:
+        return dimensions[1], dimensions[0]
+    return dimensions
@@ -0,0 +1,305 @@
+"""
+Luồng khung hình liên tục từ "screenrecord" (H.264) dùng cho nhận diện hình ảnh.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..adb import MyADB
+
+logger = logging.getLogger("oiadb")
+
+try:
+    import cv2
+    import numpy as np
+    FRAME_STREAM_AVAILABLE = hasattr(os, "mkfifo")
+except ImportError:
+    FRAME_STREAM_AVAILABLE = False
+
+# Giới hạn thời gian của một lần chạy screenrecord; luồng được nối tiếp bằng lần chạy mới
+SCREENRECORD_TIME_LIMIT = 180
+DEFAULT_BIT_RATE = 8000000
+# Chỉ giữ khung hình mới nhất
+DEFAULT_BUFFER_SIZE = 1
+# Số lần screenrecord liên tiếp thất bại trước khi dừng hẳn
+MAX_START_FAILURES = 3
+# Giảm độ trễ khi mở luồng: không phân tích trước nhiều dữ liệu, không đệm khung hình
+_FFMPEG_CAPTURE_OPTIONS = "probesize;32768|analyzeduration;0|fflags;nobuffer|flags;low_delay"
+
+
+def fit_to_display(image: "np.ndarray", display_size: Tuple[int, int]) -> "np.ndarray":
+    """
+    Đưa khung hình của screenrecord về kích thước màn hình.
+
+    Khi kích thước video khác kích thước màn hình (bộ mã hóa không hỗ trợ độ phân giải gốc
+    nên dùng 1280x720, hoặc kích thước bị làm tròn theo yêu cầu căn chỉnh), screenrecord
+    giữ tỷ lệ khung hình và thêm viền đen ở giữa. Hàm cắt phần nội dung rồi co giãn về
+    ``display_size`` để tọa độ so khớp trùng với tọa độ của "input tap".
+
+    Args:
+        image: Khung hình đã giải mã
+        display_size: Kích thước (width, height) màn hình theo hướng hiện tại
+
+    Returns:
+        Khung hình có kích thước display_size (chính ``image`` nếu đã khớp)
+    """
+    display_width, display_height = display_size
+    frame_height, frame_width = image.shape[:2]
+    if (frame_width, frame_height) == (display_width, display_height) or display_width <= 0 or display_height <= 0:
+        return image
+
+    scale = min(frame_width / display_width, frame_height / display_height)
+    content_width = min(frame_width, max(1, int(round(display_width * scale))))
+    content_height = min(frame_height, max(1, int(round(display_height * scale))))
+    x = (frame_width - content_width) // 2
+    y = (frame_height - content_height) // 2
+    content = image[y:y + content_height, x:x + content_width]
+    interpolation = cv2.INTER_AREA if scale > 1 else cv2.INTER_LINEAR
+    return cv2.resize(content, (display_width, display_height), interpolation=interpolation)
+
+
+class Frame:
+    """Một khung hình đã giải mã (BGR) cùng thời điểm nhận (time.monotonic())."""
+
+    __slots__ = ("image", "timestamp", "index")
+
+    def __init__(self, image: "np.ndarray", timestamp: float, index: int):
+        self.image = image
+        self.timestamp = timestamp
+        self.index = index
+
+    @property
+    def age(self) -> float:
+        """Số giây kể từ khi khung hình được giải mã."""
+        return time.monotonic() - self.timestamp
+
+
+class FrameStream:
+    """
+    Luồng khung hình màn hình từ "exec-out screenrecord --output-format=h264 -".
+
+    Một luồng nền chuyển dữ liệu H.264 vào một FIFO, một luồng nền khác giải mã bằng
+    OpenCV và chỉ giữ ``buffer_size`` khung hình mới nhất. screenrecord bị giới hạn
+    ``time_limit`` giây mỗi lần chạy nên được khởi động lại và nối tiếp vào cùng luồng.
+
+    screenrecord chỉ gửi khung hình mới khi màn hình thay đổi: khung hình mới nhất luôn
+    là nội dung hiện tại, kể cả khi nó đã cũ.
+
+    Kích thước khung hình có thể khác kích thước màn hình (xem fit_to_display).
+
+    Chỉ hỗ trợ hệ điều hành có FIFO (Linux, macOS, Termux).
+    """
+
+    def __init__(self, adb: "MyADB", bit_rate: int = DEFAULT_BIT_RATE,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, time_limit: int = SCREENRECORD_TIME_LIMIT):
+        """
+        Args:
+            adb: Đối tượng MyADB của thiết bị
+            bit_rate: Bit rate của screenrecord (bit/giây)
+            buffer_size: Số khung hình mới nhất được giữ
+            time_limit: Thời gian (giây) của mỗi lần chạy screenrecord (tối đa 180)
+        """
+        if not FRAME_STREAM_AVAILABLE:
+            raise ImportError(
+                "Frame streaming requires OpenCV, NumPy and a platform with FIFO support."
+            )
+        self.adb = adb
+        self.bit_rate = bit_rate
+        self.time_limit = time_limit
+        self._frames: Deque[Frame] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._threads = []
+        self._fifo_dir: Optional[str] = None
+        self._fifo_path: Optional[str] = None
+        self._started_at = 0.0
+        self._frame_count = 0
+        self._restarts = 0
+        self.error: Optional[str] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Luồng đang chạy (đã start và chưa dừng hay gặp lỗi)."""
+        return bool(self._threads) and not self._stop_event.is_set()
+
+    def start(self) -> "FrameStream":
+        """
+        Bắt đầu ghi và giải mã trong nền.
+
+        Returns:
+            Chính đối tượng này
+        """
+        if self.is_running:
+            return self
+        self._stop_event.clear()
+        self.error = None
+        self._frames.clear()
+        self._fifo_dir = tempfile.mkdtemp(prefix="oiadb_frames_")
+        # Đuôi .h264 giúp FFmpeg nhận ra định dạng mà không cần phân tích nhiều dữ liệu
+        self._fifo_path = os.path.join(self._fifo_dir, "screen.h264")
+        os.mkfifo(self._fifo_path)
+        self._started_at = time.monotonic()
+
+        self._threads = [
+            threading.Thread(target=self._pump, name="oiadb-screenrecord"),
+            threading.Thread(target=self._decode, name="oiadb-frame-decoder"),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Dừng screenrecord, luồng giải mã và xóa FIFO."""
+        self._stop_event.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            self.adb.platform_info.kill_process(process)
+        self._unblock_fifo()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._condition:
+            self._condition.notify_all()
+        if self._fifo_dir:
+            shutil.rmtree(self._fifo_dir, ignore_errors=True)
+            self._fifo_dir = self._fifo_path = None
+
+    def __enter__(self) -> "FrameStream":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def latest(self) -> Optional[Frame]:
+        """Lấy khung hình mới nhất, None nếu chưa có."""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, newer_than: float = 0.0, timeout: Optional[float] = None) -> Optional[Frame]:
+        """
+        Đợi khung hình có timestamp lớn hơn newer_than.
+
+        Args:
+            newer_than: Timestamp (time.monotonic()) của khung hình đã xử lý trước đó
+            timeout: Thời gian chờ tối đa (giây), None = không giới hạn
+
+        Returns:
+            Khung hình mới nhất, hoặc None nếu hết thời gian chờ hay luồng đã dừng
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._frames and self._frames[-1].timestamp > newer_than:
+                    return self._frames[-1]
+                if not self.is_running:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dictionary gồm running, frames, fps (trung bình từ khi start), restarts, error
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "running": self.is_running,
+            "frames": self._frame_count,
+            "fps": round(self._frame_count / elapsed, 2) if elapsed > 0 else 0.0,
+            "restarts": self._restarts,
+            "error": self.error,
+        }
+
+    def _screenrecord_command(self) -> str:
+        return "exec-out screenrecord --output-format=h264 --bit-rate {} --time-limit {} -".format(
+            self.bit_rate, self.time_limit)
+
+    def _pump(self) -> None:
+        """Chạy screenrecord liên tiếp và chuyển dữ liệu vào FIFO."""
+        failures = 0
+        try:
+            with open(self._fifo_path, "wb", buffering=0) as fifo:
+                while not self._stop_event.is_set():
+                    started = time.monotonic()
+                    full_command = self.adb._build_full_command(self._screenrecord_command())
+                    process_args = self.adb.platform_info.create_process_args(
+                        full_command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL, bufsize=0
+                    )
+                    self._process = process = subprocess.Popen(**process_args)
+                    received = 0
+                    for chunk in iter(lambda: process.stdout.read(65536), b""):
+                        received += len(chunk)
+                        fifo.write(chunk)
+                    process.stdout.close()
+                    process.wait()
+
+                    if self._stop_event.is_set():
+                        break
+                    if received == 0 or time.monotonic() - started < 1.0:
+                        failures += 1
+                        if failures >= MAX_START_FAILURES:
+                            self.error = "screenrecord exited {} times without output (code {})".format(
+                                failures, process.returncode)
+                            logger.warning(f"Frame stream stopped: {self.error}")
+                            break
+                    else:
+                        failures = 0
+                    # Hết time_limit: nối tiếp bằng một lần chạy mới
+                    self._restarts += 1
+        except (OSError, ValueError) as e:
+            # BrokenPipeError khi luồng giải mã đã dừng
+            if not self._stop_event.is_set():
+                self.error = str(e)
+                logger.warning(f"Frame stream pump failed: {e}")
+        finally:
+            self._stop_event.set()
+            process = self._process
+            if process is not None and process.poll() is None:
+                self.adb.platform_info.kill_process(process)
+
+    def _decode(self) -> None:
+        """Giải mã khung hình từ FIFO và giữ khung hình mới nhất."""
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", _FFMPEG_CAPTURE_OPTIONS)
+        capture = cv2.VideoCapture(self._fifo_path, cv2.CAP_FFMPEG)
+        try:
+            if not capture.isOpened():
+                if not self._stop_event.is_set():
+                    self.error = "could not open H.264 stream"
+                    logger.warning("Frame stream: could not open H.264 stream")
+                return
+            while not self._stop_event.is_set():
+                ok, image = capture.read()
+                if not ok:
+                    break
+                with self._condition:
+                    self._frame_count += 1
+                    self._frames.append(Frame(image, time.monotonic(), self._frame_count))
+                    self._condition.notify_all()
+        finally:
+            capture.release()
+            self._stop_event.set()
+            with self._condition:
+                self._condition.notify_all()
+
+    def _unblock_fifo(self) -> None:
+        # Mở đầu còn lại của FIFO để luồng đang chờ open() (ghi hoặc đọc) không bị treo
+        if not self._fifo_path:
+            return
+        for flags in (os.O_RDONLY | os.O_NONBLOCK, os.O_WRONLY | os.O_NONBLOCK):
+            try:
+                os.close(os.open(self._fifo_path, flags))
+            except OSError:
+                pass
@@ -3,7 +3,11 @@ Tiện ích nhận diện hình ảnh cho thư viện OIADB.
 """
 
 import os
+import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, List, Dict, Any, Union
 
 # Thiết lập logging
@@ -26,6 +30,217 @@ except ImportError:
         # Add dummy constants if needed by methods, though checking the flag is better
         pass
 
+from .frame_stream import FrameStream, DEFAULT_BIT_RATE, fit_to_display
+
+# Giới hạn mặc định của cache mẫu đã tiền xử lý
+TEMPLATE_CACHE_SIZE = 32
+TEMPLATE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Cách chụp ảnh màn hình
+CAPTURE_RAW = "raw"  # "screencap" không nén, giải mã thẳng vào mảng numpy
+CAPTURE_PNG = "png"  # "screencap -p"
+
+# Định dạng điểm ảnh của "screencap" (android.graphics.PixelFormat) -> số byte mỗi điểm ảnh
+_RAW_PIXEL_FORMATS = {1: 4, 2: 4, 3: 3}  # RGBA_8888, RGBX_8888, RGB_888
+# So khớp thô-đến-tinh (pyramid): ảnh được thu nhỏ tối đa 2^PYRAMID_MAX_LEVELS lần, sao cho
+# cạnh nhỏ nhất của mẫu thu nhỏ không dưới PYRAMID_MIN_TEMPLATE_SIZE điểm ảnh
+PYRAMID_MAX_LEVELS = 3
+PYRAMID_MIN_TEMPLATE_SIZE = 12
+# Số ứng viên tốt nhất của mỗi biến thể được so khớp lại ở độ phân giải đầy đủ
+PYRAMID_TOP_K = 3
+# Khi tìm nhiều kết quả: ngưỡng ở mức thô được hạ bớt PYRAMID_COARSE_SLACK cho mỗi mức thu
+# nhỏ, và số ứng viên tối đa mỗi biến thể
+PYRAMID_COARSE_SLACK = 0.2
+PYRAMID_MAX_CANDIDATES = 32
+
+# Số luồng mặc định để so khớp song song các biến thể tỷ lệ/góc xoay (cv2.matchTemplate
+# nhả GIL); 1 = tuần tự
+DEFAULT_MATCH_WORKERS = min(8, os.cpu_count() or 1)
+# Khi tìm kết quả tốt nhất, một biến thể đạt độ tương đồng này sẽ hủy các biến thể đứng sau nó
+CERTAIN_MATCH_CONFIDENCE = 0.99
+
+# Header gồm width, height, format (và color space từ Android 12), mỗi trường 4 byte
+_RAW_HEADER_SIZES = (12, 16)
+
+
+# Thread pool dùng chung giữa mọi lần tìm kiếm (và mọi đối tượng ImageRecognition), theo số luồng
+_match_pools: Dict[int, ThreadPoolExecutor] = {}
+_match_pools_lock = threading.Lock()
+
+
+def get_match_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Lấy thread pool dùng chung để so khớp các biến thể với max_workers luồng."""
+    with _match_pools_lock:
+        pool = _match_pools.get(max_workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="oiadb-match")
+            _match_pools[max_workers] = pool
+        return pool
+
+
+def decode_raw_screencap(data: bytes) -> "np.ndarray":
+    """
+    Giải mã đầu ra của "screencap" (không có -p) thành ảnh BGR.
+
+    Args:
+        data: Header và bộ đệm điểm ảnh thô đọc từ "exec-out screencap"
+
+    Returns:
+        Mảng numpy (height, width, 3) dạng BGR
+
+    Raises:
+        ValueError: Nếu dữ liệu không đúng định dạng hoặc định dạng điểm ảnh không hỗ trợ
+    """
+    if len(data) < 12:
+        raise ValueError("Dữ liệu screencap quá ngắn ({} bytes)".format(len(data)))
+    width, height, pixel_format = np.frombuffer(data, dtype="<u4", count=3)
+    width, height, pixel_format = int(width), int(height), int(pixel_format)
+    bytes_per_pixel = _RAW_PIXEL_FORMATS.get(pixel_format)
+    if bytes_per_pixel is None:
+        raise ValueError("Định dạng điểm ảnh screencap không hỗ trợ: {}".format(pixel_format))
+
+    header_size = len(data) - width * height * bytes_per_pixel
+    if header_size not in _RAW_HEADER_SIZES:
+        raise ValueError("Kích thước dữ liệu screencap không khớp {}x{} ({} bytes)".format(
+            width, height, len(data)))
+
+    # Không sao chép: mảng trỏ thẳng vào bộ đệm đã nhận, chỉ cvtColor tạo ảnh mới
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * bytes_per_pixel,
+                           offset=header_size).reshape(height, width, bytes_per_pixel)
+    if bytes_per_pixel == 4:
+        return cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+
+
+class PreparedTemplate:
+    """
+    Hình ảnh mẫu đã được tiền xử lý (xám/Canny) cùng các biến thể tỷ lệ/góc xoay.
+    """
+
+    def __init__(self, template_path: str, shape: Tuple[int, ...],
+                 variants: List[Tuple[float, float, "np.ndarray"]]):
+        """
+        Args:
+            template_path: Đường dẫn hình ảnh mẫu
+            shape: Kích thước ảnh mẫu gốc
+            variants: Danh sách (scale, angle, ảnh mẫu đã biến đổi)
+        """
+        self.template_path = template_path
+        self.shape = shape
+        self.variants = variants
+        # Tổng dung lượng, gồm cả các mức pyramid đã tạo
+        self.nbytes = sum(image.nbytes for _, _, image in variants)
+        # Mức pyramid -> các biến thể đã thu nhỏ 2^level lần (tạo khi cần)
+        self._downsampled: Dict[int, List["np.ndarray"]] = {}
+        self._lock = threading.Lock()
+        # Được TemplateCache gán để cập nhật dung lượng khi nbytes tăng
+        self.on_resize = None
+
+    def downsampled(self, level: int) -> List["np.ndarray"]:
+        """Các biến thể thu nhỏ 2^level lần, theo cùng thứ tự với variants."""
+        with self._lock:
+            images = self._downsampled.get(level)
+            if images is not None:
+                return images
+            factor = 2 ** level
+            images = [cv2.resize(image, (max(1, image.shape[1] // factor), max(1, image.shape[0] // factor)),
+                                 interpolation=cv2.INTER_AREA)
+                      for _, _, image in self.variants]
+            self._downsampled[level] = images
+            added = sum(image.nbytes for image in images)
+            self.nbytes += added
+            on_resize = self.on_resize
+        if on_resize is not None:
+            on_resize(self, added)
+        return images
+
+
+class TemplateCache:
+    """
+    Cache LRU an toàn luồng cho các mẫu đã tiền xử lý, giới hạn theo số mục và dung lượng.
+    """
+
+    def __init__(self, max_size: int = TEMPLATE_CACHE_SIZE, max_bytes: int = TEMPLATE_CACHE_BYTES):
+        """
+        Args:
+            max_size: Số mẫu tối đa
+            max_bytes: Tổng dung lượng (byte) tối đa của các mẫu
+        """
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, PreparedTemplate]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: tuple) -> Optional[PreparedTemplate]:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return prepared
+
+    def put(self, key: tuple, prepared: PreparedTemplate) -> None:
+        if prepared.nbytes > self.max_bytes:
+            # Mẫu lớn hơn toàn bộ cache: không lưu
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                old.on_resize = None
+                self._bytes -= old.nbytes
+            # Bản cũ của cùng file (mtime khác) không còn dùng được nữa
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+                stale_entry = self._entries.pop(stale)
+                stale_entry.on_resize = None
+                self._bytes -= stale_entry.nbytes
+            self._entries[key] = prepared
+            self._bytes += prepared.nbytes
+            prepared.on_resize = self._resized
+            self._evict_locked()
+
+    def _resized(self, prepared: PreparedTemplate, added: int) -> None:
+        """Mẫu trong cache vừa tạo thêm một mức pyramid."""
+        with self._lock:
+            if not any(entry is prepared for entry in self._entries.values()):
+                return
+            self._bytes += added
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._entries and (len(self._entries) > self.max_size or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            evicted.on_resize = None
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for prepared in self._entries.values():
+                prepared.on_resize = None
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dictionary gồm size, bytes, hits, misses, evictions
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
 class ImageRecognition:
     """
     Lớp cung cấp các chức năng nhận diện hình ảnh trên màn hình thiết bị Android.
@@ -33,13 +248,28 @@ class ImageRecognition:
     (phân giải cao/thấp, hình ảnh nét/mờ/vỡ).
     """
 
-    def __init__(self, adb_runner):
+    def __init__(self, adb_runner, template_cache_size: int = TEMPLATE_CACHE_SIZE,
+                 template_cache_bytes: int = TEMPLATE_CACHE_BYTES, capture_mode: str = CAPTURE_RAW,
+                 match_workers: int = DEFAULT_MATCH_WORKERS,
+                 certain_confidence: Optional[float] = CERTAIN_MATCH_CONFIDENCE):
         """
         Khởi tạo đối tượng ImageRecognition.
 
         Args:
             adb_runner: Đối tượng thực thi lệnh ADB
+            template_cache_size: Số mẫu đã tiền xử lý tối đa được giữ trong cache
+            template_cache_bytes: Dung lượng tối đa (byte) của cache mẫu
+            capture_mode: Cách chụp màn hình: CAPTURE_RAW ("raw", mặc định) đọc bộ đệm
+                điểm ảnh thô qua "exec-out screencap", không nén PNG trên thiết bị;
+                CAPTURE_PNG ("png") dùng "screencap -p"
+            match_workers: Số luồng so khớp song song các biến thể tỷ lệ/góc xoay (thread
+                pool dùng chung giữa các lần gọi); 1 = tuần tự
+            certain_confidence: Khi tìm kết quả tốt nhất, bỏ qua các biến thể đứng sau biến
+                thể đầu tiên (theo thứ tự tỷ lệ/góc xoay) đạt độ tương đồng này; kết quả giống
+                khi so khớp tuần tự. None = luôn so khớp mọi biến thể
         """
+        if capture_mode not in (CAPTURE_RAW, CAPTURE_PNG):
+            raise ValueError("capture_mode phải là '{}' hoặc '{}'".format(CAPTURE_RAW, CAPTURE_PNG))
         if not IMAGE_RECOGNITION_AVAILABLE:
             raise ImportError(
                 "Image recognition dependencies (OpenCV, NumPy) are not installed. "
@@ -47,6 +277,15 @@ class ImageRecognition:
             )
         self.adb = adb_runner
         self.temp_screenshot_path = "/tmp/oiadb_screenshot.png"
+        # Mẫu đã tiền xử lý, theo (đường dẫn, mtime, tham số tiền xử lý)
+        self.template_cache = TemplateCache(template_cache_size, template_cache_bytes)
+        self.capture_mode = capture_mode
+        # Luồng khung hình liên tục (xem start_frame_stream); None = chụp từng ảnh
+        self.frame_stream: Optional[FrameStream] = None
+        # Thời điểm (time.monotonic()) của ảnh màn hình dùng cho lần tìm kiếm gần nhất
+        self.last_capture_timestamp: Optional[float] = None
+        self.match_workers = match_workers
+        self.certain_confidence = certain_confidence
 
     def _ensure_deps(self):
         """Helper to check dependencies before executing methods."""
@@ -68,21 +307,33 @@ class ImageRecognition:
             ImportError: If dependencies are missing.
         """
         self._ensure_deps()
-        try:
-            # Chụp ảnh màn hình và lưu vào thiết bị
-            remote_path = "/sdcard/oiadb_screenshot.png"
-            self.adb.run("shell screencap -p {}".format(remote_path))
+        stream = self.frame_stream
+        if stream is not None and stream.is_running:
+            frame = stream.latest() or stream.wait_for_frame(timeout=1.0)
+            if frame is not None:
+                self.last_capture_timestamp = frame.timestamp
+                return self._frame_image(frame)
+
+        self.last_capture_timestamp = time.monotonic()
+        if self.capture_mode == CAPTURE_RAW:
+            try:
+                return decode_raw_screencap(self.adb.exec_out("screencap"))
+            except ValueError as e:
+                # Thiết bị dùng định dạng không hỗ trợ: chuyển hẳn sang PNG
+                logger.warning("Không giải mã được screencap thô, chuyển sang PNG: {}".format(str(e)))
+                self.capture_mode = CAPTURE_PNG
+            except Exception as e:
+                logger.error("Lỗi khi chụp ảnh màn hình: {}".format(str(e)))
+                raise
 
-            # Kéo ảnh từ thiết bị về máy tính
-            self.adb.run("pull {} {}".format(remote_path, self.temp_screenshot_path))
-
-            # Xóa ảnh trên thiết bị
-            self.adb.run("shell rm {}".format(remote_path))
+        try:
+            # Đọc ảnh PNG trực tiếp từ stdout, không qua file tạm
+            png_data = self.adb.exec_out("screencap -p")
 
-            # Đọc ảnh bằng OpenCV
-            img = cv2.imread(self.temp_screenshot_path)
+            # Giải mã ảnh bằng OpenCV
+            img = cv2.imdecode(np.frombuffer(png_data, dtype=np.uint8), cv2.IMREAD_COLOR)
             if img is None:
-                raise Exception("Không thể đọc ảnh từ {}".format(self.temp_screenshot_path))
+                raise Exception("Không thể giải mã ảnh màn hình ({} bytes)".format(len(png_data)))
 
             return img
 
@@ -94,7 +345,8 @@ class ImageRecognition:
                   multiple: bool = False, region: Optional[Tuple[int, int, int, int]] = None,
                   scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
                   rotation_range: Tuple[float, float] = (0, 0), rotation_steps: int = 1,
-                  use_gray: bool = True, use_canny: bool = False) -> Union[Tuple[int, int, float], List[Tuple[int, int, float]], None]:
+                  use_gray: bool = True, use_canny: bool = False,
+                  pyramid: bool = False) -> Union[Tuple[int, int, float], List[Tuple[int, int, float]], None]:
         """
         Tìm hình ảnh mẫu trên màn hình thiết bị.
 
@@ -109,6 +361,9 @@ class ImageRecognition:
             rotation_steps: Số bước góc xoay trong phạm vi
             use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
             use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh: tìm trên ảnh thu nhỏ trước, rồi chỉ so khớp lại
+                vài vùng ứng viên tốt nhất ở độ phân giải đầy đủ. Nhanh hơn nhiều trên màn
+                hình phân giải cao; confidence vẫn là giá trị ở độ phân giải đầy đủ
 
         Returns:
             Nếu multiple=False: Tuple (x, y, confidence) của kết quả tốt nhất hoặc None nếu không tìm thấy
@@ -119,146 +374,31 @@ class ImageRecognition:
             ImportError: If dependencies are missing.
         """
         self._ensure_deps()
+        return self._search(None, template_path, threshold, multiple, region, scale_range, scale_steps,
+                            rotation_range, rotation_steps, use_gray, use_canny, pyramid)
+
+    def _search(self, screenshot: Optional[np.ndarray], template_path: str, threshold: float,
+                multiple: bool, region: Optional[Tuple[int, int, int, int]],
+                scale_range: Tuple[float, float], scale_steps: int,
+                rotation_range: Tuple[float, float], rotation_steps: int,
+                use_gray: bool, use_canny: bool,
+                pyramid: bool = False) -> Union[Tuple[int, int, float], List[Tuple[int, int, float]], None]:
+        """Như find_image, trên ảnh màn hình cho trước (None = chụp mới)."""
         try:
-            # Đọc hình ảnh mẫu
-            template = cv2.imread(template_path)
-            if template is None:
-                raise Exception("Không thể đọc hình ảnh mẫu từ {}".format(template_path))
+            prepared = self._prepare_template(template_path, scale_range, scale_steps,
+                                              rotation_range, rotation_steps, use_gray, use_canny)
 
             # Chụp ảnh màn hình
-            screenshot = self._take_screenshot()
+            if screenshot is None:
+                screenshot = self._take_screenshot()
 
             # Cắt vùng tìm kiếm nếu được chỉ định
             if region:
                 x, y, w, h = region
                 screenshot = screenshot[y:y+h, x:x+w]
 
-            # Chuyển đổi sang ảnh xám nếu cần
-            if use_gray:
-                screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-                template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-
-            # Sử dụng phát hiện cạnh Canny nếu cần
-            if use_canny:
-                if use_gray:
-                    screenshot_processed = cv2.Canny(screenshot_gray, 50, 200)
-                    template_processed = cv2.Canny(template_gray, 50, 200)
-                else:
-                    screenshot_processed = cv2.Canny(cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY), 50, 200)
-                    template_processed = cv2.Canny(cv2.cvtColor(template, cv2.COLOR_BGR2GRAY), 50, 200)
-            else:
-                if use_gray:
-                    screenshot_processed = screenshot_gray
-                    template_processed = template_gray
-                else:
-                    screenshot_processed = screenshot
-                    template_processed = template
-
-            # Tính toán các tỷ lệ và góc xoay
-            scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
-            angles = np.linspace(rotation_range[0], rotation_range[1], rotation_steps if rotation_steps > 1 else 1)
-
-            best_result = None
-            best_confidence = -1
-            all_results = []
-
-            # Thử với các tỷ lệ và góc xoay khác nhau
-            for scale in scales:
-                for angle in angles:
-                    # Điều chỉnh kích thước mẫu
-                    if scale != 1.0:
-                        width = int(template_processed.shape[1] * scale)
-                        height = int(template_processed.shape[0] * scale)
-                        dim = (width, height)
-                        resized_template = cv2.resize(template_processed, dim, interpolation=cv2.INTER_AREA)
-                    else:
-                        resized_template = template_processed
-
-                    # Xoay mẫu nếu cần
-                    if angle != 0:
-                        center = (resized_template.shape[1] // 2, resized_template.shape[0] // 2)
-                        rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-                        rotated_template = cv2.warpAffine(resized_template, rotation_matrix,
-                                                         (resized_template.shape[1], resized_template.shape[0]))
-                    else:
-                        rotated_template = resized_template
-
-                    # Thực hiện so khớp mẫu
-                    if len(screenshot_processed.shape) == 3 and len(rotated_template.shape) == 3:
-                        # Ảnh màu
-                        result = cv2.matchTemplate(screenshot_processed, rotated_template, cv2.TM_CCOEFF_NORMED)
-                    else:
-                        # Ảnh xám
-                        result = cv2.matchTemplate(screenshot_processed, rotated_template, cv2.TM_CCOEFF_NORMED)
-
-                    # Tìm vị trí có độ tương đồng cao nhất
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                    confidence = max_val
-
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        h, w = rotated_template.shape[:2]
-                        x, y = max_loc
-                        # Điều chỉnh tọa độ trung tâm của hình ảnh
-                        center_x = x + w // 2
-                        center_y = y + h // 2
-
-                        # Điều chỉnh tọa độ nếu đang tìm kiếm trong vùng cụ thể
-                        if region:
-                            center_x += region[0]
-                            center_y += region[1]
-
-                        best_result = (center_x, center_y, confidence)
-
-                    # Nếu cần tìm nhiều kết quả
-                    if multiple:
-                        # Tìm tất cả vị trí có độ tương đồng vượt ngưỡng
-                        locations = np.where(result >= threshold)
-                        h, w = rotated_template.shape[:2]
-
-                        for pt in zip(*locations[::-1]):
-                            # Điều chỉnh tọa độ trung tâm của hình ảnh
-                            center_x = pt[0] + w // 2
-                            center_y = pt[1] + h // 2
-
-                            # Điều chỉnh tọa độ nếu đang tìm kiếm trong vùng cụ thể
-                            if region:
-                                center_x += region[0]
-                                center_y += region[1]
-
-                            result_confidence = result[pt[1], pt[0]]
-                            all_results.append((center_x, center_y, float(result_confidence)))
-
-            # Lọc và sắp xếp kết quả nếu tìm nhiều kết quả
-            if multiple and all_results:
-                # Sắp xếp theo độ tương đồng giảm dần
-                all_results.sort(key=lambda x: x[2], reverse=True)
-
-                # Lọc các kết quả quá gần nhau
-                filtered_results = []
-                for result in all_results:
-                    if not filtered_results:
-                        filtered_results.append(result)
-                        continue
-
-                    # Kiểm tra khoảng cách với các kết quả đã lọc
-                    too_close = False
-                    for filtered in filtered_results:
-                        distance = ((result[0] - filtered[0]) ** 2 + (result[1] - filtered[1]) ** 2) ** 0.5
-                        if distance < max(template.shape[0], template.shape[1]) / 2:
-                            too_close = True
-                            break
-
-                    if not too_close:
-                        filtered_results.append(result)
-
-                return filtered_results
-
-            # Trả về kết quả tốt nhất nếu vượt ngưỡng
-            if best_result and best_confidence >= threshold:
-                return best_result
-
-            return None
+            screenshot_processed = self._preprocess(screenshot, use_gray, use_canny)
+            return self._match(screenshot_processed, prepared, threshold, multiple, region, pyramid)
 
         except Exception as e:
             logger.error("Lỗi khi tìm hình ảnh: {}".format(str(e)))
@@ -266,23 +406,319 @@ class ImageRecognition:
                 return []
             return None
 
+    @staticmethod
+    def _preprocess(image: np.ndarray, use_gray: bool, use_canny: bool) -> np.ndarray:
+        """Chuyển ảnh sang dạng dùng để so khớp (xám và/hoặc cạnh Canny)."""
+        if use_canny:
+            return cv2.Canny(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 50, 200)
+        if use_gray:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+
+    def _prepare_template(self, template_path: str, scale_range: Tuple[float, float], scale_steps: int,
+                          rotation_range: Tuple[float, float], rotation_steps: int,
+                          use_gray: bool, use_canny: bool) -> PreparedTemplate:
+        """
+        Lấy mẫu đã tiền xử lý từ cache, hoặc đọc và tiền xử lý nếu chưa có.
+
+        Khóa cache gồm đường dẫn, mtime và kích thước file cùng tham số tiền xử lý, nên
+        sửa file mẫu sẽ tự động tạo lại các biến thể.
+
+        Raises:
+            Exception: Nếu không thể đọc hình ảnh mẫu
+        """
+        try:
+            stat = os.stat(template_path)
+        except OSError:
+            raise Exception("Không thể đọc hình ảnh mẫu từ {}".format(template_path))
+
+        # Tính toán các tỷ lệ và góc xoay
+        scales = tuple(float(scale) for scale in np.linspace(scale_range[0], scale_range[1], scale_steps))
+        angles = tuple(float(angle) for angle in np.linspace(rotation_range[0], rotation_range[1],
+                                                             rotation_steps if rotation_steps > 1 else 1))
+        key = (os.path.abspath(template_path), (stat.st_mtime, stat.st_size),
+               bool(use_gray), bool(use_canny), scales, angles)
+
+        prepared = self.template_cache.get(key)
+        if prepared is not None:
+            return prepared
+
+        # Đọc hình ảnh mẫu
+        template = cv2.imread(template_path)
+        if template is None:
+            raise Exception("Không thể đọc hình ảnh mẫu từ {}".format(template_path))
+        template_processed = self._preprocess(template, use_gray, use_canny)
+
+        variants = []
+        for scale in scales:
+            # Điều chỉnh kích thước mẫu
+            if scale != 1.0:
+                width = int(template_processed.shape[1] * scale)
+                height = int(template_processed.shape[0] * scale)
+                if width < 1 or height < 1:
+                    continue
+                resized_template = cv2.resize(template_processed, (width, height), interpolation=cv2.INTER_AREA)
+            else:
+                resized_template = template_processed
+
+            for angle in angles:
+                # Xoay mẫu nếu cần
+                if angle != 0:
+                    center = (resized_template.shape[1] // 2, resized_template.shape[0] // 2)
+                    rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+                    rotated_template = cv2.warpAffine(resized_template, rotation_matrix,
+                                                     (resized_template.shape[1], resized_template.shape[0]))
+                else:
+                    rotated_template = resized_template
+                variants.append((scale, angle, rotated_template))
+
+        prepared = PreparedTemplate(template_path, template.shape, variants)
+        self.template_cache.put(key, prepared)
+        return prepared
+
+    def _match(self, screenshot_processed: np.ndarray, prepared: PreparedTemplate, threshold: float,
+               multiple: bool, region: Optional[Tuple[int, int, int, int]] = None, pyramid: bool = False
+               ) -> Union[Tuple[int, int, float], List[Tuple[int, int, float]], None]:
+        """
+        So khớp các biến thể của mẫu với ảnh màn hình đã tiền xử lý.
+
+        Returns:
+            Như find_image
+        """
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        level = self._pyramid_level(prepared) if pyramid else 0
+        if level:
+            factor = 2 ** level
+            screen_small = cv2.resize(screenshot_processed,
+                                      (screenshot_processed.shape[1] // factor, screenshot_processed.shape[0] // factor),
+                                      interpolation=cv2.INTER_AREA)
+            templates_small = prepared.downsampled(level)
+
+        # Mẫu lớn hơn vùng tìm kiếm không thể khớp
+        indices = [index for index, (_, _, template) in enumerate(prepared.variants)
+                   if template.shape[0] <= screenshot_processed.shape[0]
+                   and template.shape[1] <= screenshot_processed.shape[1]]
+        # Vị trí (trong indices) nhỏ nhất của biến thể đạt certain_confidence. Chỉ các biến thể
+        # đứng sau nó bị bỏ qua, nên mọi biến thể đứng trước luôn được so khớp và kết quả
+        # giống hệt khi chạy tuần tự, bất kể thứ tự hoàn thành của các luồng
+        first_certain = [len(indices)]
+        certain_lock = threading.Lock()
+
+        def match_variant(position: int) -> Optional[List[Tuple[int, int, float]]]:
+            if position > first_certain[0]:
+                return None
+            index = indices[position]
+            template = prepared.variants[index][2]
+            if level:
+                matches = self._match_variant_pyramid(screenshot_processed, template, screen_small,
+                                                      templates_small[index], factor, threshold, multiple)
+            else:
+                matches = self._match_variant(screenshot_processed, template, threshold, multiple)
+            if (not multiple and self.certain_confidence is not None and matches
+                    and matches[0][2] >= self.certain_confidence):
+                with certain_lock:
+                    first_certain[0] = min(first_certain[0], position)
+            return matches
+
+        if self.match_workers > 1 and len(indices) > 1:
+            pool = get_match_pool(self.match_workers)
+            futures = [pool.submit(match_variant, position) for position in range(len(indices))]
+            variant_matches = []
+            for position, future in enumerate(futures):
+                if position > first_certain[0]:
+                    future.cancel()
+                # Future đã hủy: biến thể không được so khớp
+                variant_matches.append(None if future.cancelled() else future.result())
+        else:
+            variant_matches = [match_variant(position) for position in range(len(indices))]
+        # Bỏ kết quả của các biến thể sau biến thể chắc chắn đầu tiên (có thể đã chạy xong
+        # trước khi biết vị trí đó) để kết quả không phụ thuộc vào thời điểm
+        variant_matches = variant_matches[:first_certain[0] + 1]
+
+        best_result = None
+        best_confidence = -1
+        all_results = []
+
+        # Gộp kết quả theo thứ tự biến thể: khi bằng nhau, biến thể đứng trước được chọn
+        for index, matches in zip(indices, variant_matches):
+            if not matches:
+                continue
+            h, w = prepared.variants[index][2].shape[:2]
+
+            for x, y, confidence in matches:
+                # Tọa độ trung tâm của hình ảnh trên toàn màn hình
+                match = (x + w // 2 + offset_x, y + h // 2 + offset_y, confidence)
+                if multiple:
+                    if confidence >= threshold:
+                        all_results.append(match)
+                elif confidence > best_confidence:
+                    best_confidence = confidence
+                    best_result = match
+
+        # Lọc và sắp xếp kết quả nếu tìm nhiều kết quả
+        if multiple:
+            # Sắp xếp theo độ tương đồng giảm dần
+            all_results.sort(key=lambda x: x[2], reverse=True)
+
+            # Lọc các kết quả quá gần nhau
+            min_distance = max(prepared.shape[0], prepared.shape[1]) / 2
+            filtered_results = []
+            for result in all_results:
+                too_close = False
+                for filtered in filtered_results:
+                    distance = ((result[0] - filtered[0]) ** 2 + (result[1] - filtered[1]) ** 2) ** 0.5
+                    if distance < min_distance:
+                        too_close = True
+                        break
+
+                if not too_close:
+                    filtered_results.append(result)
+
+            return filtered_results
+
+        # Trả về kết quả tốt nhất nếu vượt ngưỡng
+        if best_result and best_confidence >= threshold:
+            return best_result
+
+        return None
+
+    @staticmethod
+    def _match_variant(screen: np.ndarray, template: np.ndarray, threshold: float,
+                       multiple: bool) -> List[Tuple[int, int, float]]:
+        """
+        So khớp một biến thể ở độ phân giải đầy đủ.
+
+        Returns:
+            Danh sách (x, y, confidence) theo góc trên-trái: vị trí tốt nhất, hoặc mọi vị
+            trí vượt ngưỡng nếu multiple=True
+        """
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        if multiple:
+            locations = np.where(result >= threshold)
+            return [(int(x), int(y), float(result[y, x])) for y, x in zip(*locations)]
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return [(max_loc[0], max_loc[1], max_val)]
+
+    @staticmethod
+    def _match_variant_pyramid(screen: np.ndarray, template: np.ndarray, screen_small: np.ndarray,
+                               template_small: np.ndarray, factor: int, threshold: float,
+                               multiple: bool) -> List[Tuple[int, int, float]]:
+        """
+        So khớp một biến thể theo kiểu thô-đến-tinh: các đỉnh tốt nhất trên ảnh thu nhỏ
+        được so khớp lại trong một cửa sổ nhỏ ở độ phân giải đầy đủ.
+
+        Returns:
+            Như _match_variant; confidence là giá trị ở độ phân giải đầy đủ
+        """
+        th_small, tw_small = template_small.shape[:2]
+        if th_small > screen_small.shape[0] or tw_small > screen_small.shape[1]:
+            return ImageRecognition._match_variant(screen, template, threshold, multiple)
+        coarse = cv2.matchTemplate(screen_small, template_small, cv2.TM_CCOEFF_NORMED)
+
+        if multiple:
+            # Ảnh càng thu nhỏ, độ tương đồng ở mức thô càng thấp so với độ phân giải đầy đủ
+            level = factor.bit_length() - 1
+            limit, min_score = PYRAMID_MAX_CANDIDATES, threshold - PYRAMID_COARSE_SLACK * level
+        else:
+            limit, min_score = PYRAMID_TOP_K, -1.0
+        # Các đỉnh của bản đồ thô, loại bỏ vùng lân cận của mỗi đỉnh đã chọn
+        candidates = []
+        radius_x, radius_y = max(1, tw_small // 2), max(1, th_small // 2)
+        while len(candidates) < limit:
+            _, max_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+            if max_val < min_score:
+                break
+            candidates.append((cx, cy))
+            coarse[max(0, cy - radius_y):cy + radius_y + 1, max(0, cx - radius_x):cx + radius_x + 1] = -1.0
+
+        h, w = template.shape[:2]
+        margin = 2 * factor
+        matches = []
+        for cx, cy in candidates:
+            x0, y0 = max(0, cx * factor - margin), max(0, cy * factor - margin)
+            x1 = min(screen.shape[1], cx * factor + w + margin)
+            y1 = min(screen.shape[0], cy * factor + h + margin)
+            if x1 - x0 < w or y1 - y0 < h:
+                continue
+            result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+            matches.append((x0 + x, y0 + y, max_val))
+
+        if not multiple and matches:
+            return [max(matches, key=lambda match: match[2])]
+        return matches
+
+    @staticmethod
+    def _pyramid_level(prepared: PreparedTemplate) -> int:
+        """Mức thu nhỏ lớn nhất mà mọi biến thể vẫn đủ lớn để so khớp."""
+        if not prepared.variants:
+            return 0
+        smallest = min(min(image.shape[:2]) for _, _, image in prepared.variants)
+        level = 0
+        while level < PYRAMID_MAX_LEVELS and smallest // (2 ** (level + 1)) >= PYRAMID_MIN_TEMPLATE_SIZE:
+            level += 1
+        return level
+
+    def _frame_image(self, frame) -> np.ndarray:
+        """Ảnh của khung hình trong hệ tọa độ màn hình (kích thước video có thể khác)."""
+        size = self.adb.get_screen_size() if self.adb is not None else None
+        if not size:
+            return frame.image
+        return fit_to_display(frame.image, (size["width"], size["height"]))
+
+    def start_frame_stream(self, bit_rate: int = DEFAULT_BIT_RATE) -> FrameStream:
+        """
+        Bắt đầu luồng khung hình H.264 liên tục ("screenrecord") làm nguồn ảnh màn hình.
+
+        Khi luồng chạy, find_image dùng khung hình mới nhất thay vì chụp ảnh, còn
+        wait_for_image/wait_and_click so khớp mỗi khi có khung hình mới (10-30 fps) thay
+        vì chụp lại sau mỗi interval. Nếu luồng dừng (lỗi, thiết bị không hỗ trợ), các hàm
+        tự quay lại chụp ảnh màn hình.
+
+        Args:
+            bit_rate: Bit rate của screenrecord (bit/giây)
+
+        Returns:
+            FrameStream đang chạy
+
+        Raises:
+            ImportError: Nếu nền tảng không hỗ trợ FIFO
+        """
+        self._ensure_deps()
+        self.stop_frame_stream()
+        self.frame_stream = FrameStream(self.adb, bit_rate=bit_rate).start()
+        return self.frame_stream
+
+    def stop_frame_stream(self) -> None:
+        """Dừng luồng khung hình (nếu có) và quay lại chụp ảnh màn hình."""
+        if self.frame_stream is not None:
+            self.frame_stream.stop()
+            self.frame_stream = None
+
+    def clear_template_cache(self) -> None:
+        """Xóa toàn bộ mẫu đã tiền xử lý khỏi cache."""
+        self.template_cache.clear()
+
     def wait_for_image(self, template_path: str, timeout: int = 10, interval: float = 0.5,
                       threshold: float = 0.8, region: Optional[Tuple[int, int, int, int]] = None,
                       scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
-                      use_gray: bool = True, use_canny: bool = False) -> Optional[Tuple[int, int, float]]:
+                      use_gray: bool = True, use_canny: bool = False,
+                      pyramid: bool = False) -> Optional[Tuple[int, int, float]]:
         """
         Đợi cho đến khi hình ảnh xuất hiện trên màn hình.
 
         Args:
             template_path: Đường dẫn đến hình ảnh mẫu cần tìm
             timeout: Thời gian tối đa đợi (giây)
-            interval: Khoảng thời gian giữa các lần tìm kiếm (giây)
+            interval: Khoảng thời gian giữa các lần tìm kiếm (giây); bỏ qua khi luồng
+                khung hình đang chạy (xem start_frame_stream)
             threshold: Ngưỡng tương đồng (0.0 - 1.0)
             region: Vùng tìm kiếm (x, y, width, height), None = toàn màn hình
             scale_range: Phạm vi tỷ lệ để tìm kiếm (min_scale, max_scale)
             scale_steps: Số bước tỷ lệ trong phạm vi
             use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
             use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh (xem find_image)
 
         Returns:
             Tuple (x, y, confidence) hoặc None nếu hết thời gian chờ
@@ -290,10 +726,24 @@ class ImageRecognition:
             ImportError: If dependencies are missing.
         """
         self._ensure_deps()
-        import time
 
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        deadline = time.monotonic() + timeout
+        last_timestamp = 0.0
+        while time.monotonic() < deadline:
+            stream = self.frame_stream
+            if stream is not None and stream.is_running:
+                # So khớp ngay khi có khung hình mới thay vì chờ interval
+                frame = stream.wait_for_frame(newer_than=last_timestamp,
+                                              timeout=max(0.0, deadline - time.monotonic()))
+                if frame is None:
+                    continue
+                last_timestamp = self.last_capture_timestamp = frame.timestamp
+                result = self._search(self._frame_image(frame), template_path, threshold, False, region,
+                                      scale_range, scale_steps, (0, 0), 1, use_gray, use_canny, pyramid)
+                if result:
+                    return result
+                continue
+
             result = self.find_image(
                 template_path=template_path,
                 threshold=threshold,
@@ -302,7 +752,8 @@ class ImageRecognition:
                 scale_range=scale_range,
                 scale_steps=scale_steps,
                 use_gray=use_gray,
-                use_canny=use_canny
+                use_canny=use_canny,
+                pyramid=pyramid
             )
 
             if result:
@@ -346,6 +797,96 @@ class ImageRecognition:
             use_canny=use_canny
         ) or []
 
+    def find_many(self, templates: List[str], threshold: float = 0.8,
+                  region: Optional[Tuple[int, int, int, int]] = None,
+                  scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
+                  use_gray: bool = True, use_canny: bool = False, pyramid: bool = False,
+                  stop_on_first: bool = False) -> Dict[str, Optional[Tuple[int, int, float]]]:
+        """
+        Tìm nhiều hình ảnh mẫu trên cùng một ảnh màn hình (chỉ chụp một lần).
+
+        Args:
+            templates: Danh sách đường dẫn hình ảnh mẫu, theo thứ tự ưu tiên
+            threshold: Ngưỡng tương đồng (0.0 - 1.0)
+            region: Vùng tìm kiếm (x, y, width, height), None = toàn màn hình
+            scale_range: Phạm vi tỷ lệ để tìm kiếm (min_scale, max_scale)
+            scale_steps: Số bước tỷ lệ trong phạm vi
+            use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
+            use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh (xem find_image)
+            stop_on_first: Dừng ngay khi một mẫu vượt ngưỡng; các mẫu sau không được tìm
+                và có kết quả None
+
+        Returns:
+            Dictionary đường dẫn mẫu -> (x, y, confidence) hoặc None, theo thứ tự của templates
+
+        Raises:
+            ImportError: If dependencies are missing.
+        """
+        self._ensure_deps()
+        results: Dict[str, Optional[Tuple[int, int, float]]] = {path: None for path in templates}
+        if not templates:
+            return results
+        try:
+            screenshot = self._take_screenshot()
+        except Exception as e:
+            logger.error("Lỗi khi tìm hình ảnh: {}".format(str(e)))
+            return results
+
+        # Cắt vùng và tiền xử lý ảnh màn hình một lần cho mọi mẫu
+        if region:
+            x, y, w, h = region
+            screenshot = screenshot[y:y+h, x:x+w]
+        screenshot_processed = self._preprocess(screenshot, use_gray, use_canny)
+
+        for template_path in results:
+            try:
+                prepared = self._prepare_template(template_path, scale_range, scale_steps,
+                                                  (0, 0), 1, use_gray, use_canny)
+                result = self._match(screenshot_processed, prepared, threshold, False, region, pyramid)
+            except Exception as e:
+                logger.error("Lỗi khi tìm hình ảnh {}: {}".format(template_path, str(e)))
+                continue
+            results[template_path] = result
+            if result and stop_on_first:
+                break
+
+        return results
+
+    def find_any(self, templates: List[str], threshold: float = 0.8,
+                 region: Optional[Tuple[int, int, int, int]] = None,
+                 scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
+                 use_gray: bool = True, use_canny: bool = False,
+                 pyramid: bool = False) -> Optional[Tuple[str, Tuple[int, int, float]]]:
+        """
+        Tìm mẫu đầu tiên (theo thứ tự của templates) đang hiển thị trên màn hình.
+
+        Màn hình chỉ được chụp một lần; việc tìm dừng lại ở mẫu đầu tiên vượt ngưỡng.
+
+        Args:
+            templates: Danh sách đường dẫn hình ảnh mẫu, theo thứ tự ưu tiên
+            threshold: Ngưỡng tương đồng (0.0 - 1.0)
+            region: Vùng tìm kiếm (x, y, width, height), None = toàn màn hình
+            scale_range: Phạm vi tỷ lệ để tìm kiếm (min_scale, max_scale)
+            scale_steps: Số bước tỷ lệ trong phạm vi
+            use_gray: Sử dụng ảnh xám để tăng tốc độ tìm kiếm
+            use_canny: Sử dụng phát hiện cạnh Canny để cải thiện kết quả với hình ảnh mờ
+            pyramid: So khớp thô-đến-tinh (xem find_image)
+
+        Returns:
+            Tuple (đường dẫn mẫu, (x, y, confidence)) hoặc None nếu không mẫu nào hiển thị
+
+        Raises:
+            ImportError: If dependencies are missing.
+        """
+        results = self.find_many(templates, threshold=threshold, region=region, scale_range=scale_range,
+                                 scale_steps=scale_steps, use_gray=use_gray, use_canny=use_canny,
+                                 pyramid=pyramid, stop_on_first=True)
+        for template_path, result in results.items():
+            if result:
+                return template_path, result
+        return None
+
     def find_and_click(self, template_path: str, threshold: float = 0.8,
                       region: Optional[Tuple[int, int, int, int]] = None,
                       scale_range: Tuple[float, float] = (0.8, 1.2), scale_steps: int = 5,
@@ -0,0 +1,134 @@
+"""
+Số liệu thống kê thực thi lệnh ADB (số lần gọi, độ trễ, dung lượng dữ liệu).
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+# Số mẫu độ trễ gần nhất được giữ để tính phân vị
+LATENCY_SAMPLE_SIZE = 2048
+
+
+def command_prefix(command: str) -> str:
+    """
+    Lấy tiền tố dùng để nhóm lệnh trong thống kê.
+
+    Ví dụ: "shell input tap 1 2" -> "shell input", "pull a b" -> "pull".
+    """
+    parts = command.split()
+    if not parts:
+        return ""
+    if parts[0] in ("shell", "exec-out"):
+        for word in parts[1:]:
+            if not word.startswith("-"):
+                return "{} {}".format(parts[0], word.rsplit("/", 1)[-1])
+    return parts[0]
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    # Phân vị theo thứ hạng gần nhất
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class CommandMetrics:
+    """
+    Bộ đếm thống kê lệnh an toàn luồng, chi phí thấp (một lock và vài phép cộng mỗi lệnh).
+
+    Độ trễ chỉ giữ LATENCY_SAMPLE_SIZE mẫu gần nhất; phân vị được tính khi gọi snapshot().
+    """
+
+    def __init__(self, sample_size: int = LATENCY_SAMPLE_SIZE):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self.reset()
+
+    def reset(self) -> None:
+        """Đặt lại toàn bộ số liệu."""
+        with self._lock:
+            self._latencies: Deque[float] = deque(maxlen=self._sample_size)
+            self._by_prefix: Dict[str, List[float]] = {}
+            self._calls = 0
+            self._errors = 0
+            self._streams = 0
+            self._bytes_sent = 0
+            self._bytes_received = 0
+            self._started_at = time.time()
+
+    def record(self, command: str, duration: float, bytes_received: int, success: bool) -> None:
+        """
+        Ghi nhận một lệnh đã hoàn thành.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+            duration: Thời gian thực thi (giây)
+            bytes_received: Số byte stdout + stderr nhận được
+            success: Lệnh kết thúc với mã thoát 0
+        """
+        prefix = command_prefix(command)
+        with self._lock:
+            self._calls += 1
+            if not success:
+                self._errors += 1
+            self._latencies.append(duration)
+            self._bytes_sent += len(command)
+            self._bytes_received += bytes_received
+            # [số lần gọi, số lỗi, tổng thời gian]
+            entry = self._by_prefix.get(prefix)
+            if entry is None:
+                entry = self._by_prefix[prefix] = [0, 0, 0.0]
+            entry[0] += 1
+            entry[1] += 0 if success else 1
+            entry[2] += duration
+
+    def record_stream(self, command: str, bytes_received: int) -> None:
+        """
+        Ghi nhận một lệnh dạng luồng (không tính vào phân vị độ trễ vì thời gian chạy
+        phụ thuộc vào người đọc luồng).
+        """
+        with self._lock:
+            self._streams += 1
+            self._bytes_sent += len(command)
+            self._bytes_received += bytes_received
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Lấy bản sao số liệu hiện tại.
+
+        Returns:
+            Dictionary gồm calls, errors, streams, bytes_sent, bytes_received,
+            latency_ms (p50/p95/p99/max/mean), by_prefix và since (thời điểm reset)
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            by_prefix = {
+                prefix: {
+                    "calls": calls,
+                    "errors": errors,
+                    "mean_ms": round(total / calls * 1000, 2) if calls else 0.0,
+                }
+                for prefix, (calls, errors, total) in self._by_prefix.items()
+            }
+            result = {
+                "calls": self._calls,
+                "errors": self._errors,
+                "streams": self._streams,
+                "bytes_sent": self._bytes_sent,
+                "bytes_received": self._bytes_received,
+                "since": self._started_at,
+            }
+
+        if latencies:
+            result["latency_ms"] = {
+                "p50": round(_percentile(latencies, 50) * 1000, 2),
+                "p95": round(_percentile(latencies, 95) * 1000, 2),
+                "p99": round(_percentile(latencies, 99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            }
+        else:
+            result["latency_ms"] = {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+        result["by_prefix"] = dict(sorted(by_prefix.items(), key=lambda item: -item[1]["calls"]))
+        return result
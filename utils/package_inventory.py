@@ -0,0 +1,362 @@
+"""
+Danh mục package đã cài đặt trên thiết bị, được nạp một lần và đánh chỉ mục trong bộ nhớ.
+"""
+
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, TYPE_CHECKING
+
+from ..exceptions import ADBCommandError
+from .cache_policy import TAG_ALL, TAG_PACKAGES, package_tag, tags_overlap
+
+if TYPE_CHECKING:
+    from ..adb import MyADB
+
+logger = logging.getLogger("oiadb")
+
+# Lệnh liệt kê đầy đủ (đường dẫn APK, version code, uid) và lệnh dự phòng cho Android cũ
+LIST_COMMAND = "pm list packages -f -U --show-versioncode"
+LEGACY_LIST_COMMAND = "pm list packages -f"
+
+# Khoảng thời gian (giây) dùng lại danh mục trước khi kiểm tra thay đổi trên thiết bị
+DEFAULT_CHECK_INTERVAL = 30.0
+
+# "package:/data/app/.../base.apk=com.foo versionCode:42 uid:10123"
+_LIST_LINE = re.compile(r"^package:(?:(?P<path>.*)=)?(?P<name>[\w.]+)(?P<rest>(?:\s+\S+:\S+)*)\s*$")
+_PACKAGE_BLOCK = re.compile(r"^  Package \[([\w.]+)\] \([0-9a-f]+\):\s*$", re.MULTILINE)
+_HIDDEN_SECTION = re.compile(r"^Hidden system packages:\s*$", re.MULTILINE)
+
+
+class PackageRecord:
+    """Thông tin của một package trong danh mục."""
+
+    def __init__(self, name: str, apk_path: Optional[str] = None,
+                 version_code: Optional[int] = None, uid: Optional[int] = None):
+        self.name = name
+        self.apk_path = apk_path
+        self.version_code = version_code
+        self.uid = uid
+        # Nạp khi cần từ "dumpsys package" (xem PackageInventory.details)
+        self.details: Optional[Dict[str, Any]] = None
+        self.activities: Optional[List[str]] = None
+
+    def __repr__(self) -> str:
+        return "PackageRecord({!r}, version_code={!r})".format(self.name, self.version_code)
+
+
+def parse_package_list(output: str) -> Dict[str, PackageRecord]:
+    """
+    Phân tích đầu ra của "pm list packages [-f] [-U] [--show-versioncode]".
+
+    Returns:
+        Dictionary tên package -> PackageRecord
+    """
+    records = {}
+    for line in output.splitlines():
+        match = _LIST_LINE.match(line.strip())
+        if not match:
+            continue
+        fields = dict(item.split(":", 1) for item in match.group("rest").split())
+        record = PackageRecord(match.group("name"), match.group("path"))
+        for key, attr in (("versionCode", "version_code"), ("uid", "uid")):
+            try:
+                setattr(record, attr, int(fields[key]))
+            except (KeyError, ValueError):
+                pass
+        records[record.name] = record
+    return records
+
+
+def split_package_blocks(output: str) -> Dict[str, str]:
+    """
+    Tách phần "Packages:" của "dumpsys package" thành từng khối theo package.
+
+    Các khối trong phần "Hidden system packages:" (bản cài sẵn bị thay thế bởi bản
+    cập nhật) không được trả về.
+
+    Returns:
+        Dictionary tên package -> nội dung khối "Package [name] (...)"
+    """
+    # Phần "Hidden system packages:" chứa bản gốc (bản cài sẵn) của các ứng dụng hệ thống
+    # đã được cập nhật, cùng tên package với bản đang chạy: bỏ qua
+    hidden = _HIDDEN_SECTION.search(output)
+    if hidden:
+        output = output[:hidden.start()]
+
+    blocks = {}
+    matches = list(_PACKAGE_BLOCK.finditer(output))
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(output)
+        # Khối kết thúc ở dòng trống hoặc mục cấp cao hơn
+        block = output[match.end():end]
+        section_end = re.search(r"^\S", block, re.MULTILINE)
+        if section_end:
+            block = block[:section_end.start()]
+        # Giữ khối đầu tiên (thuộc phần "Packages:") nếu một package xuất hiện nhiều lần
+        blocks.setdefault(match.group(1), block)
+    return blocks
+
+
+def parse_package_details(block: str, package_name: str) -> Dict[str, Any]:
+    """
+    Phân tích khối "Package [name]" của "dumpsys package".
+
+    Returns:
+        Dictionary gồm package_name, version_name, version_code, first_install_time,
+        last_update_time, installer, uid, target_sdk và permissions (các quyền đã cấp)
+    """
+    info = {
+        "package_name": package_name,
+        "version_name": None,
+        "version_code": None,
+        "first_install_time": None,
+        "last_update_time": None,
+        "installer": None,
+        "uid": None,
+        "target_sdk": None,
+        "permissions": []
+    }
+
+    for line in block.splitlines():
+        line = line.strip()
+
+        if line.startswith(("firstInstallTime=", "lastUpdateTime=", "versionName=")):
+            key, value = line.split("=", 1)
+            field = {"firstInstallTime": "first_install_time",
+                     "lastUpdateTime": "last_update_time",
+                     "versionName": "version_name"}[key]
+            info[field] = value.strip()
+        elif "granted=true" in line and "permission." in line:
+            info["permissions"].append(line.split(":", 1)[0].strip())
+        else:
+            # Các dòng dạng "versionCode=42 minSdk=21 targetSdk=34", "userId=10123", ...
+            for token in line.split():
+                if "=" not in token:
+                    continue
+                key, value = token.split("=", 1)
+                if key == "versionCode":
+                    info["version_code"] = _to_int(value)
+                elif key == "targetSdk":
+                    info["target_sdk"] = _to_int(value)
+                elif key in ("userId", "appId") and info["uid"] is None:
+                    info["uid"] = _to_int(value)
+                elif key == "installerPackageName" and value and value != "null":
+                    info["installer"] = value
+
+    return info
+
+
+def parse_activities(output: str, package_name: str) -> List[str]:
+    """Lấy danh sách activity của package từ "Activity Resolver Table" của "dumpsys package <pkg>"."""
+    activities = []
+    in_activity_section = False
+
+    for line in output.splitlines():
+        if "Activity Resolver Table:" in line:
+            in_activity_section = True
+            continue
+        elif "Provider Resolver Table:" in line:
+            in_activity_section = False
+            continue
+
+        if in_activity_section and package_name in line and "/" in line:
+            for part in line.strip().split():
+                if package_name in part and "/" in part:
+                    activities.append(part.strip().rstrip("};"))
+
+    return activities
+
+
+def _to_int(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class PackageInventory:
+    """
+    Danh mục package của một thiết bị.
+
+    Toàn bộ package được nạp bằng một lệnh "pm list packages -f -U --show-versioncode";
+    chi tiết (dumpsys) được nạp khi cần cho từng package hoặc cho tất cả bằng một lệnh
+    (load_details). Danh mục bị xóa khi MyADB chạy lệnh cài đặt/gỡ bỏ/bật/tắt package và
+    được kiểm tra lại (bằng mã băm md5 của danh sách trên thiết bị) sau mỗi
+    ``check_interval`` giây.
+    """
+
+    def __init__(self, adb: "MyADB", check_interval: float = DEFAULT_CHECK_INTERVAL):
+        """
+        Args:
+            adb: Đối tượng MyADB của thiết bị
+            check_interval: Số giây dùng lại danh mục trước khi kiểm tra thay đổi
+        """
+        self.adb = adb
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._records: Optional[Dict[str, PackageRecord]] = None
+        self._list_command = LIST_COMMAND
+        self._local_digest: Optional[str] = None
+        self._device_digest: Optional[str] = None
+        self._checked_at = 0.0
+
+    def _load_locked(self) -> None:
+        output = None
+        if self._list_command == LIST_COMMAND:
+            try:
+                output = self.adb.run(f"shell {LIST_COMMAND}", use_cache=False)
+            except ADBCommandError as e:
+                logger.debug(f"'{LIST_COMMAND}' not supported, falling back: {e}")
+            if output is not None and not output.lstrip().startswith("package:") and output.strip():
+                # Android cũ in lỗi "Unknown option" ra stdout
+                output = None
+            if output is None:
+                self._list_command = LEGACY_LIST_COMMAND
+        if output is None:
+            output = self.adb.run(f"shell {self._list_command}", use_cache=False)
+
+        self._records = parse_package_list(output)
+        self._local_digest = hashlib.md5(output.encode()).hexdigest()
+        self._device_digest = None
+        self._checked_at = time.monotonic()
+        logger.debug(f"Loaded package inventory: {len(self._records)} packages")
+
+    def _ensure_loaded(self) -> Dict[str, PackageRecord]:
+        with self._lock:
+            if self._records is None:
+                self._load_locked()
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                self._check_locked()
+            return self._records
+
+    def _check_locked(self) -> None:
+        """Kiểm tra rẻ: so sánh mã băm của danh sách trên thiết bị thay vì tải lại."""
+        try:
+            output = self.adb.run(f"shell {self._list_command} | md5sum", use_cache=False)
+            digest = output.split()[0] if output.split() else None
+        except ADBCommandError:
+            digest = None
+
+        if digest is None or digest != (self._device_digest or self._local_digest):
+            self._load_locked()
+        self._device_digest = digest
+        self._checked_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """Nạp lại toàn bộ danh mục từ thiết bị."""
+        with self._lock:
+            self._load_locked()
+
+    def invalidate(self, tags: FrozenSet[str]) -> None:
+        """
+        Xóa dữ liệu bị ảnh hưởng bởi lệnh ghi (được MyADB gọi tự động).
+
+        Args:
+            tags: Nhãn dữ liệu bị thay đổi (xem utils.cache_policy)
+        """
+        with self._lock:
+            if self._records is None:
+                return
+            if TAG_ALL in tags or TAG_PACKAGES in tags:
+                # Cài đặt/gỡ bỏ/... : danh sách package có thể đã đổi
+                self._records = None
+                return
+            for name, record in self._records.items():
+                if tags_overlap(frozenset({package_tag(name)}), tags):
+                    record.details = None
+                    record.activities = None
+
+    def packages(self) -> Dict[str, PackageRecord]:
+        """
+        Lấy toàn bộ package đã cài đặt.
+
+        Returns:
+            Dictionary tên package -> PackageRecord
+        """
+        return dict(self._ensure_loaded())
+
+    def get(self, package_name: str) -> Optional[PackageRecord]:
+        """Lấy PackageRecord của package, None nếu package chưa được cài đặt."""
+        return self._ensure_loaded().get(package_name)
+
+    def is_installed(self, package_name: str) -> bool:
+        """Kiểm tra package đã được cài đặt chưa."""
+        return package_name in self._ensure_loaded()
+
+    def version_code(self, package_name: str) -> Optional[int]:
+        """Lấy version code của package, None nếu package chưa được cài đặt."""
+        record = self.get(package_name)
+        if record is None:
+            return None
+        if record.version_code is None:
+            # "pm list packages" của Android cũ không có version code
+            details = self.details(package_name)
+            version_code = details.get("version_code") if details else None
+            return version_code if isinstance(version_code, int) else None
+        return record.version_code
+
+    def details(self, package_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy thông tin chi tiết (dumpsys) của package; chỉ chạy dumpsys lần đầu.
+
+        Returns:
+            Dictionary thông tin (xem parse_package_details) hoặc None nếu package
+            chưa được cài đặt
+        """
+        record = self.get(package_name)
+        if record is None:
+            return None
+        if record.details is None:
+            self._load_package(record)
+        return record.details
+
+    def activities(self, package_name: str) -> Optional[List[str]]:
+        """
+        Lấy danh sách activity của package.
+
+        Returns:
+            Danh sách activity hoặc None nếu package chưa được cài đặt
+        """
+        record = self.get(package_name)
+        if record is None:
+            return None
+        if record.activities is None:
+            self._load_package(record)
+        return record.activities
+
+    def _load_package(self, record: PackageRecord) -> None:
+        output = self.adb.run(f"shell dumpsys package {record.name}", use_cache=False)
+        block = split_package_blocks(output).get(record.name, "")
+        details = self._details_from_block(record, block)
+        activities = parse_activities(output, record.name)
+        with self._lock:
+            record.details = details
+            record.activities = activities
+
+    def load_details(self) -> None:
+        """
+        Nạp chi tiết của tất cả package bằng một lệnh "dumpsys package packages".
+
+        Danh sách activity không có trong lệnh này và vẫn được nạp khi cần.
+        """
+        records = self._ensure_loaded()
+        output = self.adb.run("shell dumpsys package packages", use_cache=False)
+        blocks = split_package_blocks(output)
+        with self._lock:
+            for name, block in blocks.items():
+                record = records.get(name)
+                if record is not None:
+                    record.details = self._details_from_block(record, block)
+
+    @staticmethod
+    def _details_from_block(record: PackageRecord, block: str) -> Dict[str, Any]:
+        details = parse_package_details(block, record.name)
+        # Bổ sung từ "pm list packages" những gì dumpsys không in ra
+        if details["uid"] is None:
+            details["uid"] = record.uid
+        if details["version_code"] is None:
+            details["version_code"] = record.version_code
+        return details
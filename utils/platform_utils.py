@@ -134,6 +134,29 @@ class PlatformInfo:
         
         return default_temp
     
+    def get_cache_dir(self) -> str:
+        """
+        Lấy thư mục cache bền vững của OIADB trên máy tính (tạo nếu chưa có).
+        
+        Returns:
+            Đường dẫn thư mục cache
+        """
+        if self.is_windows:
+            base_dir = os.environ.get('LOCALAPPDATA') or self.temp_dir
+        elif self.is_macos:
+            base_dir = os.path.join(self.home_dir, 'Library', 'Caches')
+        else:
+            base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(self.home_dir, '.cache')
+        
+        cache_dir = os.path.join(base_dir, 'oiadb')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            # Thư mục người dùng không ghi được (CI, sandbox): dùng thư mục tạm
+            cache_dir = os.path.join(self.temp_dir, 'oiadb_cache')
+            os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+    
     def normalize_path(self, path: str) -> str:
         """
         Chuẩn hóa đường dẫn cho nền tảng hiện tại.
@@ -0,0 +1,537 @@
+"""
+Các cơ chế truyền lệnh tới thiết bị cho thư viện OIADB.
+"""
+
+import queue
+import socket
+import struct
+import subprocess
+import time
+import uuid
+import logging
+import threading
+from typing import Optional, Tuple, Dict, Set, Iterator
+
+from ..exceptions import ADBServerError
+from .platform_utils import get_platform_info
+
+# Thiết lập logging
+logger = logging.getLogger("oiadb")
+
+# Địa chỉ mặc định của ADB server cục bộ
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+
+# Mã gói tin của giao thức shell v2
+SHELL_ID_STDIN = 0
+SHELL_ID_STDOUT = 1
+SHELL_ID_STDERR = 2
+SHELL_ID_EXIT = 3
+
+_RECV_SIZE = 65536
+
+
+class SocketTransport:
+    """
+    Thực thi lệnh bằng cách nói chuyện trực tiếp với ADB server cục bộ qua
+    giao thức host của ADB (tcp:5037), thay vì tạo một tiến trình ``adb`` cho mỗi lệnh.
+
+    Chỉ hỗ trợ các lệnh không tương tác: ``shell <cmd>``, ``exec-out <cmd>``,
+    ``devices``, ``get-state`` và ``get-serialno``. Các lệnh khác (push, pull,
+    install, ...) nên được thực thi bằng tiến trình ``adb`` như trước.
+    """
+
+    def __init__(self, host: str = ADB_SERVER_HOST, port: int = ADB_SERVER_PORT):
+        """
+        Khởi tạo transport.
+
+        Args:
+            host: Địa chỉ của ADB server
+            port: Cổng của ADB server
+        """
+        self.host = host
+        self.port = port
+        self._features: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def supports(self, command: str) -> bool:
+        """
+        Kiểm tra xem lệnh có thể được thực thi qua socket hay không.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb")
+
+        Returns:
+            True nếu lệnh được hỗ trợ, False nếu cần dùng tiến trình ``adb``
+        """
+        parts = command.split()
+        if not parts:
+            return False
+        if parts[0] in ("shell", "exec-out"):
+            # Shell tương tác hoặc có tùy chọn (-t, -x, ...) được để lại cho adb client
+            return len(parts) > 1 and not parts[1].startswith("-")
+        return len(parts) == 1 and parts[0] in ("devices", "get-state", "get-serialno")
+
+    def execute(self, command: str, device_id: Optional[str] = None,
+                timeout: Optional[float] = None) -> Tuple[int, bytes, bytes]:
+        """
+        Thực thi lệnh qua ADB server.
+
+        Args:
+            command: Lệnh ADB (không bao gồm "adb"), phải được ``supports()`` chấp nhận
+            device_id: Serial của thiết bị, None = thiết bị duy nhất đang kết nối
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            Tuple (return_code, stdout, stderr) giống như khi chạy tiến trình ``adb``
+
+        Raises:
+            ADBServerError: Nếu không thể kết nối tới ADB server
+            socket.timeout: Nếu lệnh vượt quá thời gian chờ
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        parts = command.split()
+        name = parts[0]
+
+        if name == "devices":
+            status, data = self._host_query("host:devices", deadline)
+            if status is not None:
+                return 1, b"", status
+            # Giữ định dạng đầu ra giống adb client để các hàm phân tích không phải thay đổi
+            return 0, b"List of devices attached\n" + data + b"\n", b""
+
+        if name in ("get-state", "get-serialno"):
+            prefix = f"host-serial:{device_id}:" if device_id else "host:"
+            status, data = self._host_query(prefix + name, deadline)
+            if status is not None:
+                return 1, b"", status
+            return 0, data + b"\n", b""
+
+        # adb client nối các đối số bằng dấu cách trước khi gửi cho shell trên thiết bị
+        shell_command = " ".join(parts[1:])
+        if name == "exec-out":
+            service = "exec:" + shell_command
+            use_v2 = False
+        else:
+            use_v2 = self._has_feature(device_id, "shell_v2", deadline)
+            service = ("shell,v2,raw:" if use_v2 else "shell:") + shell_command
+
+        sock = self._connect(deadline)
+        try:
+            error = self._switch_transport(sock, device_id, deadline)
+            if error is None:
+                error = self._request(sock, service, deadline)
+            if error is not None:
+                return 1, b"", error
+            if use_v2:
+                return self.read_shell_v2(sock, deadline)
+            return 0, self._read_all(sock, deadline), b""
+        finally:
+            sock.close()
+
+    def open_service(self, service: str, device_id: Optional[str] = None,
+                     timeout: Optional[float] = None) -> socket.socket:
+        """
+        Mở một kết nối tới dịch vụ trên thiết bị và trả về socket để đọc luồng dữ liệu.
+
+        Args:
+            service: Tên dịch vụ (ví dụ: "exec:logcat", "shell,v2,raw:ls")
+            device_id: Serial của thiết bị
+            timeout: Thời gian chờ cho mỗi thao tác đọc/ghi (giây)
+
+        Returns:
+            Socket đã sẵn sàng đọc dữ liệu từ dịch vụ
+
+        Raises:
+            ADBServerError: Nếu không thể kết nối hoặc ADB server từ chối yêu cầu
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        sock = self._connect(deadline)
+        try:
+            error = self._switch_transport(sock, device_id, deadline)
+            if error is None:
+                error = self._request(sock, service, deadline)
+        except Exception:
+            sock.close()
+            raise
+        if error is not None:
+            sock.close()
+            raise ADBServerError(error.decode(errors="ignore"))
+        sock.settimeout(timeout)
+        return sock
+
+    def stream(self, command: str, device_id: Optional[str] = None,
+               chunk_size: int = _RECV_SIZE) -> Iterator[Tuple[int, bytes]]:
+        """
+        Thực thi lệnh ``shell``/``exec-out`` và trả về dữ liệu dần dần khi nó tới.
+
+        Kết nối được mở ngay khi gọi hàm (lỗi kết nối xuất hiện ở đây, không phải khi
+        bắt đầu lặp); đóng iterator sẽ đóng socket và dừng lệnh trên thiết bị.
+
+        Args:
+            command: Lệnh ADB dạng "shell ..." hoặc "exec-out ..."
+            device_id: Serial của thiết bị
+            chunk_size: Kích thước tối đa của mỗi lần đọc (byte)
+
+        Returns:
+            Iterator các cặp (SHELL_ID_STDOUT/SHELL_ID_STDERR/SHELL_ID_EXIT, dữ liệu).
+            Gói SHELL_ID_EXIT luôn là gói cuối và chứa mã thoát ở byte đầu tiên.
+
+        Raises:
+            ADBServerError: Nếu không thể kết nối hoặc ADB server từ chối yêu cầu
+        """
+        parts = command.split()
+        shell_command = " ".join(parts[1:])
+        if parts[0] == "exec-out":
+            service = "exec:" + shell_command
+            use_v2 = False
+        else:
+            use_v2 = self.has_shell_v2(device_id)
+            service = ("shell,v2,raw:" if use_v2 else "shell:") + shell_command
+        sock = self.open_service(service, device_id)
+        return self._iter_stream(sock, use_v2, chunk_size)
+
+    def has_shell_v2(self, device_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Kiểm tra thiết bị có hỗ trợ giao thức shell v2 (có mã thoát, stderr riêng) hay không."""
+        deadline = time.monotonic() + timeout if timeout else None
+        return self._has_feature(device_id, "shell_v2", deadline)
+
+    # --- Giao thức host ---
+
+    def _connect(self, deadline: Optional[float]) -> socket.socket:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self._remaining(deadline))
+        except socket.timeout:
+            raise
+        except OSError as e:
+            raise ADBServerError(f"Cannot connect to ADB server at {self.host}:{self.port}: {e}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _request(self, sock: socket.socket, payload: str, deadline: Optional[float]) -> Optional[bytes]:
+        """Gửi một yêu cầu host. Trả về None nếu OKAY, thông báo lỗi nếu FAIL."""
+        data = payload.encode("utf-8")
+        sock.settimeout(self._remaining(deadline))
+        sock.sendall(b"%04x" % len(data) + data)
+        status = self._recv_exact(sock, 4, deadline)
+        if status == b"OKAY":
+            return None
+        if status == b"FAIL":
+            return b"error: " + self._read_length_prefixed(sock, deadline)
+        raise ConnectionError(f"Unexpected ADB server response: {status!r}")
+
+    def _switch_transport(self, sock: socket.socket, device_id: Optional[str],
+                          deadline: Optional[float]) -> Optional[bytes]:
+        target = f"host:transport:{device_id}" if device_id else "host:transport-any"
+        return self._request(sock, target, deadline)
+
+    def _host_query(self, payload: str, deadline: Optional[float]) -> Tuple[Optional[bytes], bytes]:
+        """Gửi một truy vấn host có phản hồi dạng độ dài + dữ liệu."""
+        sock = self._connect(deadline)
+        try:
+            error = self._request(sock, payload, deadline)
+            if error is not None:
+                return error, b""
+            return None, self._read_length_prefixed(sock, deadline)
+        finally:
+            sock.close()
+
+    def _has_feature(self, device_id: Optional[str], feature: str, deadline: Optional[float]) -> bool:
+        key = device_id or ""
+        with self._lock:
+            features = self._features.get(key)
+        if features is None:
+            prefix = f"host-serial:{device_id}:" if device_id else "host:"
+            error, data = self._host_query(prefix + "features", deadline)
+            features = set() if error is not None else set(data.decode(errors="ignore").strip().split(","))
+            with self._lock:
+                self._features[key] = features
+        return feature in features
+
+    # --- Đọc dữ liệu ---
+
+    def read_shell_v2(self, sock: socket.socket, deadline: Optional[float]) -> Tuple[int, bytes, bytes]:
+        """Đọc toàn bộ luồng shell v2, tách stdout, stderr và mã thoát."""
+        stdout_chunks = []
+        stderr_chunks = []
+        return_code = 0
+        while True:
+            header = self._recv_exact(sock, 5, deadline, allow_eof=True)
+            if not header:
+                break
+            packet_id, length = struct.unpack("<BI", header)
+            payload = self._recv_exact(sock, length, deadline)
+            if packet_id == SHELL_ID_STDOUT:
+                stdout_chunks.append(payload)
+            elif packet_id == SHELL_ID_STDERR:
+                stderr_chunks.append(payload)
+            elif packet_id == SHELL_ID_EXIT:
+                return_code = payload[0] if payload else 0
+                break
+        return return_code, b"".join(stdout_chunks), b"".join(stderr_chunks)
+
+    def _iter_stream(self, sock: socket.socket, use_v2: bool,
+                     chunk_size: int) -> Iterator[Tuple[int, bytes]]:
+        try:
+            if use_v2:
+                while True:
+                    header = self._recv_exact(sock, 5, None, allow_eof=True)
+                    if not header:
+                        break
+                    packet_id, length = struct.unpack("<BI", header)
+                    payload = self._recv_exact(sock, length, None)
+                    yield packet_id, payload
+                    if packet_id == SHELL_ID_EXIT:
+                        return
+                # Kết nối bị đóng mà không có gói mã thoát
+                yield SHELL_ID_EXIT, b"\xff"
+            else:
+                while True:
+                    chunk = sock.recv(chunk_size)
+                    if not chunk:
+                        break
+                    yield SHELL_ID_STDOUT, chunk
+                # Dịch vụ shell/exec thô không trả về mã thoát
+                yield SHELL_ID_EXIT, b"\x00"
+        finally:
+            sock.close()
+
+    def _read_all(self, sock: socket.socket, deadline: Optional[float]) -> bytes:
+        chunks = []
+        while True:
+            sock.settimeout(self._remaining(deadline))
+            chunk = sock.recv(_RECV_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _read_length_prefixed(self, sock: socket.socket, deadline: Optional[float]) -> bytes:
+        length = int(self._recv_exact(sock, 4, deadline), 16)
+        return self._recv_exact(sock, length, deadline)
+
+    def _recv_exact(self, sock: socket.socket, size: int, deadline: Optional[float],
+                    allow_eof: bool = False) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < size:
+            sock.settimeout(self._remaining(deadline))
+            chunk = sock.recv(size - len(buffer))
+            if not chunk:
+                if allow_eof and not buffer:
+                    return b""
+                raise ConnectionError("ADB server closed the connection unexpectedly")
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("timed out")
+        return remaining
+
+
+def quote_shell_arg(text: str) -> str:
+    """Đặt chuỗi trong dấu nháy đơn để dùng an toàn trong shell của thiết bị."""
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class ShellSession:
+    """
+    Phiên ``adb shell`` dài hạn dùng chung cho nhiều lệnh shell.
+
+    Mỗi lệnh được gửi qua stdin của một tiến trình ``adb shell`` duy nhất và chạy
+    trong ``sh -c`` riêng trên thiết bị. Kết thúc của stdout/stderr và mã thoát được
+    nhận biết bằng chuỗi đánh dấu (sentinel), nên mỗi lệnh chỉ tốn một lượt truyền
+    thay vì một tiến trình mới. Phiên tự khởi động lại nếu tiến trình bị dừng.
+
+    Cần tính năng ``shell_v2`` của adbd để stderr được tách khỏi stdout; kiểm tra bằng
+    ``is_supported()`` trước khi dùng phiên.
+    """
+
+    def __init__(self, adb_path: str, device_id: Optional[str] = None):
+        """
+        Khởi tạo phiên shell (tiến trình chỉ được tạo khi chạy lệnh đầu tiên).
+
+        Args:
+            adb_path: Đường dẫn đến executable ADB
+            device_id: Serial của thiết bị
+        """
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.platform_info = get_platform_info()
+        self._process: Optional[subprocess.Popen] = None
+        self._stdout_queue: Optional[queue.Queue] = None
+        self._stderr_queue: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._shell_v2: Optional[bool] = None
+
+    def is_supported(self) -> bool:
+        """
+        Kiểm tra thiết bị có hỗ trợ ``shell_v2`` (chỉ hỏi "adb features" lần đầu).
+
+        Không có shell_v2 (adbd cũ), stderr bị gộp vào stdout nên chuỗi đánh dấu của
+        stderr không bao giờ tới và mọi lệnh sẽ chờ tới hết thời gian.
+
+        Returns:
+            True nếu có thể dùng phiên shell
+        """
+        if self._shell_v2 is None:
+            command = [self.adb_path]
+            if self.device_id:
+                command.extend(["-s", self.device_id])
+            command.append("features")
+            try:
+                process_args = self.platform_info.create_process_args(
+                    command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10
+                )
+                result = subprocess.run(**process_args)
+                features = result.stdout.decode(errors="ignore").strip().split(",")
+                self._shell_v2 = result.returncode == 0 and "shell_v2" in features
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.debug(f"Cannot query adb features: {e}")
+                self._shell_v2 = False
+            if not self._shell_v2:
+                logger.debug(f"Device {self.device_id} has no shell_v2, shell session disabled")
+        return self._shell_v2
+
+    def is_alive(self) -> bool:
+        """Kiểm tra tiến trình ``adb shell`` có đang chạy hay không."""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        """Khởi động (hoặc khởi động lại) tiến trình ``adb shell``."""
+        self._stop_process()
+        command = [self.adb_path]
+        if self.device_id:
+            command.extend(["-s", self.device_id])
+        command.append("shell")
+        
+        process_args = self.platform_info.create_process_args(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self._process = subprocess.Popen(**process_args)
+        self._stdout_queue = queue.Queue()
+        self._stderr_queue = queue.Queue()
+        for stream, target in ((self._process.stdout, self._stdout_queue),
+                               (self._process.stderr, self._stderr_queue)):
+            thread = threading.Thread(target=self._pump, args=(stream, target))
+            thread.daemon = True
+            thread.start()
+        logger.debug(f"Started persistent shell session for device {self.device_id}")
+
+    def run(self, command: str, timeout: Optional[float] = None) -> Tuple[int, bytes, bytes]:
+        """
+        Chạy một lệnh shell trong phiên.
+
+        Args:
+            command: Lệnh shell trên thiết bị (không bao gồm "shell")
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            Tuple (return_code, stdout, stderr)
+
+        Raises:
+            subprocess.TimeoutExpired: Nếu lệnh vượt quá thời gian chờ (phiên sẽ bị khởi động lại)
+            ConnectionError: Nếu phiên bị đóng trong khi lệnh đang chạy
+        """
+        with self._lock:
+            marker = "__OIADB_{}__".format(uuid.uuid4().hex)
+            script = "sh -c {} </dev/null; printf '\\n%s %d\\n' {} $?; printf '\\n%s\\n' {} >&2\n".format(
+                quote_shell_arg(command), marker, marker
+            ).encode("utf-8")
+            self._send(script)
+            
+            deadline = time.monotonic() + timeout if timeout else None
+            marker_bytes = b"\n" + marker.encode("ascii")
+            try:
+                stdout, tail = self._read_until(self._stdout_queue, marker_bytes + b" ", b"\n", deadline)
+                stderr, _ = self._read_until(self._stderr_queue, marker_bytes + b"\n", b"", deadline)
+            except subprocess.TimeoutExpired:
+                # Không thể biết lệnh còn ghi gì vào luồng, nên bỏ phiên hiện tại
+                self._stop_process()
+                raise subprocess.TimeoutExpired(command, timeout)
+            except ConnectionError:
+                self._stop_process()
+                raise
+            
+            try:
+                return_code = int(tail.strip() or 0)
+            except ValueError:
+                return_code = -1
+            return return_code, stdout, stderr
+
+    def close(self) -> None:
+        """Đóng phiên shell."""
+        with self._lock:
+            self._stop_process()
+
+    def _send(self, data: bytes) -> None:
+        if not self.is_alive():
+            self.start()
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            # Tiến trình vừa bị dừng trước khi nhận lệnh, nên gửi lại là an toàn
+            logger.debug("Shell session died, restarting")
+            self.start()
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+
+    def _read_until(self, source: queue.Queue, marker: bytes, terminator: bytes,
+                    deadline: Optional[float]) -> Tuple[bytes, bytes]:
+        """Đọc luồng cho đến khi gặp marker (và terminator sau nó). Trả về (dữ liệu, phần sau marker)."""
+        buffer = bytearray()
+        search_from = 0
+        while True:
+            index = buffer.find(marker, search_from)
+            if index != -1:
+                end = buffer.find(terminator, index + len(marker)) if terminator else index + len(marker)
+                if end != -1:
+                    return bytes(buffer[:index]), bytes(buffer[index + len(marker):end])
+            else:
+                search_from = max(0, len(buffer) - len(marker))
+            
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired("shell session", 0)
+            try:
+                chunk = source.get(timeout=remaining)
+            except queue.Empty:
+                raise subprocess.TimeoutExpired("shell session", 0)
+            if chunk is None:
+                raise ConnectionError("Shell session closed unexpectedly")
+            buffer.extend(chunk)
+
+    @staticmethod
+    def _pump(stream, target: queue.Queue) -> None:
+        try:
+            while True:
+                chunk = stream.read(_RECV_SIZE)
+                if not chunk:
+                    break
+                target.put(chunk)
+        except (OSError, ValueError):
+            pass
+        target.put(None)
+
+    def _stop_process(self) -> None:
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        if process.poll() is None:
+            self.platform_info.kill_process(process)
@@ -0,0 +1,77 @@
+"""
+Cây giao diện (UI hierarchy) đã phân tích từ "uiautomator dump", dùng lại giữa các lần tìm kiếm.
+"""
+
+import time
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("oiadb")
+
+# Lệnh dò rẻ để biết giao diện có đổi hay không: cửa sổ/activity đang focus và mã băm
+# của khung hình hiện tại (chỉ 32 byte md5 được truyền về thay vì cả ảnh)
+UI_PROBE_COMMAND = 'dumpsys window | grep -E "mCurrentFocus|mFocusedApp"; screencap | md5sum'
+
+# Tuổi tối đa (giây) của một bản dump được phép dùng lại sau khi dò
+DEFAULT_UI_MAX_AGE = 10.0
+# Trong khoảng này (giây) kể từ lần xác nhận cuối, bản dump được dùng lại không cần dò
+UI_REVALIDATE_INTERVAL = 1.0
+
+
+class UIHierarchy:
+    """
+    Một bản dump giao diện cùng danh sách node đã phân tích.
+
+    ``elements`` là danh sách thuộc tính của mọi node (resource-id, class, text,
+    content-desc, bounds, ...), theo thứ tự duyệt cây.
+    """
+
+    def __init__(self, xml: str, probe: str = ""):
+        """
+        Args:
+            xml: Nội dung XML của "uiautomator dump"
+            probe: Đầu ra của UI_PROBE_COMMAND ngay trước khi dump
+        """
+        self.xml = xml
+        self.probe = probe
+        self.created_at = time.monotonic()
+        self.validated_at = self.created_at
+        self._elements: Optional[List[Dict[str, str]]] = None
+
+    @property
+    def elements(self) -> List[Dict[str, str]]:
+        """Danh sách thuộc tính của các node (phân tích XML một lần, khi cần)."""
+        if self._elements is None:
+            try:
+                root = ET.fromstring(self.xml)
+                self._elements = [dict(node.attrib) for node in root.iter("node")]
+            except ET.ParseError as e:
+                logger.warning(f"Could not parse UI hierarchy XML: {e}")
+                self._elements = []
+        return self._elements
+
+    @property
+    def age(self) -> float:
+        """Số giây kể từ khi dump được tạo."""
+        return time.monotonic() - self.created_at
+
+    @property
+    def validated_age(self) -> float:
+        """Số giây kể từ lần cuối dump được xác nhận còn đúng."""
+        return time.monotonic() - self.validated_at
+
+    def matches_probe(self, probe: str) -> bool:
+        """
+        Kiểm tra kết quả dò mới có khớp với lúc dump hay không (và đánh dấu đã xác nhận).
+
+        Returns:
+            True nếu giao diện không đổi
+        """
+        if not self.probe or probe != self.probe:
+            return False
+        self.validated_at = time.monotonic()
+        return True
+
+    def __repr__(self) -> str:
+        return "UIHierarchy(nodes={}, age={:.1f}s)".format(len(self.elements), self.age)